@@ -0,0 +1,341 @@
+"""
+Асинхронные версии самых нагруженных GET-эндпоинтов.
+
+Работают под ASGI-сервером (foodgram.asgi) и используют асинхронный ORM,
+поэтому медленный запрос к БД не блокирует воркер целиком. Остальные методы
+(POST, PATCH, DELETE) передаются в обычные DRF-представления.
+
+Ответы со списком рецептов и рецептом строятся через api.response_cache,
+как и в синхронных представлениях: кеш, объединение одинаковых запросов
+и устаревшие ответы работают одинаково для обоих путей. Построение и
+проверка лимитов обращаются к БД и кешу синхронно, поэтому выполняются в
+потоке (sync_to_async).
+"""
+import math
+from types import SimpleNamespace
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.contrib.auth.models import AnonymousUser
+from django.db.models import prefetch_related_objects
+from django.http import HttpResponse
+from django.utils.translation import gettext as _
+from rest_framework import exceptions, status
+from rest_framework.authtoken.models import Token
+from rest_framework.renderers import JSONRenderer
+from rest_framework.request import Request
+from rest_framework.utils.urls import remove_query_param, replace_query_param
+
+from api import batch, conditional, fast_serializers, response_cache
+from api.filters import VOLATILE_ORDERINGS, IngredientFilter, RecipeFilter
+from api.paginations import ApiPagination
+from api.serializers import (
+    FollowUserSerializer,
+    IngredientSerializer,
+    RecipeReadSerializer,
+    TagSerializer,
+)
+from api.throttling import ActionRateThrottle, UserRateThrottle
+from recipes.models import Ingredient, Recipe, Tag
+from users.models import User
+
+RECIPE_PREFETCH = ('tags', 'ingredients_amounts__ingredient')
+
+
+def json_response(data, status=status.HTTP_200_OK, headers=None):
+    return HttpResponse(
+        JSONRenderer().render(data),
+        content_type='application/json',
+        status=status,
+        headers=headers,
+    )
+
+
+def not_authenticated(
+        message='Authentication credentials were not provided.'):
+    return json_response(
+        {'detail': _(message)},
+        status=status.HTTP_401_UNAUTHORIZED,
+        headers={'WWW-Authenticate': 'Token'},
+    )
+
+
+def not_found(message='Not found.'):
+    return json_response(
+        {'detail': _(message)}, status=status.HTTP_404_NOT_FOUND)
+
+
+@sync_to_async
+def throttled(drf_request, scope=None):
+    """
+    Проверяет те же лимиты, что и DRF-представления. Возвращает ответ 429
+    или None, если запрос разрешён.
+    """
+    view = SimpleNamespace(
+        action='list', throttle_scopes={'list': scope} if scope else {})
+    waits = [
+        throttle.wait()
+        for throttle in (UserRateThrottle(), ActionRateThrottle())
+        if not throttle.allow_request(drf_request, view)
+    ]
+    if not waits:
+        return None
+    wait = max(waits)
+    return json_response(
+        {'detail': exceptions.Throttled(wait).detail},
+        status=status.HTTP_429_TOO_MANY_REQUESTS,
+        headers={'Retry-After': str(math.ceil(wait))},
+    )
+
+
+async def aget_user(request):
+    """
+    Асинхронный аналог TokenAuthentication.
+    Возвращает пользователя или None, если токен недействителен.
+    """
+    auth = request.headers.get('Authorization', '').split()
+    if not auth or auth[0].lower() != 'token':
+        return AnonymousUser()
+    if len(auth) != 2:
+        return None
+    token = await Token.objects.select_related('user').filter(
+        key=auth[1]).afirst()
+    if token is None or not token.user.is_active:
+        return None
+    return token.user
+
+
+async def arequest(request):
+    """Оборачивает HttpRequest в DRF Request с уже известным пользователем."""
+    user = await aget_user(request)
+    if user is None:
+        return None
+    drf_request = Request(request, authenticators=())
+    drf_request.user = user
+    return drf_request
+
+
+async def apaginate(drf_request, queryset):
+    """
+    Асинхронная постраничная выдача с тем же форматом ответа,
+    что и у ApiPagination.
+    """
+    paginator = ApiPagination()
+    page_size = paginator.get_page_size(drf_request)
+    count = await queryset.acount()
+    num_pages = max(1, math.ceil(count / page_size))
+    page_number = drf_request.query_params.get(
+        paginator.page_query_param, 1)
+    if page_number in paginator.last_page_strings:
+        page_number = num_pages
+    try:
+        page_number = int(page_number)
+    except (TypeError, ValueError):
+        return None, None
+    if not 1 <= page_number <= num_pages:
+        return None, None
+    offset = (page_number - 1) * page_size
+    page = [
+        obj async for obj in queryset[offset:offset + page_size].aiterator()
+    ]
+    url = drf_request.build_absolute_uri()
+    if page_number < num_pages:
+        next_url = replace_query_param(
+            url, paginator.page_query_param, page_number + 1)
+    else:
+        next_url = None
+    if page_number == 2:
+        previous_url = remove_query_param(url, paginator.page_query_param)
+    elif page_number > 2:
+        previous_url = replace_query_param(
+            url, paginator.page_query_param, page_number - 1)
+    else:
+        previous_url = None
+    return page, {
+        'count': count,
+        'next': next_url,
+        'previous': previous_url,
+    }
+
+
+@sync_to_async
+def filter_recipes(drf_request):
+    """
+    Фильтрация рецептов через RecipeFilter. Проверка формы фильтра
+    обращается к БД (author, tags), поэтому выполняется в потоке.
+    """
+    filterset = RecipeFilter(
+        drf_request.query_params,
+        queryset=Recipe.objects.select_related('author').with_user_flags(
+            drf_request.user),
+        request=drf_request,
+    )
+    if not filterset.is_valid():
+        return None, filterset.errors
+    return filterset.qs, None
+
+
+@sync_to_async
+def serialize(serializer_class, instance, drf_request, many=False):
+    return serializer_class(
+        instance, many=many, context={'request': drf_request}).data
+
+
+@sync_to_async
+def cached(drf_request, etag, last_modified, compute):
+    """response_cache.fetch в потоке: compute синхронный."""
+    return response_cache.fetch(drf_request, etag, last_modified, compute)
+
+
+async def recipe_list(request):
+    drf_request = await arequest(request)
+    if drf_request is None:
+        return not_authenticated('Invalid token.')
+    if response := await throttled(drf_request):
+        return response
+    if 'ids' in drf_request.query_params:
+        data, errors = await sync_to_async(batch.read)(
+            drf_request, drf_request.query_params['ids'])
+        if errors is not None:
+            return json_response(errors, status=status.HTTP_400_BAD_REQUEST)
+        return json_response(data)
+    queryset, errors = await filter_recipes(drf_request)
+    if errors is not None:
+        return json_response(errors, status=status.HTTP_400_BAD_REQUEST)
+    etag = last_modified = None
+    if drf_request.query_params.get('ordering') not in VOLATILE_ORDERINGS:
+        etag, last_modified = await sync_to_async(
+            conditional.list_validators)(drf_request, queryset)
+    if response := conditional.not_modified(request, etag, last_modified):
+        return response
+
+    def compute():
+        paginator = ApiPagination()
+        if settings.FAST_SERIALIZERS:
+            page = paginator.paginate_queryset(
+                fast_serializers.recipe_rows(queryset), drf_request)
+            return paginator.get_paginated_response(
+                fast_serializers.recipes(page, drf_request.user)).data
+        page = paginator.paginate_queryset(queryset, drf_request)
+        prefetch_related_objects(page, *RECIPE_PREFETCH)
+        return paginator.get_paginated_response(RecipeReadSerializer(
+            page, many=True, context={'request': drf_request}).data).data
+
+    try:
+        etag, last_modified, data = await cached(
+            drf_request, etag, last_modified, compute)
+    except exceptions.NotFound:
+        return not_found('Invalid page.')
+    return conditional.set_validators(
+        json_response(data), etag, last_modified)
+
+
+async def recipe_detail(request, pk):
+    drf_request = await arequest(request)
+    if drf_request is None:
+        return not_authenticated('Invalid token.')
+    if response := await throttled(drf_request):
+        return response
+    etag, last_modified = await sync_to_async(
+        conditional.detail_validators)(drf_request, Recipe.objects, pk)
+    if response := conditional.not_modified(request, etag, last_modified):
+        return response
+
+    def compute():
+        recipe = Recipe.objects.select_related('author').with_user_flags(
+            drf_request.user).filter(pk=pk).first()
+        if recipe is None:
+            raise exceptions.NotFound
+        prefetch_related_objects([recipe], *RECIPE_PREFETCH)
+        return RecipeReadSerializer(
+            recipe, context={'request': drf_request}).data
+
+    try:
+        etag, last_modified, data = await cached(
+            drf_request, etag, last_modified, compute)
+    except exceptions.NotFound:
+        return not_found()
+    return conditional.set_validators(
+        json_response(data), etag, last_modified)
+
+
+async def tag_list(request):
+    drf_request = await arequest(request)
+    if drf_request is None:
+        return not_authenticated('Invalid token.')
+    if response := await throttled(drf_request):
+        return response
+    if settings.FAST_SERIALIZERS:
+        return json_response(
+            await sync_to_async(fast_serializers.tags)(Tag.objects.all()))
+    tags = [tag async for tag in Tag.objects.all()]
+    return json_response(TagSerializer(tags, many=True).data)
+
+
+async def ingredient_list(request):
+    drf_request = await arequest(request)
+    if drf_request is None:
+        return not_authenticated('Invalid token.')
+    if response := await throttled(drf_request, 'search'):
+        return response
+    filterset = IngredientFilter(
+        request.GET, queryset=Ingredient.objects.all(), request=request)
+    if not filterset.is_valid():
+        return json_response(
+            filterset.errors, status=status.HTTP_400_BAD_REQUEST)
+    if settings.FAST_SERIALIZERS:
+        return json_response(await sync_to_async(
+            fast_serializers.ingredients)(filterset.qs))
+    ingredients = [
+        ingredient async for ingredient in filterset.qs.aiterator()
+    ]
+    return json_response(IngredientSerializer(ingredients, many=True).data)
+
+
+async def subscriptions(request):
+    drf_request = await arequest(request)
+    if drf_request is None:
+        return not_authenticated('Invalid token.')
+    if not drf_request.user.is_authenticated:
+        return not_authenticated()
+    if response := await throttled(drf_request):
+        return response
+    queryset = User.objects.filter(following__user=drf_request.user)
+    if settings.FAST_SERIALIZERS:
+        page, links = await apaginate(
+            drf_request, fast_serializers.user_rows(queryset))
+        if page is None:
+            return not_found('Invalid page.')
+        try:
+            results = await sync_to_async(fast_serializers.subscriptions)(
+                page, drf_request)
+        except exceptions.ValidationError as error:
+            return json_response(
+                error.detail, status=status.HTTP_400_BAD_REQUEST)
+        return json_response({**links, 'results': results})
+    page, links = await apaginate(drf_request, queryset)
+    if page is None:
+        return not_found('Invalid page.')
+    results = await serialize(
+        FollowUserSerializer, page, drf_request, many=True)
+    return json_response({**links, 'results': results})
+
+
+def async_read_view(read_view, fallback_view=None):
+    """
+    Представление, которое обрабатывает GET асинхронно,
+    а остальные методы отдаёт синхронному DRF-представлению.
+    """
+    async def view(request, *args, **kwargs):
+        if request.method in ('GET', 'HEAD'):
+            return await read_view(request, *args, **kwargs)
+        if fallback_view is None:
+            return json_response(
+                {'detail': _('Method "{method}" not allowed.').format(
+                    method=request.method)},
+                status=status.HTTP_405_METHOD_NOT_ALLOWED,
+            )
+        return await sync_to_async(fallback_view)(request, *args, **kwargs)
+
+    view.csrf_exempt = True
+    return view
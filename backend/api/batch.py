@@ -0,0 +1,71 @@
+"""
+Чтение нескольких рецептов по id одним запросом (?ids=1,2,3).
+
+Все рецепты выбираются одним запросом с предзагрузкой связей, ответ
+сохраняет порядок id из запроса, а на месте отсутствующих рецептов
+возвращается {"id": ..., "detail": "Не найден."}.
+"""
+import re
+
+from django.conf import settings
+from django.db.models import prefetch_related_objects
+
+from api import fast_serializers
+from api.serializers import RecipeReadSerializer
+from recipes.models import Recipe
+
+NOT_FOUND = 'Не найден.'
+# Наибольший первичный ключ (BigAutoField); большие числа PostgreSQL не
+# сравнит с bigint.
+MAX_ID = 2 ** 63 - 1
+
+
+def parse_ids(value):
+    """Список id из строки «1,2,3»; (None, ошибка), если строка неверна."""
+    parts = [part.strip() for part in value.split(',') if part.strip()]
+    if not parts:
+        return None, 'Укажите хотя бы один id.'
+    if len(parts) > settings.RECIPES_MULTI_GET_MAX_IDS:
+        return None, (
+            f'Можно запросить не больше '
+            f'{settings.RECIPES_MULTI_GET_MAX_IDS} рецептов.')
+    # str.isdigit() пропускает и другие цифры Юникода, например «²»,
+    # которые не разбирает int().
+    if not all(re.fullmatch(r'\d+', part, re.ASCII) for part in parts):
+        return None, 'id должны быть целыми положительными числами.'
+    # Длину проверяем до int(): очень длинные строки он не разбирает
+    # (sys.get_int_max_str_digits).
+    parts = [part.lstrip('0') or '0' for part in parts]
+    if any(
+        len(part) > len(str(MAX_ID)) or int(part) > MAX_ID
+        for part in parts
+    ):
+        return None, f'id не может быть больше {MAX_ID}.'
+    return [int(part) for part in parts], None
+
+
+def read(request, value):
+    """
+    Ответ на ?ids=: ({'results': [...]}, None) или (None, ошибки).
+    Повторяющиеся id выбираются один раз.
+    """
+    ids, error = parse_ids(value)
+    if error is not None:
+        return None, {'ids': [error]}
+    if settings.FAST_SERIALIZERS:
+        data = fast_serializers.recipes_by_id(set(ids), request.user)
+    else:
+        recipes = list(
+            Recipe.objects.select_related('author').with_user_flags(
+                request.user).filter(pk__in=set(ids)))
+        prefetch_related_objects(
+            recipes, 'tags', 'ingredients_amounts__ingredient')
+        data = {
+            item['id']: item for item in RecipeReadSerializer(
+                recipes, many=True, context={'request': request}).data
+        }
+    return {
+        'results': [
+            data.get(pk, {'id': pk, 'detail': NOT_FOUND}) for pk in ids
+        ],
+    }, None
@@ -0,0 +1,102 @@
+"""
+Условные GET-запросы к рецептам (ETag, Last-Modified).
+
+Валидатор строится дешёвыми агрегатами до сериализации: для списка —
+максимальный updated_at и число рецептов в отфильтрованной выборке, для
+рецепта — его updated_at. Для авторизованного пользователя к валидатору
+добавляется состояние его избранного, списка покупок и подписок (число
+строк и максимальный id): от них зависят is_favorited,
+is_in_shopping_cart и is_subscribed. Last-Modified отдаётся только
+анонимам — флаги пользователя меняются без изменения рецептов.
+"""
+import hashlib
+
+from django.db.models import Count, Max, OuterRef, Subquery
+from django.utils.cache import (
+    get_conditional_response,
+    patch_vary_headers,
+    quote_etag,
+)
+from django.utils.http import http_date
+
+from recipes.models import Favorited, ShoppingCart
+from users.models import Follow, User
+
+USER_STATE = (
+    (Favorited, 'author'),
+    (ShoppingCart, 'author'),
+    (Follow, 'user'),
+)
+
+
+def user_state(user):
+    """Состояние связей пользователя, от которых зависят флаги рецептов."""
+    if not user.is_authenticated:
+        return ()
+    annotations = {}
+    for model, field in USER_STATE:
+        related = model.objects.filter(
+            **{field: OuterRef('pk')}).order_by().values(field)
+        name = model._meta.model_name
+        annotations[f'{name}_count'] = Subquery(
+            related.annotate(value=Count('pk')).values('value'))
+        annotations[f'{name}_last'] = Subquery(
+            related.annotate(value=Max('pk')).values('value'))
+    return User.objects.filter(pk=user.pk).annotate(
+        **annotations).values_list(*annotations).first()
+
+
+def _etag(*parts):
+    digest = hashlib.blake2b(repr(parts).encode(), digest_size=16)
+    return quote_etag(digest.hexdigest())
+
+
+def list_validators(request, queryset):
+    """ETag и Last-Modified отфильтрованного списка рецептов."""
+    summary = queryset.order_by().aggregate(
+        last=Max('updated_at'), count=Count('pk'))
+    etag = _etag(
+        request.get_full_path(), summary['last'], summary['count'],
+        user_state(request.user))
+    return etag, _last_modified(request, summary['last'])
+
+
+def detail_validators(request, queryset, pk):
+    """ETag и Last-Modified рецепта; (None, None), если его нет."""
+    try:
+        updated_at = queryset.filter(pk=pk).values_list(
+            'updated_at', flat=True).first()
+    except (TypeError, ValueError):
+        return None, None
+    if updated_at is None:
+        return None, None
+    etag = _etag(
+        request.path, updated_at, user_state(request.user))
+    return etag, _last_modified(request, updated_at)
+
+
+def _last_modified(request, value):
+    if request.user.is_authenticated or value is None:
+        return None
+    return int(value.timestamp())
+
+
+def not_modified(request, etag, last_modified):
+    """Ответ 304, если у клиента актуальная версия, иначе None."""
+    if etag is None:
+        return None
+    response = get_conditional_response(
+        request, etag=etag, last_modified=last_modified)
+    if response is not None:
+        set_validators(response, etag, last_modified)
+    return response
+
+
+def set_validators(response, etag, last_modified):
+    if etag is None:
+        return response
+    response['ETag'] = etag
+    if last_modified is not None:
+        response['Last-Modified'] = http_date(last_modified)
+    patch_vary_headers(response, ('Authorization',))
+    return response
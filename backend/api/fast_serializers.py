@@ -0,0 +1,194 @@
+"""
+Быстрое чтение списков в обход полей DRF.
+
+Сериализаторы DRF на каждый рецепт создают и обходят десятки полей, а
+is_subscribed автора проверяют отдельным запросом. Здесь строки
+выбираются через .values() (страница рецептов вместе с автором и
+флагами пользователя — одним запросом), теги, ингредиенты и подписки
+подтягиваются словарями по id, а ответ собирается готовыми функциями.
+Результат совпадает с RecipeReadSerializer, FollowUserSerializer,
+TagSerializer и IngredientSerializer до байта: те же ключи в том же
+порядке и те же значения. Проверка и сравнение скорости —
+команда bench_serializers.
+"""
+from collections import defaultdict
+
+from django.db.models import Count, F, Window
+from django.db.models.functions import RowNumber
+from rest_framework.validators import ValidationError
+
+from recipes.models import IngredientInRecipe, Recipe
+from users.models import Follow
+
+USER_FIELDS = ('id', 'email', 'username', 'first_name', 'last_name')
+RECIPE_FIELDS = (
+    'id', 'author_id', 'author__email', 'author__username',
+    'author__first_name', 'author__last_name', 'name', 'image', 'text',
+    'cooking_time', 'is_favorited', 'is_in_shopping_cart',
+)
+MINI_RECIPE_FIELDS = ('id', 'name', 'image', 'cooking_time')
+TAG_FIELDS = ('id', 'name', 'color', 'slug')
+INGREDIENT_FIELDS = ('id', 'name', 'measurement_unit')
+
+image_url = Recipe._meta.get_field('image').storage.url
+
+
+def recipe_rows(queryset, *extra):
+    """Строки рецептов для recipes(); extra — поля для пагинации."""
+    return queryset.prefetch_related(None).values(*RECIPE_FIELDS, *extra)
+
+
+def subscribed_ids(user, author_ids):
+    """id авторов, на которых подписан пользователь."""
+    if not user.is_authenticated or not author_ids:
+        return set()
+    return set(Follow.objects.filter(
+        user=user, following_id__in=author_ids,
+    ).values_list('following_id', flat=True))
+
+
+def _tags(recipe_ids):
+    known = {}
+    by_recipe = defaultdict(list)
+    rows = Recipe.tags.through.objects.filter(
+        recipe_id__in=recipe_ids,
+    ).order_by('tag__name').values_list(
+        'recipe_id', 'tag_id', 'tag__name', 'tag__color', 'tag__slug')
+    for recipe_id, tag_id, name, color, slug in rows:
+        tag = known.get(tag_id)
+        if tag is None:
+            tag = known[tag_id] = {
+                'id': tag_id, 'name': name, 'color': color, 'slug': slug,
+            }
+        by_recipe[recipe_id].append(tag)
+    return by_recipe
+
+
+def _ingredients(recipe_ids):
+    by_recipe = defaultdict(list)
+    rows = IngredientInRecipe.objects.filter(
+        recipe_id__in=recipe_ids,
+    ).order_by('pk').values_list(
+        'recipe_id', 'ingredient_id', 'ingredient__name',
+        'ingredient__measurement_unit', 'amount')
+    for recipe_id, ingredient_id, name, unit, amount in rows:
+        by_recipe[recipe_id].append({
+            'id': ingredient_id,
+            'name': name,
+            'measurement_unit': unit,
+            'amount': amount,
+        })
+    return by_recipe
+
+
+def recipes(rows, user):
+    """Данные RecipeReadSerializer(many=True) по строкам recipe_rows."""
+    rows = list(rows)
+    recipe_ids = [row['id'] for row in rows]
+    recipe_tags = _tags(recipe_ids)
+    recipe_ingredients = _ingredients(recipe_ids)
+    subscribed = subscribed_ids(user, {row['author_id'] for row in rows})
+    return [
+        {
+            'id': row['id'],
+            'author': {
+                'id': row['author_id'],
+                'email': row['author__email'],
+                'username': row['author__username'],
+                'first_name': row['author__first_name'],
+                'last_name': row['author__last_name'],
+                'is_subscribed': row['author_id'] in subscribed,
+            },
+            'name': row['name'],
+            'image': image_url(row['image']),
+            'text': row['text'],
+            'ingredients': recipe_ingredients.get(row['id'], []),
+            'tags': recipe_tags.get(row['id'], []),
+            'cooking_time': row['cooking_time'],
+            'is_favorited': row['is_favorited'],
+            'is_in_shopping_cart': row['is_in_shopping_cart'],
+        }
+        for row in rows
+    ]
+
+
+def recipes_by_id(ids, user):
+    """Данные рецептов с этими id: {id: данные}, отсутствующих нет."""
+    return {
+        item['id']: item for item in recipes(
+            recipe_rows(Recipe.objects.with_user_flags(user).filter(
+                pk__in=ids)),
+            user)
+    }
+
+
+def recipes_limit(request):
+    """recipes_limit с той же проверкой, что в FollowUserSerializer."""
+    try:
+        return int(request.query_params.get('recipes_limit', 0))
+    except ValueError:
+        raise ValidationError('limit должен быть числом')
+
+
+def user_rows(queryset):
+    """Строки пользователей для subscriptions()."""
+    return queryset.values(*USER_FIELDS)
+
+
+def _author_recipes(author_ids, limit):
+    queryset = Recipe.objects.filter(author_id__in=author_ids)
+    if limit > 0:
+        queryset = queryset.annotate(position=Window(
+            RowNumber(),
+            partition_by=F('author_id'),
+            order_by=(F('pub_date').desc(), F('pk').desc()),
+        )).filter(position__lte=limit)
+    by_author = defaultdict(list)
+    rows = queryset.order_by('-pub_date', '-pk').values_list(
+        'author_id', *MINI_RECIPE_FIELDS)
+    for author_id, pk, name, image, cooking_time in rows:
+        by_author[author_id].append({
+            'id': pk,
+            'name': name,
+            'image': image_url(image),
+            'cooking_time': cooking_time,
+        })
+    return by_author
+
+
+def subscriptions(rows, request):
+    """Данные FollowUserSerializer(many=True) по строкам user_rows."""
+    rows = list(rows)
+    author_ids = [row['id'] for row in rows]
+    if not author_ids:
+        return []
+    limit = recipes_limit(request)
+    subscribed = subscribed_ids(request.user, author_ids)
+    author_recipes = _author_recipes(author_ids, limit)
+    counts = dict(
+        Recipe.objects.filter(author_id__in=author_ids).order_by().values(
+            'author_id').annotate(count=Count('pk')).values_list(
+            'author_id', 'count'))
+    return [
+        {
+            'id': row['id'],
+            'email': row['email'],
+            'username': row['username'],
+            'first_name': row['first_name'],
+            'last_name': row['last_name'],
+            'is_subscribed': row['id'] in subscribed,
+            'recipes': author_recipes.get(row['id'], []),
+            'recipes_count': counts.get(row['id'], 0),
+        }
+        for row in rows
+    ]
+
+
+def tags(queryset):
+    """Данные TagSerializer(many=True)."""
+    return list(queryset.values(*TAG_FIELDS))
+
+
+def ingredients(queryset):
+    """Данные IngredientSerializer(many=True)."""
+    return list(queryset.values(*INGREDIENT_FIELDS))
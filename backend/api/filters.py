@@ -1,5 +1,7 @@
+from django.db.models import Exists, OuterRef
 from django_filters import (
     CharFilter,
+    ChoiceFilter,
     FilterSet,
     ModelChoiceFilter,
     ModelMultipleChoiceFilter,
@@ -18,16 +20,53 @@ class IngredientFilter(FilterSet):
         fields = ('name',)
 
 
+TRENDING_ORDERING = {
+    'trending_24h': 'score_24h',
+    'trending_7d': 'score_7d',
+    'trending_30d': 'score_30d',
+}
+
+# Сортировки по полям рецепта; для каждой есть индекс с теми же полями
+# (Recipe.Meta.indexes), проверить планы можно командой check_query_plans.
+ORDERINGS = {
+    'cooking_time': ('cooking_time', '-pub_date'),
+    'popular': ('-favorites_count', '-pub_date'),
+}
+
+# Сортировки, порядок которых меняется без изменения рецептов: для них
+# нельзя строить ETag по updated_at.
+VOLATILE_ORDERINGS = {*TRENDING_ORDERING, 'popular'}
+
+
 class RecipeFilter(FilterSet):
     author = ModelChoiceFilter(queryset=User.objects.all())
     tags = ModelMultipleChoiceFilter(
         field_name='tags__slug',
         to_field_name='slug',
-        queryset=Tag.objects.all(),)
+        queryset=Tag.objects.all(),
+        method='filter_by_tags',)
     is_in_shopping_cart = NumberFilter(
         method='filter_by_shopping_cart',)
     is_favorited = NumberFilter(
         method='filter_by_favorited',)
+    cooking_time__gte = NumberFilter(
+        field_name='cooking_time', lookup_expr='gte',)
+    cooking_time__lte = NumberFilter(
+        field_name='cooking_time', lookup_expr='lte',)
+    ordering = ChoiceFilter(
+        choices=[
+            (value, value) for value in [*TRENDING_ORDERING, *ORDERINGS]],
+        method='order_by',)
+
+    def filter_by_tags(self, queryset, name, value):
+        # Без тегов в запросе value — пустой QuerySet, а не пустой список:
+        # django-filter вызывает метод и для него.
+        if not value:
+            return queryset
+        # EXISTS вместо JOIN с DISTINCT: страница читается по индексу
+        # сортировки, теги рецепта проверяются по индексу (recipe, tag).
+        return queryset.filter(Exists(Recipe.tags.through.objects.filter(
+            recipe=OuterRef('pk'), tag__in=value)))
 
     def filter_by_shopping_cart(self, queryset, name, value):
         if self.request.user.is_authenticated and value:
@@ -39,6 +78,16 @@ class RecipeFilter(FilterSet):
             return queryset.filter(favorites__author=self.request.user)
         return queryset
 
+    def order_by(self, queryset, name, value):
+        if value in ORDERINGS:
+            return queryset.order_by(*ORDERINGS[value])
+        field = TRENDING_ORDERING[value]
+        return queryset.filter(trending__isnull=False).order_by(
+            f'-trending__{field}', '-trending__recipe_id')
+
     class Meta:
         model = Recipe
-        fields = ('author', 'tags', 'is_in_shopping_cart', 'is_favorited',)
+        fields = (
+            'author', 'tags', 'is_in_shopping_cart', 'is_favorited',
+            'cooking_time__gte', 'cooking_time__lte', 'ordering',
+        )
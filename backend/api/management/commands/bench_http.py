@@ -0,0 +1,85 @@
+import statistics
+import time
+from concurrent.futures import ThreadPoolExecutor
+from urllib.error import HTTPError, URLError
+from urllib.request import Request, urlopen
+
+from django.core.management.base import BaseCommand
+
+# Запросы, которые фронтенд отправляет параллельно при открытии главной.
+DEFAULT_PATHS = (
+    '/api/recipes/?page=1&limit=6',
+    '/api/tags/',
+    '/api/ingredients/?name=с',
+)
+
+
+def percentile(values, percent):
+    index = min(len(values) - 1, int(len(values) * percent / 100))
+    return values[index]
+
+
+class Command(BaseCommand):
+    help = (
+        'Нагрузочный тест чтения API. Запустите его против WSGI- и '
+        'ASGI-развёртывания, чтобы сравнить пропускную способность.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--base-url', default='http://127.0.0.1:8000')
+        parser.add_argument(
+            '--path', action='append', dest='paths',
+            help='Путь запроса, можно указать несколько раз.')
+        parser.add_argument('--concurrency', type=int, default=32)
+        parser.add_argument('--requests', type=int, default=2000)
+        parser.add_argument('--token', help='Токен для авторизации.')
+        parser.add_argument('--timeout', type=float, default=30)
+
+    def handle(self, *args, **options):
+        paths = options['paths'] or DEFAULT_PATHS
+        headers = {}
+        if options['token']:
+            headers['Authorization'] = f'Token {options["token"]}'
+        urls = [
+            options['base_url'].rstrip('/') + paths[i % len(paths)]
+            for i in range(options['requests'])
+        ]
+
+        def fetch(url):
+            start = time.perf_counter()
+            try:
+                with urlopen(Request(url, headers=headers),
+                             timeout=options['timeout']) as response:
+                    response.read()
+                    code = response.status
+            except HTTPError as error:
+                code = error.code
+            except (URLError, OSError):
+                code = None
+            return url, code, time.perf_counter() - start
+
+        started = time.perf_counter()
+        with ThreadPoolExecutor(options['concurrency']) as executor:
+            results = list(executor.map(fetch, urls))
+        elapsed = time.perf_counter() - started
+
+        self.report(results, elapsed)
+
+    def report(self, results, elapsed):
+        by_path = {}
+        for url, code, duration in results:
+            by_path.setdefault(url, []).append((code, duration))
+        errors = sum(
+            1 for _, code, _ in results if code is None or code >= 500)
+        self.stdout.write(
+            f'Запросов: {len(results)}, ошибок: {errors}, '
+            f'время: {elapsed:.2f} с, RPS: {len(results) / elapsed:.1f}')
+        for url, samples in by_path.items():
+            durations = sorted(duration * 1000 for _, duration in samples)
+            self.stdout.write(
+                f'{url}: n={len(durations)} '
+                f'mean={statistics.fmean(durations):.1f}мс '
+                f'p50={percentile(durations, 50):.1f}мс '
+                f'p95={percentile(durations, 95):.1f}мс '
+                f'p99={percentile(durations, 99):.1f}мс')
@@ -0,0 +1,138 @@
+import statistics
+import time
+
+from django.contrib.auth.models import AnonymousUser
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.db.models import Count
+from django.test import RequestFactory
+from django.test.utils import CaptureQueriesContext
+from rest_framework.renderers import JSONRenderer
+from rest_framework.request import Request
+
+from api import fast_serializers
+from api.serializers import (
+    FollowUserSerializer,
+    IngredientSerializer,
+    RecipeReadSerializer,
+    TagSerializer,
+)
+from recipes.models import Ingredient, Recipe, Tag
+from users.models import User
+
+
+class Command(BaseCommand):
+    help = (
+        'Сравнивает сериализаторы DRF и сборку ответа из .values() '
+        '(api/fast_serializers.py) на списках рецептов, подписок, тегов и '
+        'ингредиентов: время на 1000 объектов вместе с запросами к БД и '
+        'число запросов. Ответы обоих вариантов должны совпадать до байта.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--recipes', type=int, default=1000)
+        parser.add_argument('--runs', type=int, default=5)
+        parser.add_argument(
+            '--user', type=int,
+            help='id пользователя, от имени которого читаются списки; '
+                 'по умолчанию — подписанный на больше всего авторов.')
+        parser.add_argument('--recipes-limit', default='3')
+
+    def handle(self, *args, **options):
+        request = self.request(options)
+        user = request.user
+        limit = options['recipes']
+        cases = (
+            (
+                f'рецепты ({user})',
+                lambda: RecipeReadSerializer(
+                    Recipe.objects.for_read(user)[:limit],
+                    many=True, context={'request': request}).data,
+                lambda: fast_serializers.recipes(
+                    fast_serializers.recipe_rows(
+                        Recipe.objects.for_read(user))[:limit],
+                    user),
+            ),
+            (
+                'рецепты (аноним)',
+                lambda: RecipeReadSerializer(
+                    Recipe.objects.for_read(AnonymousUser())[:limit],
+                    many=True, context={'request': self.anonymous}).data,
+                lambda: fast_serializers.recipes(
+                    fast_serializers.recipe_rows(
+                        Recipe.objects.for_read(AnonymousUser()))[:limit],
+                    AnonymousUser()),
+            ),
+            (
+                f'подписки ({user})',
+                lambda: FollowUserSerializer(
+                    User.objects.filter(following__user=user),
+                    many=True, context={'request': request}).data,
+                lambda: fast_serializers.subscriptions(
+                    fast_serializers.user_rows(
+                        User.objects.filter(following__user=user)),
+                    request),
+            ),
+            (
+                'теги',
+                lambda: TagSerializer(Tag.objects.all(), many=True).data,
+                lambda: fast_serializers.tags(Tag.objects.all()),
+            ),
+            (
+                'ингредиенты',
+                lambda: IngredientSerializer(
+                    Ingredient.objects.all(), many=True).data,
+                lambda: fast_serializers.ingredients(Ingredient.objects.all()),
+            ),
+        )
+        for title, drf, fast in cases:
+            self.compare(title, drf, fast, options['runs'])
+
+    def request(self, options):
+        factory = RequestFactory()
+        self.anonymous = Request(factory.get('/'))
+        self.anonymous.user = AnonymousUser()
+        if options['user'] is not None:
+            user = User.objects.filter(pk=options['user']).first()
+            if user is None:
+                raise CommandError(
+                    f'Пользователь {options["user"]} не найден.')
+        else:
+            user = User.objects.annotate(
+                follows=Count('follower')).order_by('-follows').first()
+            if user is None:
+                raise CommandError('В базе нет пользователей.')
+        request = Request(factory.get(
+            '/', {'recipes_limit': options['recipes_limit']}))
+        request.user = user
+        return request
+
+    def compare(self, title, drf, fast, runs):
+        renderer = JSONRenderer()
+        expected = renderer.render(drf())
+        actual = renderer.render(fast())
+        if expected != actual:
+            raise CommandError(f'{title}: ответы не совпадают.')
+        results = []
+        for variant in (drf, fast):
+            timings = []
+            for _ in range(runs):
+                with CaptureQueriesContext(connection) as queries:
+                    start = time.perf_counter()
+                    data = variant()
+                    timings.append(time.perf_counter() - start)
+            results.append((
+                statistics.median(timings), len(queries), len(data)))
+        (drf_time, drf_queries, count), (fast_time, fast_queries, _) = results
+        if not count:
+            self.stdout.write(f'{title}: список пуст, пропущено.')
+            return
+        per_thousand = 1000 * 1000 / count
+        self.stdout.write(
+            f'{title}, {count} шт.: '
+            f'DRF {drf_time * per_thousand:.1f}мс/1000 '
+            f'({drf_queries} запр.), '
+            f'values {fast_time * per_thousand:.1f}мс/1000 '
+            f'({fast_queries} запр.), '
+            f'ускорение x{drf_time / fast_time:.1f}; '
+            f'ответы совпадают ({len(expected)} байт)')
@@ -0,0 +1,110 @@
+import json
+import statistics
+import subprocess
+import sys
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.db import connections
+from django.test import Client, override_settings
+
+from api.management.commands.bench_http import percentile
+
+DEFAULT_PATHS = (
+    '/api/recipes/?limit=6',
+    '/api/tags/',
+    '/api/ingredients/?name=а',
+)
+
+
+class Command(BaseCommand):
+    help = (
+        'Сравнивает первый запрос к холодному и прогретому воркеру и '
+        'установившуюся задержку с постоянными соединениями с БД и без '
+        'них. Каждый замер выполняется в отдельном процессе.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--runs', type=int, default=5)
+        parser.add_argument('--requests', type=int, default=200)
+        parser.add_argument(
+            '--path', action='append', dest='paths',
+            help='Путь запроса, можно указать несколько раз.')
+        parser.add_argument('--child', choices=('cold', 'warm'))
+        parser.add_argument('--conn-max-age', type=int, default=60)
+
+    def handle(self, *args, **options):
+        if options['child']:
+            self.child(options)
+            return
+        scenarios = (
+            ('холодный, CONN_MAX_AGE=0', 'cold', 0),
+            ('прогретый, CONN_MAX_AGE=0', 'warm', 0),
+            ('холодный, CONN_MAX_AGE=60', 'cold', 60),
+            ('прогретый, CONN_MAX_AGE=60', 'warm', 60),
+        )
+        for title, mode, max_age in scenarios:
+            results = [
+                self.spawn(mode, max_age, options)
+                for _ in range(options['runs'])
+            ]
+            self.stdout.write(
+                f'{title}: '
+                f'прогрев {self.median(results, "warmup")}мс, '
+                f'первый запрос {self.median(results, "first")}мс, '
+                f'p50 {self.median(results, "p50")}мс, '
+                f'p99 {self.median(results, "p99")}мс')
+
+    @staticmethod
+    def median(results, key):
+        return f'{statistics.median(result[key] for result in results):.1f}'
+
+    def spawn(self, mode, max_age, options):
+        command = [
+            sys.executable, sys.argv[0], 'bench_startup',
+            '--child', mode,
+            '--conn-max-age', str(max_age),
+            '--requests', str(options['requests']),
+        ]
+        for path in options['paths'] or ():
+            command += ['--path', path]
+        output = subprocess.run(
+            command, check=True, capture_output=True, text=True).stdout
+        return json.loads(output.splitlines()[-1])
+
+    def child(self, options):
+        paths = options['paths'] or DEFAULT_PATHS
+        for connection in connections.all():
+            connection.settings_dict['CONN_MAX_AGE'] = options[
+                'conn_max_age']
+        # Лимиты запросов в замере не участвуют.
+        with override_settings(REST_FRAMEWORK={
+            **settings.REST_FRAMEWORK, 'DEFAULT_THROTTLE_CLASSES': [],
+        }):
+            warmup = 0.0
+            if options['child'] == 'warm':
+                from foodgram.warmup import warm_up
+
+                start = time.perf_counter()
+                warm_up()
+                warmup = time.perf_counter() - start
+            client = Client()
+            # Как и WSGIHandler в воркере, цепочка middleware собирается
+            # при загрузке приложения, а не первым запросом.
+            client.handler.load_middleware()
+            start = time.perf_counter()
+            client.get(paths[0])
+            first = time.perf_counter() - start
+            durations = []
+            for number in range(options['requests']):
+                start = time.perf_counter()
+                client.get(paths[number % len(paths)])
+                durations.append(time.perf_counter() - start)
+        durations = sorted(duration * 1000 for duration in durations)
+        self.stdout.write(json.dumps({
+            'warmup': warmup * 1000,
+            'first': first * 1000,
+            'p50': percentile(durations, 50),
+            'p99': percentile(durations, 99),
+        }))
@@ -0,0 +1,106 @@
+import re
+
+from django.conf import settings
+from django.contrib.auth.models import AnonymousUser
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, transaction
+from django.http import QueryDict
+
+from api.filters import ORDERINGS, TRENDING_ORDERING, RecipeFilter
+from recipes.models import Recipe, Tag
+
+# Параметры списка рецептов, первая страница которых должна читаться по
+# индексу с LIMIT, без сортировки всей выборки.
+CASES = [
+    '',
+    *[f'ordering={ordering}' for ordering in ORDERINGS],
+    *[f'ordering={ordering}' for ordering in TRENDING_ORDERING],
+    'ordering=cooking_time&cooking_time__lte=30',
+    'ordering=cooking_time&cooking_time__gte=10&cooking_time__lte=30',
+]
+# Фильтр по тегам; вместо {0} подставляется slug первого тега в базе,
+# вместо {1} — параметры первых TAG_SAMPLE тегов.
+TAG_CASES = [
+    'tags={0}',
+    '{1}',
+    'tags={0}&ordering=popular',
+]
+TAG_SAMPLE = 2
+
+CHECKS = {
+    'postgresql': {
+        'required': (r'\bLimit\b', r'Index (Only )?Scan.* on recipes_recipe'),
+        'forbidden': (r'(^|->)\s*(Incremental )?Sort\b',),
+    },
+    'sqlite': {
+        'required': (r'(SCAN|SEARCH) recipes_recipe USING INDEX',),
+        'forbidden': (r'TEMP B-TREE FOR (RIGHT PART OF )?ORDER BY',),
+    },
+}
+
+
+class Command(BaseCommand):
+    help = (
+        'Проверяет планы запросов первой страницы списка рецептов для '
+        'каждой сортировки: чтение по индексу с LIMIT и без сортировки. '
+        'В PostgreSQL последовательное сканирование отключается, чтобы '
+        'проверка не зависела от объёма данных.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--limit', type=int, default=settings.PRERENDER_LIST_LIMIT,
+            help='Размер страницы.')
+        parser.add_argument(
+            '--show-plans', action='store_true',
+            help='Печатать планы запросов.')
+
+    def handle(self, *args, **options):
+        checks = CHECKS.get(connection.vendor)
+        if checks is None:
+            raise CommandError(
+                f'Проверка планов для {connection.vendor} не реализована.')
+        failed = []
+        for params in CASES + self.tag_cases():
+            plan = self.explain(params, options['limit'])
+            problems = [
+                f'нет {pattern}' for pattern in checks['required']
+                if not re.search(pattern, plan, re.MULTILINE)
+            ] + [
+                f'есть {pattern}' for pattern in checks['forbidden']
+                if re.search(pattern, plan, re.MULTILINE)
+            ]
+            label = params or 'по умолчанию'
+            if problems:
+                failed.append(label)
+                self.stdout.write(self.style.ERROR(
+                    f'{label}: {"; ".join(problems)}'))
+            else:
+                self.stdout.write(self.style.SUCCESS(f'{label}: индекс'))
+            if problems or options['show_plans']:
+                self.stdout.write(plan)
+        if failed:
+            raise CommandError(
+                f'Сортировки без индекса: {", ".join(failed)}')
+
+    def tag_cases(self):
+        slugs = list(Tag.objects.order_by('pk').values_list(
+            'slug', flat=True)[:TAG_SAMPLE])
+        if not slugs:
+            self.stdout.write(self.style.WARNING(
+                'Тегов нет: фильтр по тегам не проверяется.'))
+            return []
+        every = '&'.join(f'tags={slug}' for slug in slugs)
+        return [case.format(slugs[0], every) for case in TAG_CASES]
+
+    def explain(self, params, limit):
+        queryset = RecipeFilter(
+            QueryDict(params),
+            queryset=Recipe.objects.select_related('author').with_user_flags(
+                AnonymousUser()),
+        ).qs[:limit]
+        with transaction.atomic():
+            if connection.vendor == 'postgresql':
+                with connection.cursor() as cursor:
+                    cursor.execute('SET LOCAL enable_seqscan = off')
+            return queryset.explain()
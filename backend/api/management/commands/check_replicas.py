@@ -0,0 +1,23 @@
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from foodgram.db_router import replica_lag
+
+
+class Command(BaseCommand):
+    help = 'Показывает отставание реплик и участвуют ли они в ротации.'
+
+    def handle(self, *args, **options):
+        if not settings.DATABASE_REPLICAS:
+            self.stdout.write('Реплики не настроены (DB_REPLICAS).')
+            return
+        for alias in settings.DATABASE_REPLICAS:
+            lag = replica_lag(alias)
+            if lag is None:
+                self.stdout.write(self.style.ERROR(f'{alias}: недоступна'))
+            elif lag > settings.REPLICA_MAX_LAG:
+                self.stdout.write(self.style.WARNING(
+                    f'{alias}: отставание {lag:.1f} с, вне ротации'))
+            else:
+                self.stdout.write(self.style.SUCCESS(
+                    f'{alias}: отставание {lag:.1f} с'))
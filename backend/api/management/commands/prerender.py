@@ -0,0 +1,70 @@
+import multiprocessing
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.db import connections
+
+from api import prerender
+
+
+def _build_chunk(paths):
+    written = sum(prerender.build(path) for path in paths)
+    connections.close_all()
+    return written, len(paths) - written
+
+
+class Command(BaseCommand):
+    help = (
+        'Пересобирает статические копии страниц рецептов и первых страниц '
+        'списка в PRERENDER_ROOT и удаляет устаревшие копии.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--workers', type=int, default=os.cpu_count() or 1,
+            help='Число процессов сборки.')
+        parser.add_argument(
+            '--chunk-size', type=int, default=200,
+            help='Сколько страниц отдавать процессу за раз.')
+
+    def handle(self, *args, **options):
+        started = time.perf_counter()
+        paths = prerender.all_paths()
+        size = options['chunk_size']
+        chunks = [paths[i:i + size] for i in range(0, len(paths), size)]
+        written = skipped = 0
+        if options['workers'] > 1:
+            # Дочерние процессы открывают свои соединения с БД.
+            connections.close_all()
+            with ProcessPoolExecutor(
+                max_workers=options['workers'],
+                mp_context=multiprocessing.get_context('fork'),
+            ) as executor:
+                for chunk_written, chunk_skipped in executor.map(
+                        _build_chunk, chunks):
+                    written += chunk_written
+                    skipped += chunk_skipped
+        else:
+            for chunk in chunks:
+                chunk_written, chunk_skipped = _build_chunk(chunk)
+                written += chunk_written
+                skipped += chunk_skipped
+        removed = self.remove_stale(paths)
+        self.stdout.write(self.style.SUCCESS(
+            f'Записано: {written}, пропущено: {skipped}, '
+            f'удалено устаревших: {removed} '
+            f'за {time.perf_counter() - started:.1f} с'))
+
+    def remove_stale(self, paths):
+        expected = {prerender.file_path(path) for path in paths}
+        removed = 0
+        for directory, _, files in os.walk(settings.PRERENDER_ROOT):
+            for name in files:
+                path = os.path.join(directory, name)
+                if name.startswith('index-') and path not in expected:
+                    os.unlink(path)
+                    removed += 1
+        return removed
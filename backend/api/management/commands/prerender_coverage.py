@@ -0,0 +1,61 @@
+import os
+from collections import Counter
+
+from django.core.management.base import BaseCommand
+
+from api import prerender, replay
+
+
+class Command(BaseCommand):
+    help = (
+        'Оценивает по access.log nginx (формат replay из infra/nginx.conf), '
+        'какую долю анонимных GET-запросов к API закрывают статические '
+        'копии из PRERENDER_ROOT.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('log', help='Путь к access.log.')
+        parser.add_argument(
+            '--top', type=int, default=10,
+            help='Сколько самых частых непокрытых путей показать.')
+
+    def handle(self, *args, **options):
+        total = covered = total_bytes = covered_bytes = 0
+        authorized = unmarked = 0
+        missed = Counter()
+        exists = {}
+        with open(options['log'], encoding='utf-8', errors='replace') as log:
+            for line in log:
+                record = replay.parse_nginx(line)
+                if record is None or record['method'] != 'GET':
+                    continue
+                # Авторизованным запросам nginx копии не отдаёт.
+                if record['client'] is not None:
+                    authorized += 1
+                    continue
+                if record['duration'] is None:
+                    unmarked += 1
+                path, size = record['path'], record['bytes']
+                total += 1
+                total_bytes += size
+                if path not in exists:
+                    exists[path] = os.path.exists(prerender.file_path(path))
+                if exists[path]:
+                    covered += 1
+                    covered_bytes += size
+                else:
+                    missed[path.partition('?')[0]] += 1
+        if not total:
+            self.stdout.write('Анонимных GET-запросов к API в журнале нет.')
+            return
+        self.stdout.write(
+            f'Анонимных GET-запросов к API: {total} (авторизованных '
+            f'пропущено: {authorized}), покрыто копиями: {covered} '
+            f'({covered / total:.1%}), трафика: '
+            f'{covered_bytes / max(total_bytes, 1):.1%}')
+        if unmarked:
+            self.stdout.write(self.style.WARNING(
+                f'В {unmarked} строках нет признака авторизации (журнал '
+                'не в формате replay): они посчитаны как анонимные.'))
+        for path, count in missed.most_common(options['top']):
+            self.stdout.write(f'{count:>8}  {path}')
@@ -0,0 +1,72 @@
+import io
+import os
+import pstats
+from collections import Counter
+from pathlib import Path
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+
+class Command(BaseCommand):
+    help = (
+        'Сводка профилей, собранных ProfilingMiddleware: самые горячие '
+        'функции по каждому представлению.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--dir', default=settings.PROFILING_DIR,
+            help='Каталог с профилями.')
+        parser.add_argument(
+            '--view', help='Только это представление, например '
+                           'RecipeViewSet.list.')
+        parser.add_argument('--top', type=int, default=20)
+        parser.add_argument(
+            '--sort', choices=('tottime', 'cumulative'), default='tottime',
+            help='Собственное или полное время функции.')
+
+    def handle(self, *args, **options):
+        root = Path(options['dir'])
+        if not root.is_dir():
+            self.stderr.write(f'Нет профилей в {root}')
+            return
+        views = sorted(
+            path for path in root.iterdir()
+            if path.is_dir() and options['view'] in (None, path.name))
+        for view in views:
+            prof = sorted(view.glob('*.prof'))
+            folded = sorted(view.glob('*.folded'))
+            self.stdout.write(self.style.MIGRATE_HEADING(
+                f'{view.name}: запросов {len(prof) + len(folded)}'))
+            if prof:
+                self.report_pstats(prof, options)
+            if folded:
+                self.report_folded(folded, options)
+
+    def report_pstats(self, paths, options):
+        stream = io.StringIO()
+        stats = pstats.Stats(*map(os.fspath, paths), stream=stream)
+        stats.strip_dirs().sort_stats(options['sort']).print_stats(
+            options['top'])
+        self.stdout.write(stream.getvalue())
+
+    def report_folded(self, paths, options):
+        """Доля сэмплов, в которых функция на вершине стека или в нём."""
+        own, total, samples = Counter(), Counter(), 0
+        for path in paths:
+            with open(path, encoding='utf-8') as stream:
+                for line in stream:
+                    stack, count = line.rsplit(' ', 1)
+                    count = int(count)
+                    frames = stack.split(';')
+                    samples += count
+                    own[frames[-1]] += count
+                    for frame in set(frames):
+                        total[frame] += count
+        counter = own if options['sort'] == 'tottime' else total
+        self.stdout.write(f'  сэмплов: {samples}')
+        for frame, count in counter.most_common(options['top']):
+            self.stdout.write(
+                f'  {100 * own[frame] / samples:6.1f}% '
+                f'{100 * total[frame] / samples:6.1f}%  {frame}')
@@ -0,0 +1,154 @@
+import json
+import statistics
+from collections import Counter
+
+from django.core.management.base import BaseCommand, CommandError
+
+from api import replay
+from api.management.commands.bench_http import percentile
+
+
+def speed(value):
+    """
+    original — как в записи, max — без пауз, число — во сколько раз
+    быстрее записи.
+    """
+    if value == 'original':
+        return 1.0
+    if value == 'max':
+        return None
+    factor = float(value)
+    if factor <= 0:
+        raise ValueError(value)
+    return factor
+
+
+class Command(BaseCommand):
+    help = (
+        'Воспроизводит записанный трафик (access.log nginx или файлы '
+        'CaptureMiddleware) против локального сервера на локальных данных '
+        'и показывает распределение задержек и ошибки по маршрутам. '
+        'Результат можно сохранить и сравнить с прогоном другой сборки.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            'sources', nargs='+',
+            help='access.log nginx или capture-*.jsonl.')
+        parser.add_argument('--base-url', default='http://127.0.0.1:8000')
+        parser.add_argument(
+            '--speed', type=speed, default=1.0,
+            help='original, max или множитель скорости, например 4.')
+        parser.add_argument(
+            '--max-gap', type=float, default=60,
+            help='Сокращать паузы между запросами в записи до N секунд.')
+        parser.add_argument('--concurrency', type=int, default=32)
+        parser.add_argument(
+            '--limit', type=int,
+            help='Воспроизвести только первые N запросов.')
+        parser.add_argument(
+            '--writes', action='store_true',
+            help='Воспроизводить и избранное, список покупок и подписки '
+                 '(POST и DELETE без тела).')
+        parser.add_argument('--timeout', type=float, default=30)
+        parser.add_argument(
+            '--output', help='Сохранить сводку по маршрутам в JSON.')
+        parser.add_argument(
+            '--compare', help='Сводка прошлого прогона для сравнения.')
+
+    def handle(self, *args, **options):
+        records = replay.read(options['sources'])
+        requests = replay.plan(
+            records, replay.Dataset(), options['speed'], options['writes'],
+            options['max_gap'])
+        if options['limit']:
+            requests = requests[:options['limit']]
+        if not requests:
+            raise CommandError('В записи нет запросов для воспроизведения.')
+        self.stdout.write(
+            f'Записей: {len(records)}, к воспроизведению: {len(requests)}')
+        results, elapsed = replay.replay(
+            requests, options['base_url'], options['concurrency'],
+            options['timeout'])
+        summary = self.summarize(results, elapsed)
+        self.report(summary)
+        if options['compare']:
+            with open(options['compare'], encoding='utf-8') as stream:
+                self.compare(json.load(stream), summary)
+        if options['output']:
+            with open(options['output'], 'w', encoding='utf-8') as stream:
+                json.dump(summary, stream, ensure_ascii=False, indent=2)
+
+    @staticmethod
+    def distribution(durations):
+        durations = sorted(duration * 1000 for duration in durations)
+        return {
+            'mean': statistics.fmean(durations),
+            'p50': percentile(durations, 50),
+            'p90': percentile(durations, 90),
+            'p99': percentile(durations, 99),
+            'max': durations[-1],
+        }
+
+    def summarize(self, results, elapsed):
+        by_route = {}
+        for template, code, duration, _ in results:
+            by_route.setdefault(template, []).append((code, duration))
+        routes = {}
+        for template, samples in by_route.items():
+            codes = Counter(
+                'error' if code is None else str(code) for code, _ in samples)
+            routes[template] = {
+                'count': len(samples),
+                'errors': sum(
+                    1 for code, _ in samples if code is None or code >= 500),
+                'codes': dict(codes),
+                **self.distribution(duration for _, duration in samples),
+            }
+        return {
+            'requests': len(results),
+            'elapsed': elapsed,
+            'errors': sum(route['errors'] for route in routes.values()),
+            'late_p99': percentile(
+                sorted(late * 1000 for *_, late in results), 99),
+            'routes': routes,
+        }
+
+    def report(self, summary):
+        self.stdout.write(
+            f'Запросов: {summary["requests"]}, ошибок: {summary["errors"]}, '
+            f'время: {summary["elapsed"]:.2f} с, '
+            f'RPS: {summary["requests"] / summary["elapsed"]:.1f}, '
+            f'опоздание от расписания p99: {summary["late_p99"]:.1f}мс')
+        routes = sorted(
+            summary['routes'].items(), key=lambda item: -item[1]['count'])
+        for template, route in routes:
+            codes = ' '.join(
+                f'{code}×{count}' for code, count in sorted(
+                    route['codes'].items()))
+            self.stdout.write(
+                f'{template}: n={route["count"]} '
+                f'p50={route["p50"]:.1f}мс p90={route["p90"]:.1f}мс '
+                f'p99={route["p99"]:.1f}мс max={route["max"]:.1f}мс '
+                f'[{codes}]')
+
+    def compare(self, before, after):
+        self.stdout.write('Сравнение с прошлым прогоном (было → стало):')
+        for template, route in sorted(after['routes'].items()):
+            old = before['routes'].get(template)
+            if old is None:
+                self.stdout.write(f'{template}: нет в прошлом прогоне')
+                continue
+            self.stdout.write(
+                f'{template}: '
+                f'p50 {old["p50"]:.1f} → {route["p50"]:.1f}мс '
+                f'({self.change(old["p50"], route["p50"])}), '
+                f'p99 {old["p99"]:.1f} → {route["p99"]:.1f}мс '
+                f'({self.change(old["p99"], route["p99"])}), '
+                f'ошибок {old["errors"]} → {route["errors"]}')
+
+    @staticmethod
+    def change(old, new):
+        if not old:
+            return '—'
+        return f'{(new - old) / old:+.0%}'
@@ -1,5 +1,76 @@
-from rest_framework.pagination import PageNumberPagination
+from datetime import datetime
+
+from rest_framework.exceptions import NotFound
+from rest_framework.pagination import (
+    Cursor,
+    CursorPagination,
+    PageNumberPagination,
+)
 
 
 class ApiPagination(PageNumberPagination):
     page_size_query_param = 'limit'
+    max_page_size = 100
+
+
+class FeedPagination(CursorPagination):
+    """
+    Курсор ленты по ключу (pub_date, id рецепта). Страницу выбирает
+    recipes.feed.page, а не queryset: лента собирается из двух
+    источников.
+    """
+
+    page_size_query_param = 'limit'
+    max_page_size = 100
+    ordering = ('-pub_date', '-id')
+
+    @staticmethod
+    def encode_position(row):
+        pub_date, pk = row
+        return f'{pub_date.isoformat()}|{pk}'
+
+    def decode_position(self, position):
+        try:
+            pub_date, pk = position.split('|')
+            return datetime.fromisoformat(pub_date), int(pk)
+        except ValueError:
+            raise NotFound(self.invalid_cursor_message)
+
+    def paginate_feed(self, fetch, request):
+        """
+        Строки страницы [(pub_date, id)] от новых к старым.
+        fetch(count, position, reverse) — recipes.feed.page без
+        пользователя.
+        """
+        self.request = request
+        self.base_url = request.build_absolute_uri()
+        self.page_size = self.get_page_size(request)
+        cursor = self.decode_cursor(request)
+        position = reverse = None
+        if cursor is not None and cursor.position is not None:
+            position = self.decode_position(cursor.position)
+            reverse = cursor.reverse
+        rows = fetch(self.page_size + 1, position, bool(reverse))
+        more = len(rows) > self.page_size
+        rows = rows[:self.page_size]
+        if reverse:
+            rows.reverse()
+        # Со страницы, открытой назад, всегда можно вернуться вперёд.
+        self.has_next = bool(reverse) or more
+        self.has_previous = more if reverse else position is not None
+        self.rows = rows
+        return rows
+
+    def get_next_link(self):
+        if not self.has_next or not self.rows:
+            return None
+        return self.encode_cursor(Cursor(
+            offset=0, reverse=False,
+            position=self.encode_position(self.rows[-1])))
+
+    def get_previous_link(self):
+        if not self.has_previous or not self.rows:
+            return None
+        return self.encode_cursor(Cursor(
+            offset=0, reverse=True,
+            position=self.encode_position(self.rows[0])))
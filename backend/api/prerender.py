@@ -0,0 +1,137 @@
+"""
+Статические копии публичных ответов API для анонимных посетителей.
+
+Страницы рецептов и первые страницы списка (без фильтра, со всеми тегами и
+с каждым тегом по отдельности — так их запрашивает фронтенд) сохраняются в
+PRERENDER_ROOT как JSON. nginx отдаёт их анонимным GET-запросам через
+try_files, а при отсутствии файла передаёт запрос Django. Файл для
+/api/recipes/?page=1&limit=6 лежит в api/recipes/index-page=1&limit=6.json.
+
+После изменения рецептов их страницы и страницы списка пересчитываются в
+фоне (schedule); файлы заменяются атомарно через os.replace, страницы
+удалённых рецептов удаляются. Полная пересборка — команда prerender.
+"""
+import os
+import tempfile
+import threading
+
+from django.conf import settings
+from django.contrib.auth.models import AnonymousUser
+from django.test import RequestFactory
+
+from recipes.background import run_after_commit
+from recipes.models import Recipe, Tag
+
+_pending = set()
+_pending_lock = threading.Lock()
+
+
+def file_path(path, root=None):
+    """Файл копии для пути запроса вместе со строкой запроса."""
+    path, _, query = path.partition('?')
+    return os.path.join(
+        root or settings.PRERENDER_ROOT, path.strip('/'),
+        f'index-{query}.json')
+
+
+def detail_path(pk):
+    return f'/api/recipes/{pk}/'
+
+
+def list_paths():
+    """Страницы списка в том виде, в каком их запрашивает фронтенд."""
+    slugs = list(Tag.objects.values_list('slug', flat=True))
+    filters = [''] + [f'&tags={slug}' for slug in slugs]
+    if len(slugs) > 1:
+        filters.append(''.join(f'&tags={slug}' for slug in slugs))
+    return [
+        f'/api/recipes/?page={page}&limit={settings.PRERENDER_LIST_LIMIT}'
+        f'{tags}'
+        for page in range(1, settings.PRERENDER_LIST_PAGES + 1)
+        for tags in filters
+    ]
+
+
+def all_paths():
+    return list_paths() + [
+        detail_path(pk) for pk in
+        Recipe.objects.order_by('pk').values_list('pk', flat=True)
+    ]
+
+
+def render(path):
+    """Тело ответа анонимному GET-запросу или None, если ответ не 200."""
+    from api.views import RecipeViewSet
+
+    request = RequestFactory(HTTP_HOST=settings.PRERENDER_HOST).get(
+        path, HTTP_CACHE_CONTROL='no-cache')
+    request.user = AnonymousUser()
+    parts = request.path_info.strip('/').split('/')
+    if len(parts) == 3:
+        view = RecipeViewSet.as_view(
+            {'get': 'retrieve'}, throttle_classes=())
+        response = view(request, pk=parts[2])
+    else:
+        view = RecipeViewSet.as_view({'get': 'list'}, throttle_classes=())
+        response = view(request)
+    if response.status_code != 200:
+        return None
+    return response.render().content
+
+
+def write(path, content, root=None):
+    target = file_path(path, root)
+    directory = os.path.dirname(target)
+    os.makedirs(directory, exist_ok=True)
+    fd, temporary = tempfile.mkstemp(dir=directory, suffix='.tmp')
+    try:
+        with os.fdopen(fd, 'wb') as file:
+            file.write(content)
+        os.chmod(temporary, 0o644)
+        os.replace(temporary, target)
+    except BaseException:
+        os.unlink(temporary)
+        raise
+
+
+def remove(path, root=None):
+    try:
+        os.unlink(file_path(path, root))
+    except FileNotFoundError:
+        pass
+
+
+def build(path, root=None):
+    """Пересчитывает копию пути; True, если файл записан."""
+    content = render(path)
+    if content is None:
+        remove(path, root)
+        return False
+    write(path, content, root)
+    return True
+
+
+def refresh():
+    """Пересчитывает отложенные рецепты и страницы списка."""
+    with _pending_lock:
+        recipes = sorted(_pending)
+        _pending.clear()
+    if not recipes:
+        return
+    for pk in recipes:
+        build(detail_path(pk))
+    for path in list_paths():
+        build(path)
+
+
+def schedule(recipes):
+    """
+    Откладывает пересчёт копий рецептов до коммита. Изменения нескольких
+    рецептов, накопленные до запуска пересчёта, обрабатываются вместе.
+    """
+    if not settings.PRERENDER_ENABLED:
+        return
+    with _pending_lock:
+        _pending.update(
+            pk if isinstance(pk, int) else pk['pk'] for pk in recipes)
+    run_after_commit(refresh)
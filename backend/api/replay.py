@@ -0,0 +1,256 @@
+"""
+Воспроизведение записанного трафика (команда replay_traffic).
+
+Источники — access.log nginx (формат replay из infra/nginx.conf или
+обычный combined) и файлы CaptureMiddleware. id пользователей в путях
+заменяются псевдонимами ещё при чтении журнала nginx, токены не
+записываются вовсе. Перед воспроизведением запросы отображаются на
+локальную базу (например, заполненную seed_data): id рецептов и
+псевдонимы пользователей детерминированно переводятся в локальные id,
+незнакомые слаги тегов — в локальные, префикс поиска ингредиента — в
+префикс той же длины от локального названия. Поэтому сохраняется
+структура нагрузки: сочетания фильтров, limit, recipes_limit, длины
+префиксов и доля авторизованных запросов. Авторизованный клиент
+получает токен локального пользователя, одного и того же для одного
+псевдонима.
+"""
+import hashlib
+import json
+import re
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+from urllib.error import HTTPError, URLError
+from urllib.parse import parse_qsl, urlencode, urlsplit, urlunsplit
+from urllib.request import Request, urlopen
+
+from rest_framework.authtoken.models import Token
+
+from foodgram.capture import anonymize, pseudonym
+from recipes.models import Ingredient, Recipe, Tag
+from users.models import User
+
+# Строка access.log в формате combined; время ответа и признак
+# авторизации есть только в формате replay.
+NGINX_LINE = re.compile(
+    r'^(?P<addr>\S+) \S+ \S+ \[(?P<time>[^\]]+)\] '
+    r'"(?P<method>[A-Z]+) (?P<path>\S+) [^"]*" (?P<status>\d{3}) '
+    r'(?P<bytes>\S+) '
+    r'"[^"]*" "(?P<agent>[^"]*)"'
+    r'(?: (?P<duration>[\d.]+) (?P<authorized>\S+))?')
+NUMBER = re.compile(r'^\d+$')
+PSEUDONYM = re.compile(r'^u[0-9a-f]{16}$')
+SAFE_METHODS = ('GET', 'HEAD')
+# Изменяющие запросы без тела, которые можно воспроизвести.
+WRITE_ROUTES = re.compile(
+    r'^/api/(recipes/[^/]+/(favorite|shopping_cart)|users/[^/]+/subscribe)/$')
+
+
+def parse_nginx(line):
+    match = NGINX_LINE.match(line)
+    if match is None or not match['path'].startswith('/api/'):
+        return None
+    client = None
+    if match['authorized'] == 'auth':
+        client = pseudonym(f'{match["addr"]} {match["agent"]}')
+    return {
+        'time': datetime.strptime(
+            match['time'], '%d/%b/%Y:%H:%M:%S %z').timestamp(),
+        'method': match['method'],
+        'path': anonymize(match['path']),
+        'status': int(match['status']),
+        'bytes': int(match['bytes']) if match['bytes'].isdigit() else 0,
+        'duration': (
+            float(match['duration']) if match['duration'] else None),
+        'client': client,
+    }
+
+
+def read(paths):
+    """Записи из файлов nginx и CaptureMiddleware в порядке времени."""
+    records = []
+    for path in paths:
+        with open(path, encoding='utf-8', errors='replace') as stream:
+            for line in stream:
+                if line.startswith('{'):
+                    record = json.loads(line)
+                else:
+                    record = parse_nginx(line)
+                if record is not None:
+                    records.append(record)
+    records.sort(key=lambda record: record['time'])
+    return records
+
+
+def replayable(record, writes=False):
+    if record['method'] in SAFE_METHODS:
+        return True
+    return (
+        writes
+        and record['method'] in ('POST', 'DELETE')
+        and WRITE_ROUTES.match(urlsplit(record['path']).path) is not None
+    )
+
+
+def route(path):
+    """Шаблон пути для отчёта: id заменены, параметры отсортированы."""
+    parts = urlsplit(path)
+    segments = [
+        '{id}' if NUMBER.match(segment) or PSEUDONYM.match(segment)
+        else segment
+        for segment in parts.path.split('/')
+    ]
+    keys = sorted({
+        key for key, _ in parse_qsl(parts.query, keep_blank_values=True)})
+    template = '/'.join(segments)
+    return f'{template}?{"&".join(keys)}' if keys else template
+
+
+class Dataset:
+    """Локальные объекты, на которые отображаются записанные запросы."""
+
+    def __init__(self):
+        self.recipes = list(
+            Recipe.objects.order_by('pk').values_list('pk', flat=True))
+        self.users = list(User.objects.filter(is_active=True).order_by(
+            'pk').values_list('pk', flat=True))
+        self.tags = list(
+            Tag.objects.order_by('slug').values_list('slug', flat=True))
+        self.known_tags = set(self.tags)
+        self.ingredients = list(Ingredient.objects.order_by(
+            'pk').values_list('name', flat=True))
+        self.tokens = {}
+
+    @staticmethod
+    def pick(items, key):
+        """Один и тот же элемент items для одного и того же key."""
+        if not items:
+            return key
+        digest = hashlib.blake2b(str(key).encode(), digest_size=8).digest()
+        return items[int.from_bytes(digest, 'big') % len(items)]
+
+    def user(self, key):
+        return self.pick(self.users, ('user', key))
+
+    def recipe(self, key):
+        return self.pick(self.recipes, ('recipe', key))
+
+    def tag(self, slug):
+        if slug in self.known_tags:
+            return slug
+        return self.pick(self.tags, ('tag', slug))
+
+    def prefix(self, value):
+        if not value:
+            return value
+        return self.pick(self.ingredients, ('ingredient', value))[
+            :len(value)]
+
+    def path(self, path):
+        """Записанный путь, переведённый на локальные объекты."""
+        parts = urlsplit(path)
+        segments = parts.path.split('/')
+        # ['', 'api', <ресурс>, <id>, ...]
+        if len(segments) > 4 and segments[1] == 'api':
+            resource, key = segments[2], segments[3]
+            if resource == 'recipes' and NUMBER.match(key):
+                segments[3] = str(self.recipe(key))
+            elif resource == 'users' and (
+                    NUMBER.match(key) or PSEUDONYM.match(key)):
+                segments[3] = str(self.user(key))
+        resource = segments[2] if len(segments) > 2 else ''
+        query = []
+        for key, value in parse_qsl(parts.query, keep_blank_values=True):
+            if key == 'author' and value:
+                value = str(self.user(value))
+            elif key == 'ids':
+                value = ','.join(
+                    str(self.recipe(item)) if NUMBER.match(item) else item
+                    for item in value.split(','))
+            elif key == 'tags':
+                value = self.tag(value)
+            elif key == 'name' and resource == 'ingredients':
+                value = self.prefix(value)
+            query.append((key, value))
+        return urlunsplit(
+            ('', '', '/'.join(segments), urlencode(query), ''))
+
+    def token(self, client):
+        """Токен локального пользователя для псевдонима клиента."""
+        user_id = self.user(client)
+        if user_id not in self.tokens:
+            self.tokens[user_id] = Token.objects.get_or_create(
+                user_id=user_id)[0].key
+        return self.tokens[user_id]
+
+
+def plan(records, dataset, speed=1.0, writes=False, max_gap=None):
+    """
+    Запросы для воспроизведения: (момент отправки в секундах от начала
+    или None при максимальной скорости, метод, маршрут, путь, заголовки).
+    speed — во сколько раз быстрее оригинала, None — без пауз; паузы
+    между соседними запросами дольше max_gap секунд записи сокращаются
+    до max_gap.
+    """
+    requests = []
+    elapsed = previous = None
+    for record in records:
+        if not replayable(record, writes):
+            continue
+        if previous is None:
+            elapsed = 0.0
+        else:
+            gap = record['time'] - previous
+            elapsed += gap if max_gap is None else min(gap, max_gap)
+        previous = record['time']
+        headers = {}
+        if record['client'] is not None:
+            headers['Authorization'] = (
+                f'Token {dataset.token(record["client"])}')
+        requests.append((
+            None if speed is None else elapsed / speed,
+            record['method'],
+            route(record['path']),
+            dataset.path(record['path']),
+            headers,
+        ))
+    return requests
+
+
+def replay(requests, base_url, concurrency, timeout=30):
+    """
+    Отправляет запросы по расписанию. Возвращает (маршрут, код ответа
+    или None, длительность, опоздание относительно расписания) и общее
+    время.
+    """
+    base_url = base_url.rstrip('/')
+    started = time.perf_counter()
+
+    def fetch(due, method, template, path, headers):
+        begin = time.perf_counter()
+        late = 0.0 if due is None else max(0.0, begin - started - due)
+        try:
+            with urlopen(
+                    Request(base_url + path, method=method, headers=headers),
+                    timeout=timeout) as response:
+                response.read()
+                code = response.status
+        except HTTPError as error:
+            code = error.code
+        except (URLError, OSError):
+            code = None
+        return template, code, time.perf_counter() - begin, late
+
+    futures = []
+    with ThreadPoolExecutor(concurrency) as executor:
+        for request in requests:
+            due = request[0]
+            if due is not None:
+                delay = started + due - time.perf_counter()
+                if delay > 0:
+                    time.sleep(delay)
+            futures.append(executor.submit(fetch, *request))
+    return (
+        [future.result() for future in futures],
+        time.perf_counter() - started,
+    )
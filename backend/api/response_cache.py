@@ -0,0 +1,149 @@
+"""
+Кеш ответов чтения рецептов с объединением одинаковых запросов.
+
+Кешируются ответы анонимам: ответы авторизованным содержат флаги
+пользователя и общими быть не могут. Запись кеша помечена ETag из
+api.conditional, поэтому актуальность проверяется без сериализации.
+
+Когда запись устарела или её нет, ответ строит только один запрос:
+внутри воркера остальные ждут его результата, между воркерами
+очерёдность задаёт блокировка в кеше (cache.add). Пока новая версия
+строится, устаревшая отдаётся остальным запросам, если с её изменения
+прошло не больше RESPONSE_CACHE_STALE_SECONDS.
+
+Запрос с Cache-Control: no-cache (так статические копии пересчитывает
+api.prerender) получает свежий ответ: кеш не читается, а обновляется.
+"""
+import hashlib
+import threading
+import time
+import uuid
+
+from django.conf import settings
+from django.core.cache import cache
+
+from foodgram import metrics
+
+
+class Flight:
+    """Построение ответа, результата которого ждут другие потоки."""
+
+    def __init__(self):
+        self.done = threading.Event()
+        self.entry = None
+
+
+_flights = {}
+_flights_lock = threading.Lock()
+
+
+def _cache_key(request):
+    digest = hashlib.blake2b(
+        request.get_full_path().encode(), digest_size=16).hexdigest()
+    return f'response:{digest}'
+
+
+def _count(result):
+    metrics.inc('cache_requests_total', cache='recipes', result=result)
+
+
+def _wait_shared(key, etag):
+    """Ждёт, пока запись с версией etag построит другой воркер."""
+    deadline = time.monotonic() + settings.RESPONSE_CACHE_LOCK_TIMEOUT
+    while time.monotonic() < deadline:
+        time.sleep(settings.RESPONSE_CACHE_POLL_INTERVAL)
+        entry = cache.get(key)
+        if entry is not None and entry[0] == etag:
+            return entry
+    return None
+
+
+def _build(key, etag, last_modified, compute, wait):
+    """
+    Строит запись под блокировкой в кеше. Если блокировку держит другой
+    воркер, ждёт его результата (wait=True) или возвращает None.
+    """
+    lock = f'{key}:lock'
+    token = uuid.uuid4().hex
+    acquired = cache.add(lock, token, settings.RESPONSE_CACHE_LOCK_TIMEOUT)
+    if not acquired:
+        if not wait:
+            return None
+        entry = _wait_shared(key, etag)
+        if entry is not None:
+            return entry
+        # Другой воркер не успел построить запись: строим сами, но чужую
+        # блокировку не трогаем.
+        acquired = cache.add(
+            lock, token, settings.RESPONSE_CACHE_LOCK_TIMEOUT)
+    try:
+        entry = (etag, last_modified, compute())
+        cache.set(key, entry, settings.RESPONSE_CACHE_TIMEOUT)
+        return entry
+    finally:
+        # Блокировка могла истечь за время построения и достаться другому
+        # воркеру: снимается только своя.
+        if acquired and cache.get(lock) == token:
+            cache.delete(lock)
+
+
+def _fly(key, etag, last_modified, compute, stale):
+    """
+    Одно построение записи на воркер. Пока оно идёт, остальные потоки
+    получают stale, если он есть, или ждут результата.
+    """
+    with _flights_lock:
+        flight = _flights.get((key, etag))
+        leader = flight is None
+        if leader:
+            flight = _flights[key, etag] = Flight()
+    if not leader:
+        if stale is not None:
+            _count('stale')
+            return stale
+        flight.done.wait(settings.RESPONSE_CACHE_LOCK_TIMEOUT)
+        if flight.entry is not None:
+            _count('coalesced')
+            return flight.entry
+        return etag, last_modified, compute()
+    try:
+        flight.entry = _build(
+            key, etag, last_modified, compute, wait=stale is None)
+        if flight.entry is None:
+            _count('stale')
+            return stale
+        _count('miss')
+        return flight.entry
+    finally:
+        with _flights_lock:
+            del _flights[key, etag]
+        flight.done.set()
+
+
+def fetch(request, etag, last_modified, compute):
+    """
+    Данные ответа: (etag, last_modified, data). При отдаче устаревшей
+    записи возвращаются её etag и last_modified.
+    """
+    if (
+        not settings.RESPONSE_CACHE_ENABLED
+        or etag is None
+        or request.user.is_authenticated
+    ):
+        return etag, last_modified, compute()
+    key = _cache_key(request)
+    if 'no-cache' in request.headers.get('Cache-Control', ''):
+        entry = (etag, last_modified, compute())
+        cache.set(key, entry, settings.RESPONSE_CACHE_TIMEOUT)
+        _count('miss')
+        return entry
+    entry = cache.get(key)
+    if entry is not None and entry[0] == etag:
+        _count('hit')
+        return entry
+    stale = None
+    if entry is not None and last_modified is not None:
+        age = time.time() - last_modified
+        if age <= settings.RESPONSE_CACHE_STALE_SECONDS:
+            stale = entry
+    return _fly(key, etag, last_modified, compute, stale)
@@ -1,12 +1,17 @@
 import base64
+from datetime import timedelta
 
+from django.conf import settings
 from django.core.files.base import ContentFile
 from django.db import transaction
+from django.utils import timezone
 from djoser import serializers as djoser_serializers
 from rest_framework import serializers
-from rest_framework.relations import SlugRelatedField
 from rest_framework.validators import ValidationError
 
+from foodgram import metrics
+from recipes import outbox, similarity
+from recipes.background import run_after_commit
 from recipes.models import (
     Favorited,
     Ingredient,
@@ -15,7 +20,8 @@ from recipes.models import (
     ShoppingCart,
     Tag,
 )
-from users.models import Follow, User
+from recipes.storage import release
+from users.models import User
 
 
 class Base64ImageField(serializers.ImageField):
@@ -27,11 +33,14 @@ class Base64ImageField(serializers.ImageField):
 
     def to_internal_value(self, data):
         if isinstance(data, str) and data.startswith('data:image'):
-            format, imgstr = data.split(';base64,')
-            ext = format.split('/')[-1]
-            data = ContentFile(base64.b64decode(imgstr), name='temp.' + ext)
+            with metrics.timer('image_processing_seconds', stage='decode'):
+                format, imgstr = data.split(';base64,')
+                ext = format.split('/')[-1]
+                data = ContentFile(
+                    base64.b64decode(imgstr), name='temp.' + ext)
 
-        return super().to_internal_value(data)
+        with metrics.timer('image_processing_seconds', stage='validate'):
+            return super().to_internal_value(data)
 
 
 class CustomUserSerializer(djoser_serializers.UserSerializer):
@@ -79,42 +88,6 @@ class CreateUserSerializer(djoser_serializers.UserCreateSerializer):
         read_only_fields = ('id',)
 
 
-class FollowSerializer(serializers.ModelSerializer):
-    """Сериализатор для модели Follow."""
-
-    user = SlugRelatedField(
-        queryset=User.objects.all(),
-        slug_field='username',
-        default=serializers.CurrentUserDefault(),
-    )
-    following = SlugRelatedField(
-        queryset=User.objects.all(), slug_field='username'
-    )
-
-    def validate(self, data):
-        request = self.context['request']
-        if request.method == 'POST':
-            if data['user'] == data['following']:
-                raise serializers.ValidationError(
-                    'Невозможно подписаться на самого себя'
-                )
-        if request.method == 'DELETE':
-            follow = Follow.objects.filter(
-                user=data['user'], following=data['following']
-            )
-            if not follow.exists():
-                raise ValidationError('Подписики не существует')
-        return data
-
-    class Meta:
-        model = Follow
-        fields = (
-            'id',
-            'user',
-            'following',
-        )
-
-
 class FollowUserSerializer(CustomUserSerializer):
     """Сериализатор для модели Follow."""
 
@@ -196,6 +169,8 @@ class RecipeReadSerializer(serializers.ModelSerializer):
 
     def get_is_favorited(self, obj):
         """Отмечен ли рецепт как избранный текущим пользователем."""
+        if hasattr(obj, 'is_favorited'):
+            return obj.is_favorited
         user = self.context.get('request').user
         return (
             not user.is_anonymous
@@ -204,6 +179,8 @@ class RecipeReadSerializer(serializers.ModelSerializer):
 
     def get_is_in_shopping_cart(self, obj):
         """Находится ли рецепт в корзине текущего пользователя."""
+        if hasattr(obj, 'is_in_shopping_cart'):
+            return obj.is_in_shopping_cart
         user = self.context.get('request').user
         return (
             not user.is_anonymous
@@ -283,6 +260,9 @@ class RecipeWriteSerializer(serializers.ModelSerializer):
         recipe = Recipe.objects.create(**validated_data)
         recipe.tags.set(tags_data)
         self._add_ingredients(ingredients_data, recipe)
+        outbox.record(
+            outbox.RECIPE, outbox.CREATED, recipe.pk, author=recipe.author_id)
+        similarity.schedule_update(recipe)
         return recipe
 
     @transaction.atomic
@@ -290,10 +270,17 @@ class RecipeWriteSerializer(serializers.ModelSerializer):
         """Обновляет рецепт."""
         ingredients_data = validated_data.pop('ingredients_amounts')
         tags_data = validated_data.pop('tags')
+        old_image = instance.image.name
         super().update(instance, validated_data)
+        if instance.image.name != old_image:
+            run_after_commit(release, Recipe, 'image', [old_image])
         instance.tags.set(tags_data)
         instance.ingredients.clear()
         self._add_ingredients(ingredients_data, instance)
+        outbox.record(
+            outbox.RECIPE, outbox.UPDATED, instance.pk,
+            author=instance.author_id)
+        similarity.schedule_update(instance)
         return instance
 
     def to_representation(self, instance):
@@ -332,53 +319,20 @@ class IngredientSerializer(serializers.ModelSerializer):
         )
 
 
-class FavoritedSerializer(serializers.ModelSerializer):
-    """
-    Сериализатор для получения/добавления/удаления рецепта из/в избранного/е
-    у текущего пользователя.
-    """
-    def validate(self, data):
-        request = self.context['request']
-        author = data['author']
-        recipe = data['recipe']
-        favorites = recipe.favorites.filter(author=author)
-        if request.method == 'POST':
-            if favorites.exists():
-                raise ValidationError('Рецепт уже есть в избранном.')
-        if request.method == 'DELETE':
-            if not favorites.exists():
-                raise ValidationError('Рецепт не найден в избранном.')
-        return data
-
-    class Meta:
-        model = Favorited
-        fields = (
-            'author',
-            'recipe',
-        )
+class StatsPeriodSerializer(serializers.Serializer):
+    """Период статистики: по умолчанию последние STATS_DEFAULT_DAYS дней."""
 
+    date_from = serializers.DateField(required=False)
+    date_to = serializers.DateField(required=False)
 
-class ShoppingCartSerializer(serializers.ModelSerializer):
-    """
-    Сериализатор для получения/добавления/удаления рецепта из/в списка покупок
-    у текущего пользователя.
-    """
     def validate(self, data):
-        request = self.context['request']
-        author = data['author']
-        recipe = data['recipe']
-        shopping_cart = recipe.shopping_cart.filter(author=author)
-        if request.method == 'POST':
-            if shopping_cart.exists():
-                raise ValidationError('Рецепт уже есть в списке покупок.')
-        if request.method == 'DELETE':
-            if not shopping_cart.exists():
-                raise ValidationError('Рецепта нет в списке покупок.')
-        return data
-
-    class Meta:
-        model = ShoppingCart
-        fields = (
-            'author',
-            'recipe',
-        )
+        date_to = data.get('date_to') or timezone.localdate()
+        date_from = data.get('date_from') or date_to - timedelta(
+            days=settings.STATS_DEFAULT_DAYS - 1)
+        if date_from > date_to:
+            raise ValidationError('date_from не может быть позже date_to.')
+        if (date_to - date_from).days >= settings.STATS_MAX_DAYS:
+            raise ValidationError(
+                f'Период не может быть длиннее {settings.STATS_MAX_DAYS} '
+                f'дней.')
+        return {'date_from': date_from, 'date_to': date_to}
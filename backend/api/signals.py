@@ -0,0 +1,9 @@
+from django.dispatch import receiver
+
+from api import prerender
+from recipes.signals import recipes_changed
+
+
+@receiver(recipes_changed)
+def prerender_changed_recipes(sender, recipes, **kwargs):
+    prerender.schedule(recipes)
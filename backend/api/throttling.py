@@ -0,0 +1,195 @@
+"""
+Ограничение частоты запросов по алгоритму token bucket.
+
+Состояние корзин хранится в общем для всех воркеров gunicorn файле,
+отображённом в память (MmapBucketStore): открытая адресация, по 24 байта
+на корзину, без блокировок. Гонка двух воркеров за одну корзину может
+потерять одно списание — для защиты от перегрузки это допустимо и
+дешевле межпроцессной блокировки. Для нескольких серверов есть
+RedisBucketStore с атомарным Lua-скриптом.
+"""
+import hashlib
+import mmap
+import os
+import struct
+import time
+
+from django.conf import settings
+from django.core.exceptions import ImproperlyConfigured
+from django.utils.module_loading import import_string
+from rest_framework.permissions import SAFE_METHODS
+from rest_framework.throttling import BaseThrottle
+
+SLOT = struct.Struct('<Qdd')
+PROBES = 8
+DURATIONS = {'s': 1, 'm': 60, 'h': 3600, 'd': 86400}
+
+
+def key_hash(key):
+    """Стабильный между процессами 64-битный хеш ключа (0 — пустой слот)."""
+    digest = hashlib.blake2b(key.encode(), digest_size=8).digest()
+    return int.from_bytes(digest, 'little') or 1
+
+
+def parse_rate(rate):
+    """'60/min' -> (ёмкость корзины, пополнение в токенах в секунду)."""
+    num, period = rate.split('/')
+    capacity = int(num)
+    return capacity, capacity / DURATIONS[period[0]]
+
+
+class MmapBucketStore:
+    """Таблица корзин в файле, разделяемом воркерами через mmap."""
+
+    def __init__(self, path, slots=65536):
+        self.path = path
+        self.slots = slots
+        self._map = None
+
+    def _table(self):
+        if self._map is None:
+            size = self.slots * SLOT.size
+            fd = os.open(self.path, os.O_RDWR | os.O_CREAT, 0o600)
+            try:
+                if os.fstat(fd).st_size < size:
+                    os.ftruncate(fd, size)
+                self._map = mmap.mmap(fd, size)
+            finally:
+                os.close(fd)
+        return self._map
+
+    def _find(self, table, hashed):
+        """Слот ключа, свободный слот или самый давний из проверенных."""
+        start = hashed % self.slots
+        oldest, oldest_time = start, float('inf')
+        for probe in range(PROBES):
+            offset = ((start + probe) % self.slots) * SLOT.size
+            slot_key, tokens, updated = SLOT.unpack_from(table, offset)
+            if slot_key == hashed:
+                return offset, tokens, updated
+            if slot_key == 0:
+                return offset, None, None
+            if updated < oldest_time:
+                oldest, oldest_time = offset, updated
+        return oldest, None, None
+
+    def consume(self, key, capacity, rate, now):
+        table = self._table()
+        hashed = key_hash(key)
+        offset, tokens, updated = self._find(table, hashed)
+        if tokens is None:
+            tokens = capacity
+        else:
+            tokens = min(capacity, tokens + (now - updated) * rate)
+        allowed = tokens >= 1
+        if allowed:
+            tokens -= 1
+        SLOT.pack_into(table, offset, hashed, tokens, now)
+        return allowed, tokens
+
+
+class RedisBucketStore:
+    """Корзины в Redis (или совместимом хранилище), атомарно через Lua."""
+
+    SCRIPT = """
+    local state = redis.call('HMGET', KEYS[1], 't', 'u')
+    local capacity = tonumber(ARGV[1])
+    local rate = tonumber(ARGV[2])
+    local now = tonumber(ARGV[3])
+    local tokens = tonumber(state[1]) or capacity
+    local updated = tonumber(state[2]) or now
+    tokens = math.min(capacity, tokens + (now - updated) * rate)
+    local allowed = 0
+    if tokens >= 1 then
+        tokens = tokens - 1
+        allowed = 1
+    end
+    redis.call('HSET', KEYS[1], 't', tokens, 'u', now)
+    redis.call('EXPIRE', KEYS[1], math.ceil(capacity / rate) + 1)
+    return {allowed, tostring(tokens)}
+    """
+
+    def __init__(self, url):
+        try:
+            import redis
+        except ImportError:
+            raise ImproperlyConfigured(
+                'Для RedisBucketStore нужен пакет redis.')
+        self._script = redis.Redis.from_url(url).register_script(self.SCRIPT)
+
+    def consume(self, key, capacity, rate, now):
+        allowed, tokens = self._script(
+            keys=[f'throttle:{key}'], args=[capacity, rate, now])
+        return bool(allowed), float(tokens)
+
+
+_store = None
+
+
+def get_store():
+    global _store
+    if _store is None:
+        options = dict(settings.THROTTLE_STORE)
+        _store = import_string(options.pop('BACKEND'))(**options)
+    return _store
+
+
+class TokenBucketThrottle(BaseThrottle):
+    """
+    Базовый класс: корзина на пользователя, для анонимов — на IP.
+    Скоуп определяет get_scope, лимит берётся из DEFAULT_THROTTLE_RATES.
+    """
+
+    def get_scope(self, request, view):
+        raise NotImplementedError
+
+    def allow_request(self, request, view):
+        self.wait_time = None
+        scope = self.get_scope(request, view)
+        if scope is None:
+            return True
+        rate = settings.REST_FRAMEWORK['DEFAULT_THROTTLE_RATES'].get(scope)
+        if rate is None:
+            return True
+        capacity, refill = parse_rate(rate)
+        if request.user and request.user.is_authenticated:
+            ident = f'user:{request.user.pk}'
+        else:
+            ident = f'ip:{self.get_ident(request)}'
+        allowed, tokens = get_store().consume(
+            f'{scope}:{ident}', capacity, refill, time.time())
+        if not allowed:
+            self.wait_time = (1 - tokens) / refill
+        return allowed
+
+    def wait(self):
+        return self.wait_time
+
+
+class UserRateThrottle(TokenBucketThrottle):
+    """Общий лимит на все запросы пользователя или IP."""
+
+    def get_scope(self, request, view):
+        if request.user and request.user.is_authenticated:
+            return 'user'
+        return 'anon'
+
+
+class WriteRateThrottle(TokenBucketThrottle):
+    """Лимит на изменяющие запросы (POST, PATCH, DELETE)."""
+
+    def get_scope(self, request, view):
+        if request.method not in SAFE_METHODS:
+            return 'write'
+        return None
+
+
+class ActionRateThrottle(TokenBucketThrottle):
+    """
+    Лимит на дорогие действия: view.throttle_scopes сопоставляет имени
+    действия скоуп (upload, export, search).
+    """
+
+    def get_scope(self, request, view):
+        scopes = getattr(view, 'throttle_scopes', {})
+        return scopes.get(getattr(view, 'action', None))
@@ -0,0 +1,67 @@
+"""
+Добавление и удаление связей «пользователь — объект» (избранное, список
+покупок, подписки) одним запросом к БД.
+
+INSERT ... SELECT ... ON CONFLICT DO NOTHING и DELETE ... RETURNING
+атомарны, поэтому одновременные повторные нажатия не приводят к ошибке
+уникальности: результат определяется числом затронутых строк. Целевой
+объект выбирается через менеджер по умолчанию, поэтому удалённые
+рецепты и пользователи (is_deleted) недоступны так же, как в остальном
+API.
+"""
+from django.db import connection
+from django.http import Http404
+
+
+def _quote(name):
+    return connection.ops.quote_name(name)
+
+
+def _target_pk(target_model, target_id):
+    try:
+        return target_model._meta.pk.to_python(target_id)
+    except Exception:
+        raise Http404
+
+
+def add_link(model, owner_field, owner_id, target_field, target_id):
+    """
+    Создаёт связь, если её ещё нет и целевой объект существует и не
+    удалён. Возвращает True, если строка добавлена.
+    """
+    meta = model._meta
+    owner = meta.get_field(owner_field)
+    target = meta.get_field(target_field)
+    target_model = target.related_model
+    visible, params = target_model._default_manager.filter(
+        pk=_target_pk(target_model, target_id),
+    ).order_by().values('pk').query.sql_with_params()
+    # WHERE true нужен SQLite, чтобы отличить ON CONFLICT от условия
+    # соединения в INSERT ... SELECT.
+    sql = (
+        f'INSERT INTO {_quote(meta.db_table)} '
+        f'({_quote(owner.column)}, {_quote(target.column)}) '
+        f'SELECT %s, visible.{_quote(target_model._meta.pk.column)} '
+        f'FROM ({visible}) AS visible WHERE true '
+        f'ON CONFLICT DO NOTHING RETURNING {_quote(meta.pk.column)}'
+    )
+    with connection.cursor() as cursor:
+        cursor.execute(sql, [owner_id, *params])
+        return cursor.fetchone() is not None
+
+
+def delete_link(model, owner_field, owner_id, target_field, target_id):
+    """Удаляет связь. Возвращает True, если строка была удалена."""
+    meta = model._meta
+    owner = meta.get_field(owner_field)
+    target = meta.get_field(target_field)
+    sql = (
+        f'DELETE FROM {_quote(meta.db_table)} '
+        f'WHERE {_quote(owner.column)} = %s '
+        f'AND {_quote(target.column)} = %s '
+        f'RETURNING {_quote(meta.pk.column)}'
+    )
+    with connection.cursor() as cursor:
+        cursor.execute(
+            sql, [owner_id, _target_pk(target.related_model, target_id)])
+        return cursor.fetchone() is not None
@@ -1,10 +1,13 @@
+from django.conf import settings
 from django.urls import include, path
 from rest_framework.routers import DefaultRouter
 
+from api import async_views
 from api.views import (
     CustomUserViewSet,
     IngredientViewSet,
     RecipeViewSet,
+    StatsView,
     TagViewSet,
 )
 
@@ -20,4 +23,37 @@ router_v1.register(r'ingredients', IngredientViewSet, basename='ingredient')
 urlpatterns = [
     path('', include(router_v1.urls)),
     path('auth/', include('djoser.urls.authtoken')),
+    path('stats/', StatsView.as_view(), name='stats'),
 ]
+
+if settings.ASYNC_READ_API:
+    urlpatterns = [
+        path('recipes/', async_views.async_read_view(
+            async_views.recipe_list,
+            RecipeViewSet.as_view(
+                {'get': 'list', 'post': 'create'},
+                basename='recipe', detail=False),
+        ), name='async-recipe-list'),
+        path('recipes/<int:pk>/', async_views.async_read_view(
+            async_views.recipe_detail,
+            RecipeViewSet.as_view(
+                {'get': 'retrieve', 'patch': 'partial_update',
+                 'put': 'update', 'delete': 'destroy'},
+                basename='recipe', detail=True),
+        ), name='async-recipe-detail'),
+        path('tags/', async_views.async_read_view(
+            async_views.tag_list,
+            TagViewSet.as_view(
+                {'get': 'list', 'post': 'create'},
+                basename='tag', detail=False),
+        ), name='async-tag-list'),
+        path('ingredients/', async_views.async_read_view(
+            async_views.ingredient_list,
+            IngredientViewSet.as_view(
+                {'get': 'list', 'post': 'create'},
+                basename='ingredient', detail=False),
+        ), name='async-ingredient-list'),
+        path('users/subscriptions/', async_views.async_read_view(
+            async_views.subscriptions,
+        ), name='async-user-subscriptions'),
+    ] + urlpatterns
@@ -1,27 +1,51 @@
+from functools import partial
+
+from django.conf import settings
+from django.db import transaction
 from django.db.models import Sum
 from django.http import HttpResponse
 from django.shortcuts import get_object_or_404
 from django_filters.rest_framework import DjangoFilterBackend
+from djoser import utils as djoser_utils
 from djoser import views as djoser_views
 from rest_framework import status, viewsets
 from rest_framework.decorators import action
-from rest_framework.permissions import SAFE_METHODS, IsAuthenticated
+from rest_framework.permissions import (
+    SAFE_METHODS,
+    IsAdminUser,
+    IsAuthenticated,
+)
 from rest_framework.response import Response
+from rest_framework.validators import ValidationError
+from rest_framework.views import APIView
 
-from api.paginations import ApiPagination
+from api import batch, conditional, fast_serializers, response_cache
+from api.paginations import ApiPagination, FeedPagination
 from api.permissions import AdminOrReadOnlyPermission
-from recipes.models import Ingredient, IngredientInRecipe, Recipe, Tag
-from users.models import User
+from api.toggles import add_link, delete_link
+from recipes import counters, deletion
+from recipes import feed as feed_service
+from recipes import outbox, stats, suggestions, trending
+from recipes.models import (
+    AuthorSuggestion,
+    Favorited,
+    Ingredient,
+    IngredientInRecipe,
+    Recipe,
+    ShoppingCart,
+    SimilarRecipe,
+    Tag,
+)
+from users.models import Follow, User
 
-from .filters import IngredientFilter, RecipeFilter
+from .filters import VOLATILE_ORDERINGS, IngredientFilter, RecipeFilter
 from .serializers import (
-    FavoritedSerializer,
-    FollowSerializer,
     FollowUserSerializer,
     IngredientSerializer,
+    RecipeMiniSerializer,
     RecipeReadSerializer,
     RecipeWriteSerializer,
-    ShoppingCartSerializer,
+    StatsPeriodSerializer,
     TagSerializer,
 )
 
@@ -31,21 +55,29 @@ class CustomUserViewSet(djoser_views.UserViewSet):
 
     http_method_names = ['get', 'post', 'delete']
 
+    def perform_destroy(self, instance):
+        """Скрывает пользователя, связанные данные удаляются в фоне."""
+        if instance == self.request.user:
+            djoser_utils.logout_user(self.request)
+        deletion.delete_user(instance)
+
     @action(
         detail=True, methods=['post'], permission_classes=(IsAuthenticated,))
     def subscribe(self, request, id):
         """Создаёт связь между пользователями."""
-        user_to_subscribe = get_object_or_404(User, pk=id)
-        user = request.user
-        serializer = FollowSerializer(
-            data={
-                'user': user.username,
-                'following': user_to_subscribe.username,
-            },
-            context={'request': request},
-        )
-        serializer.is_valid(raise_exception=True)
-        serializer.save()
+        if str(request.user.pk) == str(id):
+            raise ValidationError('Невозможно подписаться на самого себя')
+        with transaction.atomic():
+            added = add_link(
+                Follow, 'user', request.user.pk, 'following', id)
+            if added:
+                outbox.record(
+                    outbox.FOLLOW, outbox.ADDED, id, user=request.user.pk)
+        if not added:
+            get_object_or_404(User, pk=id)
+            raise ValidationError('Вы уже подписаны на этого автора')
+        feed_service.backfill(request.user.pk, int(id))
+        suggestions.schedule_update(request.user.pk)
         return Response(
             {'detail': 'Подписка успешно создана.'},
             status=status.HTTP_201_CREATED,)
@@ -53,18 +85,17 @@ class CustomUserViewSet(djoser_views.UserViewSet):
     @subscribe.mapping.delete
     def unsubscribe(self, request, id):
         """Удалет связь между пользователями."""
-        user_to_unsubscribe = get_object_or_404(User, pk=id)
-        user = request.user
-        serializer = FollowSerializer(
-            data={
-                'user': user.username,
-                'following': user_to_unsubscribe.username,
-            },
-            context={'request': request},
-        )
-        serializer.is_valid(raise_exception=True)
-        follow = user_to_unsubscribe.following.filter(user=user)
-        follow.delete()
+        with transaction.atomic():
+            deleted = delete_link(
+                Follow, 'user', request.user.pk, 'following', id)
+            if deleted:
+                outbox.record(
+                    outbox.FOLLOW, outbox.REMOVED, id, user=request.user.pk)
+        if not deleted:
+            get_object_or_404(User, pk=id)
+            raise ValidationError('Подписики не существует')
+        feed_service.trim(request.user.pk, int(id))
+        suggestions.schedule_update(request.user.pk)
         return Response(status=status.HTTP_204_NO_CONTENT)
 
     @action(
@@ -75,6 +106,11 @@ class CustomUserViewSet(djoser_views.UserViewSet):
     def subscriptions(self, request):
         """Отображает все подписки пользователя."""
         followed_users = User.objects.filter(following__user=self.request.user)
+        if settings.FAST_SERIALIZERS:
+            page = self.paginate_queryset(
+                fast_serializers.user_rows(followed_users))
+            return self.get_paginated_response(
+                fast_serializers.subscriptions(page, request))
         page = self.paginate_queryset(followed_users)
         if page is not None:
             serializer = self.get_serializer(page, many=True)
@@ -83,6 +119,48 @@ class CustomUserViewSet(djoser_views.UserViewSet):
         serializer = self.get_serializer(followed_users, many=True)
         return Response(serializer.data)
 
+    @action(
+        detail=False,
+        methods=['get'],
+        permission_classes=(IsAuthenticated,),
+        serializer_class=FollowUserSerializer,
+        pagination_class=None,)
+    def suggestions(self, request):
+        """Авторы, которые могут понравиться пользователю."""
+        authors = [
+            suggestion.author for suggestion in
+            AuthorSuggestion.objects.filter(
+                user=request.user, author__is_deleted=False,
+            ).exclude(
+                author__following__user=request.user,
+            ).select_related('author').order_by('-score')
+        ]
+        serializer = self.get_serializer(authors, many=True)
+        return Response(serializer.data)
+
+    @action(
+        detail=False,
+        methods=['get'],
+        permission_classes=(IsAuthenticated,),
+        serializer_class=RecipeReadSerializer,
+        pagination_class=FeedPagination,)
+    def feed(self, request):
+        """Рецепты авторов, на которых подписан пользователь."""
+        rows = self.paginator.paginate_feed(
+            partial(feed_service.page, request.user), request)
+        ids = [pk for _, pk in rows]
+        if settings.FAST_SERIALIZERS:
+            data = fast_serializers.recipes_by_id(ids, request.user)
+        else:
+            recipes = Recipe.objects.for_read(request.user).in_bulk(ids)
+            data = {
+                pk: self.get_serializer(recipe).data
+                for pk, recipe in recipes.items()
+            }
+        # Рецепт, удалённый после выбора страницы, пропускается.
+        return self.get_paginated_response(
+            [data[pk] for pk in ids if pk in data])
+
 
 class RecipeViewSet(viewsets.ModelViewSet):
     """Работа с рецептами: [GET, POST, DELETE, PATCH]."""
@@ -91,6 +169,67 @@ class RecipeViewSet(viewsets.ModelViewSet):
     pagination_class = ApiPagination
     filter_backends = (DjangoFilterBackend,)
     filterset_class = RecipeFilter
+    throttle_scopes = {
+        'create': 'upload',
+        'update': 'upload',
+        'partial_update': 'upload',
+        'download_shopping_cart': 'export',
+    }
+
+    def get_queryset(self):
+        if self.request.method in SAFE_METHODS:
+            return Recipe.objects.for_read(self.request.user)
+        return super().get_queryset()
+
+    def list(self, request, *args, **kwargs):
+        """
+        Список рецептов с ETag: если у клиента актуальная версия,
+        ответ 304 отдаётся без сериализации. С параметром ids —
+        рецепты с этими id в порядке запроса, без пагинации.
+        """
+        if 'ids' in request.query_params:
+            data, errors = batch.read(request, request.query_params['ids'])
+            if errors is not None:
+                raise ValidationError(errors)
+            return Response(data)
+        queryset = self.filter_queryset(self.get_queryset())
+        # Порядок по популярности меняется без изменения рецептов.
+        if request.query_params.get('ordering') in VOLATILE_ORDERINGS:
+            etag = last_modified = None
+        else:
+            etag, last_modified = conditional.list_validators(
+                request, queryset)
+        response = conditional.not_modified(request, etag, last_modified)
+        if response is not None:
+            return response
+
+        def compute():
+            if settings.FAST_SERIALIZERS:
+                page = self.paginate_queryset(
+                    fast_serializers.recipe_rows(queryset))
+                return self.get_paginated_response(
+                    fast_serializers.recipes(page, request.user)).data
+            page = self.paginate_queryset(queryset)
+            serializer = self.get_serializer(page, many=True)
+            return self.get_paginated_response(serializer.data).data
+
+        etag, last_modified, data = response_cache.fetch(
+            request, etag, last_modified, compute)
+        return conditional.set_validators(
+            Response(data), etag, last_modified)
+
+    def retrieve(self, request, *args, **kwargs):
+        """Рецепт с ETag и ответом 304 без сериализации."""
+        etag, last_modified = conditional.detail_validators(
+            request, self.get_queryset(), kwargs['pk'])
+        response = conditional.not_modified(request, etag, last_modified)
+        if response is not None:
+            return response
+        etag, last_modified, data = response_cache.fetch(
+            request, etag, last_modified,
+            lambda: self.get_serializer(self.get_object()).data)
+        return conditional.set_validators(
+            Response(data), etag, last_modified)
 
     def get_serializer_class(self):
         """Выбор сериализатора при безопасных и не безопасных методах."""
@@ -98,6 +237,26 @@ class RecipeViewSet(viewsets.ModelViewSet):
             return RecipeReadSerializer
         return RecipeWriteSerializer
 
+    def perform_destroy(self, instance):
+        """Скрывает рецепт, связанные данные удаляются в фоне."""
+        deletion.delete_recipe(instance)
+
+    @action(detail=True, methods=['get'])
+    def similar(self, request, pk):
+        """Рецепты, похожие на данный по ингредиентам и тегам."""
+        get_object_or_404(Recipe, pk=pk)
+        neighbours = SimilarRecipe.objects.filter(
+            recipe_id=pk,
+            similar__is_deleted=False,
+            similar__author__is_deleted=False,
+        ).select_related('similar').order_by('-score')
+        serializer = RecipeMiniSerializer(
+            [neighbour.similar for neighbour in
+             neighbours[:settings.SIMILAR_RECIPES_TOP_K]],
+            many=True,
+        )
+        return Response(serializer.data)
+
     @action(
         detail=True,
         methods=['post'],
@@ -107,15 +266,17 @@ class RecipeViewSet(viewsets.ModelViewSet):
         Получить/добавить рецепт
         из/в избранного/е у текущего пользоватля.
         """
-        serializer = FavoritedSerializer(
-            data={
-                'author': request.user.pk,
-                'recipe': pk,
-            },
-            context={'request': request},
-        )
-        serializer.is_valid(raise_exception=True)
-        serializer.save()
+        with transaction.atomic():
+            added = add_link(
+                Favorited, 'author', request.user.pk, 'recipe', pk)
+            if added:
+                counters.change_favorites(pk, 1)
+                outbox.record(
+                    outbox.FAVORITE, outbox.ADDED, pk, user=request.user.pk)
+        if not added:
+            get_object_or_404(Recipe, pk=pk)
+            raise ValidationError('Рецепт уже есть в избранном.')
+        trending.record_activity(pk, 'favorites')
         return Response(
             {'detail': 'Рецепт успешно добавлен в избранное.'},
             status=status.HTTP_201_CREATED,)
@@ -125,17 +286,17 @@ class RecipeViewSet(viewsets.ModelViewSet):
         """
         Удалить рецепт из избранного у текущего пользоватля.
         """
-        serializer = FavoritedSerializer(
-            data={
-                'author': request.user.pk,
-                'recipe': pk,
-            },
-            context={'request': request},
-        )
-        serializer.is_valid(raise_exception=True)
-        recipe = get_object_or_404(Recipe, pk=pk)
-        favorites = recipe.favorites.filter(author=request.user)
-        favorites.delete()
+        with transaction.atomic():
+            deleted = delete_link(
+                Favorited, 'author', request.user.pk, 'recipe', pk)
+            if deleted:
+                counters.change_favorites(pk, -1)
+                outbox.record(
+                    outbox.FAVORITE, outbox.REMOVED, pk,
+                    user=request.user.pk)
+        if not deleted:
+            get_object_or_404(Recipe, pk=pk)
+            raise ValidationError('Рецепт не найден в избранном.')
         return Response(status=status.HTTP_204_NO_CONTENT)
 
     @action(
@@ -147,15 +308,16 @@ class RecipeViewSet(viewsets.ModelViewSet):
         Получить/добавить рецепт из/в избранного/е из списка покупок у
         текущего пользователя.
         """
-        serializer = ShoppingCartSerializer(
-            data={
-                'author': request.user.pk,
-                'recipe': pk,
-            },
-            context={'request': request},
-        )
-        serializer.is_valid(raise_exception=True)
-        serializer.save()
+        with transaction.atomic():
+            added = add_link(
+                ShoppingCart, 'author', request.user.pk, 'recipe', pk)
+            if added:
+                outbox.record(
+                    outbox.CART, outbox.ADDED, pk, user=request.user.pk)
+        if not added:
+            get_object_or_404(Recipe, pk=pk)
+            raise ValidationError('Рецепт уже есть в списке покупок.')
+        trending.record_activity(pk, 'carts')
         return Response(
             {'detail': 'Рецепт успешно добавлен в список покупок.'},
             status=status.HTTP_201_CREATED,)
@@ -165,17 +327,15 @@ class RecipeViewSet(viewsets.ModelViewSet):
         """
         Удалить рецепт из списка покупок у текущего пользоватля.
         """
-        serializer = ShoppingCartSerializer(
-            data={
-                'author': request.user.pk,
-                'recipe': pk,
-            },
-            context={'request': request},
-        )
-        serializer.is_valid(raise_exception=True)
-        recipe = get_object_or_404(Recipe, pk=pk)
-        shopping_cart = recipe.shopping_cart.filter(author=request.user)
-        shopping_cart.delete()
+        with transaction.atomic():
+            deleted = delete_link(
+                ShoppingCart, 'author', request.user.pk, 'recipe', pk)
+            if deleted:
+                outbox.record(
+                    outbox.CART, outbox.REMOVED, pk, user=request.user.pk)
+        if not deleted:
+            get_object_or_404(Recipe, pk=pk)
+            raise ValidationError('Рецепта нет в списке покупок.')
         return Response(status=status.HTTP_204_NO_CONTENT)
 
     @action(
@@ -192,7 +352,9 @@ class RecipeViewSet(viewsets.ModelViewSet):
         user = request.user
         ingredients = (
             IngredientInRecipe.objects.filter(
-                recipe__shopping_cart__author=request.user
+                recipe__shopping_cart__author=request.user,
+                recipe__is_deleted=False,
+                recipe__author__is_deleted=False,
             )
             .values('ingredient__name', 'ingredient__measurement_unit')
             .annotate(amount=Sum('amount')))
@@ -219,6 +381,11 @@ class TagViewSet(viewsets.ModelViewSet):
     permission_classes = (AdminOrReadOnlyPermission,)
     pagination_class = None
 
+    def list(self, request, *args, **kwargs):
+        if not settings.FAST_SERIALIZERS:
+            return super().list(request, *args, **kwargs)
+        return Response(fast_serializers.tags(self.get_queryset()))
+
 
 class IngredientViewSet(viewsets.ModelViewSet):
     """Работа с ингредиентами."""
@@ -229,3 +396,22 @@ class IngredientViewSet(viewsets.ModelViewSet):
     pagination_class = None
     filter_backends = (DjangoFilterBackend,)
     filterset_class = IngredientFilter
+    throttle_scopes = {'list': 'search'}
+
+    def list(self, request, *args, **kwargs):
+        if not settings.FAST_SERIALIZERS:
+            return super().list(request, *args, **kwargs)
+        return Response(fast_serializers.ingredients(
+            self.filter_queryset(self.get_queryset())))
+
+
+class StatsView(APIView):
+    """Статистика сайта для администраторов по дневным таблицам."""
+
+    permission_classes = (IsAdminUser,)
+
+    def get(self, request):
+        serializer = StatsPeriodSerializer(data=request.query_params)
+        serializer.is_valid(raise_exception=True)
+        return Response(stats.report(
+            **serializer.validated_data, limit=settings.STATS_TOP))
@@ -0,0 +1,167 @@
+"""
+Допуск запросов при перегрузке воркера.
+
+Запросы делятся на классы по стоимости: critical (вход, текущий
+пользователь), cheap (теги, ингредиенты, в том числе поиск по началу
+названия — он идёт по индексу, один рецепт), normal и heavy (выгрузка
+списка покупок, статистика, списки с большим limit). Воркер считает
+запросы в обработке и скользящее среднее времени ответа по классам.
+Пока время ответа всех классов укладывается в цели из
+ADMISSION_LATENCY_TARGETS, принимается всё. Если время ответа какого-либо
+класса выше цели, normal и heavy не занимают последние
+ADMISSION_RESERVED потоков из ADMISSION_CONCURRENCY, а heavy выполняется
+не больше ADMISSION_HEAVY_LIMIT одновременно; если выше вдвое — normal и
+heavy отклоняются. Запрос, простоявший в очереди дольше бюджета класса
+(по заголовку X-Request-Start от nginx), тоже отклоняется: клиент всё
+равно не дождётся ответа.
+
+Отклонённый запрос сразу получает 503 с Retry-After; решения видны в
+метрике admission_rejected_total.
+"""
+import threading
+import time
+from collections import Counter
+
+from django.conf import settings
+from django.core.exceptions import MiddlewareNotUsed
+from django.http import JsonResponse
+
+from foodgram import metrics
+
+CRITICAL_PREFIXES = ('/api/auth/', '/api/users/me/', '/api/users/set_')
+HEAVY_PREFIXES = ('/api/stats/',)
+HEAVY_SUFFIXES = ('/download_shopping_cart/',)
+CHEAP_PREFIXES = ('/api/tags/', '/api/ingredients/')
+
+EWMA_WEIGHT = 0.2
+
+
+def _large_limit(request):
+    try:
+        limit = int(request.GET.get('limit', 0))
+    except ValueError:
+        return False
+    ids = request.GET.get('ids', '')
+    return (
+        limit > settings.ADMISSION_LARGE_LIMIT
+        or ids.count(',') >= settings.ADMISSION_LARGE_LIMIT
+    )
+
+
+def classify(request):
+    """Класс запроса: critical, cheap, normal или heavy."""
+    path = request.path
+    if path.startswith(CRITICAL_PREFIXES):
+        return 'critical'
+    if (
+        path.startswith(HEAVY_PREFIXES)
+        or path.endswith(HEAVY_SUFFIXES)
+        or _large_limit(request)
+    ):
+        return 'heavy'
+    if path.startswith(CHEAP_PREFIXES) or (
+        request.method == 'GET'
+        and path.startswith('/api/recipes/')
+        and path.rstrip('/').rsplit('/', 1)[-1].isdigit()
+    ):
+        return 'cheap'
+    return 'normal'
+
+
+def queue_time(request, now):
+    """Сколько запрос ждал после приёма nginx (X-Request-Start: t=<сек>)."""
+    header = request.headers.get('X-Request-Start', '')
+    try:
+        started = float(header.removeprefix('t='))
+    except ValueError:
+        return 0.0
+    return max(now - started, 0.0)
+
+
+class Admission:
+    """Запросы в обработке и время ответа по классам в одном воркере."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.in_flight = Counter()
+        self.latency = {}
+
+    def pressure(self, now):
+        """Во сколько раз время ответа превышает цель, по худшему классу."""
+        targets = settings.ADMISSION_LATENCY_TARGETS
+        return max(
+            (
+                average / targets[klass]
+                for klass, (average, updated) in self.latency.items()
+                if now - updated <= settings.ADMISSION_LATENCY_WINDOW
+            ),
+            default=0.0,
+        )
+
+    def admit(self, klass, queued, now):
+        """Причина отказа или None, если запрос принят."""
+        if klass in ('critical', 'cheap'):
+            with self._lock:
+                self.in_flight[klass] += 1
+            return None
+        if queued > settings.ADMISSION_QUEUE_BUDGETS[klass]:
+            return 'queue'
+        with self._lock:
+            pressure = self.pressure(now)
+            if pressure > 2:
+                return 'latency'
+            if pressure > 1:
+                # Пока воркер не успевает, потоки берегутся для дешёвых
+                # запросов; без перегрузки они ничего не ограничивают.
+                busy = sum(self.in_flight.values())
+                if busy >= (
+                    settings.ADMISSION_CONCURRENCY
+                    - settings.ADMISSION_RESERVED
+                ) or (
+                    klass == 'heavy'
+                    and self.in_flight['heavy']
+                    >= settings.ADMISSION_HEAVY_LIMIT
+                ):
+                    return 'concurrency'
+            self.in_flight[klass] += 1
+        return None
+
+    def done(self, klass, duration):
+        now = time.monotonic()
+        with self._lock:
+            self.in_flight[klass] -= 1
+            average, updated = self.latency.get(klass, (duration, now))
+            if now - updated > settings.ADMISSION_LATENCY_WINDOW:
+                average = duration
+            self.latency[klass] = (
+                average + EWMA_WEIGHT * (duration - average), now)
+
+
+admission = Admission()
+
+
+class AdmissionMiddleware:
+    def __init__(self, get_response):
+        if not settings.ADMISSION_ENABLED:
+            raise MiddlewareNotUsed
+        self.get_response = get_response
+
+    def __call__(self, request):
+        klass = classify(request)
+        queued = queue_time(request, time.time())
+        if queued:
+            metrics.observe('admission_queue_seconds', queued, klass=klass)
+        reason = admission.admit(klass, queued, time.monotonic())
+        if reason is not None:
+            metrics.inc(
+                'admission_rejected_total', klass=klass, reason=reason)
+            response = JsonResponse(
+                {'detail': 'Сервер перегружен, повторите запрос позже.'},
+                status=503)
+            response['Retry-After'] = str(settings.ADMISSION_RETRY_AFTER)
+            return response
+        start = time.perf_counter()
+        try:
+            return self.get_response(request)
+        finally:
+            admission.done(klass, time.perf_counter() - start)
@@ -0,0 +1,95 @@
+"""
+Запись реальных запросов к API для воспроизведения командой
+replay_traffic.
+
+CaptureMiddleware пишет случайную долю запросов (CAPTURE_SAMPLE_RATE) в
+CAPTURE_DIR/capture-<pid>.jsonl — по файлу на процесс, как и метрики,
+чтобы воркеры не писали в один файл. В записи нет токенов, IP и id
+пользователей: автор запроса и id пользователей в пути заменяются
+псевдонимами — HMAC от id с SECRET_KEY, которые одинаковы для одного
+пользователя, но не раскрывают его id. При CAPTURE_ENABLED = False
+middleware отключается при старте.
+"""
+import hashlib
+import hmac
+import json
+import os
+import random
+import re
+import threading
+import time
+from urllib.parse import parse_qsl, urlencode, urlsplit, urlunsplit
+
+from django.conf import settings
+from django.core.exceptions import MiddlewareNotUsed
+
+# Сегмент пути с id пользователя: /api/users/<id>/...
+USER_PATH = re.compile(r'^(/api/users/)(\d+)(?=/)')
+# Параметры запроса с id пользователя.
+USER_PARAMS = frozenset({'author'})
+
+
+def pseudonym(value):
+    """Постоянный псевдоним значения, из которого его не восстановить."""
+    digest = hmac.new(
+        settings.SECRET_KEY.encode(), str(value).encode(), hashlib.sha256)
+    return 'u' + digest.hexdigest()[:16]
+
+
+def anonymize(path):
+    """Путь запроса с псевдонимами вместо id пользователей."""
+    parts = urlsplit(path)
+    route = USER_PATH.sub(
+        lambda match: match[1] + pseudonym(match[2]), parts.path)
+    query = [
+        (key, pseudonym(value) if key in USER_PARAMS else value)
+        for key, value in parse_qsl(parts.query, keep_blank_values=True)
+    ]
+    return urlunsplit(('', '', route, urlencode(query), ''))
+
+
+class CaptureMiddleware:
+    def __init__(self, get_response):
+        if not settings.CAPTURE_ENABLED:
+            raise MiddlewareNotUsed
+        self.get_response = get_response
+        self._lock = threading.Lock()
+        self._stream = None
+        self._pid = None
+
+    def _write(self, record):
+        line = json.dumps(record, ensure_ascii=False) + '\n'
+        with self._lock:
+            # После fork воркер открывает собственный файл.
+            if self._pid != os.getpid():
+                os.makedirs(settings.CAPTURE_DIR, exist_ok=True)
+                self._pid = os.getpid()
+                self._stream = open(
+                    os.path.join(
+                        settings.CAPTURE_DIR, f'capture-{self._pid}.jsonl'),
+                    'a', encoding='utf-8', buffering=1)
+            self._stream.write(line)
+
+    def __call__(self, request):
+        if (
+            not request.path.startswith('/api/')
+            or random.random() >= settings.CAPTURE_SAMPLE_RATE
+        ):
+            return self.get_response(request)
+        started = time.time()
+        response = self.get_response(request)
+        # DRF записывает пользователя, определённого по токену, и в
+        # исходный запрос.
+        user = getattr(request, 'user', None)
+        self._write({
+            'time': started,
+            'method': request.method,
+            'path': anonymize(
+                f'{request.path}?{request.GET.urlencode()}'),
+            'status': response.status_code,
+            'duration': round(time.time() - started, 6),
+            'client': (
+                pseudonym(user.pk)
+                if user is not None and user.is_authenticated else None),
+        })
+        return response
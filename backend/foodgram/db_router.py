@@ -0,0 +1,212 @@
+"""
+Чтение с реплик PostgreSQL.
+
+ReplicaRouterMiddleware разрешает читать с реплик только безопасным
+запросам (GET, HEAD, OPTIONS); запись, фоновые задачи и команды всегда
+работают с default. После изменяющего запроса клиент на
+REPLICA_PIN_SECONDS закрепляется за основной базой, чтобы сразу видеть
+свои изменения. Клиент определяется по хешу токена (заголовок
+Authorization), сессии или адресу из X-Forwarded-For; закрепления
+хранятся в общем для воркеров файле. Отставание реплик проверяется не
+чаще раза в REPLICA_LAG_CHECK_INTERVAL секунд, реплики с отставанием
+больше REPLICA_MAX_LAG исключаются из ротации.
+"""
+import contextvars
+import itertools
+import mmap
+import os
+import struct
+import threading
+import time
+
+from django.conf import settings
+from django.db import DatabaseError, connections
+from rest_framework.permissions import SAFE_METHODS
+from rest_framework.throttling import BaseThrottle
+
+from api.throttling import key_hash
+
+PIN = struct.Struct('<Qd')
+PROBES = 8
+
+# Реплика, выбранная для текущего запроса; None — основная база.
+_replica = contextvars.ContextVar('replica', default=None)
+
+LAG_SQL = (
+    'SELECT CASE WHEN pg_last_wal_receive_lsn() = pg_last_wal_replay_lsn() '
+    'THEN 0 ELSE EXTRACT(EPOCH FROM now() - pg_last_xact_replay_timestamp()) '
+    'END'
+)
+
+
+def replica_lag(alias):
+    """Отставание реплики в секундах; None, если реплика недоступна."""
+    connection = connections[alias]
+    if connection.vendor != 'postgresql':
+        return 0.0
+    try:
+        with connection.cursor() as cursor:
+            cursor.execute(LAG_SQL)
+            lag = cursor.fetchone()[0]
+    except DatabaseError:
+        connection.close()
+        return None
+    return float(lag or 0)
+
+
+class ReplicaPool:
+    """Реплики в ротации с периодической проверкой отставания."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._checked = float('-inf')
+        self._healthy = ()
+        self._cycle = iter(())
+
+    def _check(self, now):
+        self._checked = now
+        healthy = []
+        for alias in settings.DATABASE_REPLICAS:
+            lag = replica_lag(alias)
+            if lag is not None and lag <= settings.REPLICA_MAX_LAG:
+                healthy.append(alias)
+        self._healthy = tuple(healthy)
+        self._cycle = itertools.cycle(self._healthy)
+
+    def choose(self):
+        """Следующая здоровая реплика или None."""
+        now = time.monotonic()
+        with self._lock:
+            if now - self._checked >= settings.REPLICA_LAG_CHECK_INTERVAL:
+                self._check(now)
+            if not self._healthy:
+                return None
+            return next(self._cycle)
+
+
+replicas = ReplicaPool()
+
+
+class MmapPinStore:
+    """Сроки закрепления клиентов за основной базой в общем файле."""
+
+    def __init__(self, path, slots=65536):
+        self.path = path
+        self.slots = slots
+        self._map = None
+
+    def _table(self):
+        if self._map is None:
+            size = self.slots * PIN.size
+            fd = os.open(self.path, os.O_RDWR | os.O_CREAT, 0o600)
+            try:
+                if os.fstat(fd).st_size < size:
+                    os.ftruncate(fd, size)
+                self._map = mmap.mmap(fd, size)
+            finally:
+                os.close(fd)
+        return self._map
+
+    def _find(self, table, hashed):
+        """Слот ключа или слот с самым ранним сроком среди проверенных."""
+        start = hashed % self.slots
+        oldest, oldest_until = None, float('inf')
+        for probe in range(PROBES):
+            offset = ((start + probe) % self.slots) * PIN.size
+            slot_key, until = PIN.unpack_from(table, offset)
+            if slot_key == hashed:
+                return offset, until
+            if until < oldest_until:
+                oldest, oldest_until = offset, until
+        return oldest, None
+
+    def pin(self, key, until):
+        table = self._table()
+        hashed = key_hash(key)
+        offset, _ = self._find(table, hashed)
+        PIN.pack_into(table, offset, hashed, until)
+
+    def is_pinned(self, key, now):
+        _, until = self._find(self._table(), key_hash(key))
+        return until is not None and until > now
+
+
+_pins = None
+
+
+def get_pins():
+    global _pins
+    if _pins is None:
+        _pins = MmapPinStore(**settings.REPLICA_PIN_STORE)
+    return _pins
+
+
+def client_keys(request):
+    """
+    Идентификаторы клиента без обращения к БД: адрес клиента и, если
+    есть, токен и сессия. Адрес берётся из X-Forwarded-For с учётом
+    NUM_PROXIES, как в ограничении частоты запросов: REMOTE_ADDR за nginx
+    у всех клиентов одинаковый.
+    """
+    keys = [f'ip:{BaseThrottle().get_ident(request)}']
+    auth = request.headers.get('Authorization')
+    if auth:
+        keys.append(f'auth:{auth}')
+    session = request.COOKIES.get(settings.SESSION_COOKIE_NAME)
+    if session:
+        keys.append(f'session:{session}')
+    return keys
+
+
+def pin_keys(keys):
+    """
+    Ключи, закрепляемые после записи. Адрес закрепляется, только если у
+    клиента нет ни токена, ни сессии (вход, регистрация): сразу после
+    входа запросы идут уже с новым токеном, который на реплике может ещё
+    не появиться. Иначе запись одного клиента отправляла бы на основную
+    базу всех клиентов за тем же адресом.
+    """
+    return keys[1:] or keys
+
+
+class ReplicaRouterMiddleware:
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        if not settings.DATABASE_REPLICAS:
+            return self.get_response(request)
+        keys = client_keys(request)
+        now = time.time()
+        safe = request.method in SAFE_METHODS
+        pins = get_pins()
+        replica = None
+        if safe and not any(pins.is_pinned(key, now) for key in keys):
+            # Одна реплика на весь запрос: подсчёт и страница из одного
+            # снимка данных.
+            replica = replicas.choose()
+        token = _replica.set(replica)
+        try:
+            response = self.get_response(request)
+        finally:
+            _replica.reset(token)
+        if not safe and response.status_code < 400:
+            for key in pin_keys(keys):
+                pins.pin(key, now + settings.REPLICA_PIN_SECONDS)
+        return response
+
+
+class ReplicaRouter:
+    """Чтение с реплики внутри безопасных запросов, остальное — default."""
+
+    def db_for_read(self, model, **hints):
+        return _replica.get()
+
+    def db_for_write(self, model, **hints):
+        return 'default'
+
+    def allow_relation(self, obj1, obj2, **hints):
+        return True
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        return db == 'default'
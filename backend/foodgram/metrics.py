@@ -0,0 +1,373 @@
+"""
+Метрики запросов, общие для всех воркеров gunicorn.
+
+Каждый процесс пишет значения в свой файл METRICS_DIR/metrics-<pid>.db,
+отображённый в память: запись — это длина ключа, ключ и число double,
+прибавление к счётчику — чтение и запись восьми байт без системных
+вызовов. Представление metrics_view суммирует файлы всех процессов и
+отдаёт результат в текстовом формате Prometheus. Гистограммы хранят
+число попаданий в каждый интервал, накопительные суммы считаются при
+выдаче.
+
+Когда воркер завершается, мастер gunicorn переносит его значения в общий
+файл METRICS_DIR/metrics-aggregate.db (merge_worker) и удаляет файл
+воркера: счётчики не сбрасываются, а файлы не копятся.
+"""
+import glob
+import hmac
+import mmap
+import os
+import struct
+import threading
+import time
+from bisect import bisect_left
+from collections import defaultdict
+from contextlib import ExitStack, contextmanager
+
+from django.conf import settings
+from django.core.exceptions import MiddlewareNotUsed
+from django.db import connections
+from django.http import HttpResponse, HttpResponseForbidden
+
+from foodgram.profiling import view_name
+
+LENGTH = struct.Struct('<I')
+VALUE = struct.Struct('<d')
+HEADER_SIZE = 8
+INITIAL_SIZE = 1 << 16
+# Общий файл значений завершившихся воркеров и ключ-отметка перенесённого
+# pid в нём.
+AGGREGATE = 'aggregate'
+MERGED = 'merged\t'
+
+LATENCY_BUCKETS = (
+    0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10)
+QUERY_BUCKETS = (0, 1, 2, 5, 10, 20, 50, 100, 200)
+SIZE_BUCKETS = (256, 1024, 4096, 16384, 65536, 262144, 1048576, 4194304)
+
+# Имя -> (тип, описание, границы интервалов гистограммы).
+METRICS = {
+    'http_requests_total': (
+        'counter', 'Запросы по представлению, методу и статусу.', None),
+    'http_request_duration_seconds': (
+        'histogram', 'Время обработки запроса.', LATENCY_BUCKETS),
+    'http_response_size_bytes': (
+        'histogram', 'Размер тела ответа.', SIZE_BUCKETS),
+    'db_queries_per_request': (
+        'histogram', 'Число SQL-запросов на HTTP-запрос.', QUERY_BUCKETS),
+    'db_query_duration_seconds': (
+        'histogram', 'Суммарное время SQL за HTTP-запрос.', LATENCY_BUCKETS),
+    'cache_requests_total': (
+        'counter',
+        'Обращения к кешам: result=hit, miss, stale или coalesced.', None),
+    'admission_rejected_total': (
+        'counter', 'Запросы, отклонённые при перегрузке: класс и причина.',
+        None),
+    'admission_queue_seconds': (
+        'histogram', 'Ожидание запроса в очереди до воркера.',
+        LATENCY_BUCKETS),
+    'image_processing_seconds': (
+        'histogram', 'Обработка картинок рецептов по этапам.',
+        LATENCY_BUCKETS),
+}
+
+
+class MmapedValues:
+    """Словарь ключ -> double в файле, который пишет один процесс."""
+
+    def __init__(self, path):
+        self._lock = threading.Lock()
+        self._file = open(path, 'a+b')
+        size = os.fstat(self._file.fileno()).st_size
+        if size == 0:
+            self._file.truncate(INITIAL_SIZE)
+            size = INITIAL_SIZE
+        self._capacity = size
+        self._map = mmap.mmap(self._file.fileno(), size)
+        self._positions = {}
+        for key, _, position in read_entries(self._map):
+            self._positions[key] = position
+        self._used = max(
+            LENGTH.unpack_from(self._map, 0)[0], HEADER_SIZE)
+
+    def _append(self, key):
+        encoded = key.encode()
+        padding = 8 - (LENGTH.size + len(encoded)) % 8
+        entry = (
+            LENGTH.pack(len(encoded)) + encoded + b' ' * padding
+            + VALUE.pack(0.0))
+        if self._used + len(entry) > self._capacity:
+            self._capacity *= 2
+            while self._used + len(entry) > self._capacity:
+                self._capacity *= 2
+            self._map.close()
+            self._file.truncate(self._capacity)
+            self._map = mmap.mmap(self._file.fileno(), self._capacity)
+        self._map[self._used:self._used + len(entry)] = entry
+        position = self._used + len(entry) - VALUE.size
+        self._used += len(entry)
+        # Заголовок обновляется последним: читатель не увидит
+        # недописанную запись.
+        LENGTH.pack_into(self._map, 0, self._used)
+        self._positions[key] = position
+        return position
+
+    def add(self, key, amount):
+        with self._lock:
+            position = self._positions.get(key)
+            if position is None:
+                position = self._append(key)
+            value = VALUE.unpack_from(self._map, position)[0]
+            VALUE.pack_into(self._map, position, value + amount)
+
+    def close(self):
+        self._map.close()
+        self._file.close()
+
+
+def read_entries(buffer):
+    """Записи файла метрик: (ключ, значение, смещение значения)."""
+    used = LENGTH.unpack_from(buffer, 0)[0]
+    position = HEADER_SIZE
+    while position < used:
+        length = LENGTH.unpack_from(buffer, position)[0]
+        start = position + LENGTH.size
+        key = bytes(buffer[start:start + length]).decode()
+        value_position = start + length
+        value_position += 8 - (LENGTH.size + length) % 8
+        value = VALUE.unpack_from(buffer, value_position)[0]
+        yield key, value, value_position
+        position = value_position + VALUE.size
+
+
+_values = None
+_values_pid = None
+
+
+def _store():
+    """Файл текущего процесса; после fork открывается новый."""
+    global _values, _values_pid
+    pid = os.getpid()
+    if _values_pid != pid:
+        os.makedirs(settings.METRICS_DIR, exist_ok=True)
+        _values = MmapedValues(_path(pid))
+        _values_pid = pid
+    return _values
+
+
+_keys = {}
+
+
+def _key(name, suffix, labels, le=''):
+    """Ключ записи; строки кешируются, чтобы не собирать их на каждый вызов."""
+    cache_key = (name, suffix, le, *labels.items())
+    key = _keys.get(cache_key)
+    if key is None:
+        label_string = ','.join(
+            f'{label}="{_escape(value)}"'
+            for label, value in sorted(labels.items()))
+        key = _keys[cache_key] = f'{name}\t{suffix}\t{label_string}\t{le}'
+    return key
+
+
+def _escape(value):
+    return str(value).replace('\\', r'\\').replace('"', r'\"').replace(
+        '\n', r'\n')
+
+
+def inc(name, amount=1, **labels):
+    """Увеличивает счётчик."""
+    _store().add(_key(name, '', labels), amount)
+
+
+def observe(name, value, **labels):
+    """Добавляет наблюдение в гистограмму."""
+    buckets = METRICS[name][2]
+    index = bisect_left(buckets, value)
+    le = str(buckets[index]) if index < len(buckets) else '+Inf'
+    store = _store()
+    store.add(_key(name, 'bucket', labels, le), 1)
+    store.add(_key(name, 'sum', labels), value)
+
+
+@contextmanager
+def timer(name, **labels):
+    """Измеряет время выполнения блока в гистограмму name."""
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        observe(name, time.perf_counter() - start, **labels)
+
+
+def _path(name):
+    return os.path.join(settings.METRICS_DIR, f'metrics-{name}.db')
+
+
+def _read(path):
+    """Значения файла метрик: {ключ: значение}."""
+    with open(path, 'rb') as stream:
+        data = stream.read()
+    if len(data) < HEADER_SIZE:
+        return {}
+    return {key: value for key, value, _ in read_entries(data)}
+
+
+def _write(path, values):
+    """Записывает значения в новый файл и атомарно подменяет им path."""
+    temporary = f'{path}.tmp'
+    if os.path.exists(temporary):
+        os.remove(temporary)
+    store = MmapedValues(temporary)
+    for key, value in values.items():
+        store.add(key, value)
+    store.close()
+    os.replace(temporary, path)
+
+
+def merge_worker(pid):
+    """
+    Переносит значения завершившегося воркера pid в общий файл и удаляет
+    файл воркера. Вызывается из мастера gunicorn (child_exit), поэтому
+    общий файл пишет один процесс.
+
+    Пока файл воркера не удалён, pid записан в общем файле: collect не
+    посчитает его значения дважды. После удаления pid убирается, чтобы
+    не скрыть новый процесс с тем же pid.
+    """
+    path = _path(pid)
+    try:
+        values = _read(path)
+    except FileNotFoundError:
+        return
+    aggregate = _path(AGGREGATE)
+    try:
+        totals = _read(aggregate)
+    except FileNotFoundError:
+        totals = {}
+    for key, value in values.items():
+        totals[key] = totals.get(key, 0.0) + value
+    _write(aggregate, {**totals, f'{MERGED}{pid}': 0.0})
+    os.remove(path)
+    _write(aggregate, totals)
+
+
+def collect():
+    """Суммирует значения из файлов всех процессов."""
+    while True:
+        try:
+            return _collect()
+        except FileNotFoundError:
+            # Файл воркера удалили после переноса в общий файл, который
+            # уже прочитан: значения читаются заново.
+            continue
+
+
+def _collect():
+    totals = defaultdict(float)
+    aggregate = _path(AGGREGATE)
+    try:
+        values = _read(aggregate)
+    except FileNotFoundError:
+        values = {}
+    skip = {aggregate}
+    for key, value in values.items():
+        if key.startswith(MERGED):
+            skip.add(_path(key[len(MERGED):]))
+        else:
+            totals[key] += value
+    for path in glob.glob(_path('*')):
+        if path in skip:
+            continue
+        for key, value in _read(path).items():
+            totals[key] += value
+    return totals
+
+
+def _series(name, suffix, label_string, extra=''):
+    labels = ','.join(part for part in (label_string, extra) if part)
+    full_name = f'{name}_{suffix}' if suffix else name
+    return f'{full_name}{{{labels}}}' if labels else full_name
+
+
+def render(totals):
+    """Текстовый формат Prometheus."""
+    grouped = defaultdict(lambda: defaultdict(dict))
+    for key, value in totals.items():
+        name, suffix, label_string, le = key.split('\t')
+        grouped[name][label_string][(suffix, le)] = value
+    lines = []
+    for name in sorted(grouped):
+        kind, description, buckets = METRICS.get(
+            name, ('untyped', '', None))
+        lines.append(f'# HELP {name} {description}')
+        lines.append(f'# TYPE {name} {kind}')
+        for label_string, values in sorted(grouped[name].items()):
+            if kind != 'histogram':
+                series = _series(name, '', label_string)
+                lines.append(f'{series} {values[("", "")]}')
+                continue
+            count = 0
+            for le in [str(bound) for bound in buckets] + ['+Inf']:
+                count += values.get(('bucket', le), 0)
+                series = _series(name, 'bucket', label_string, f'le="{le}"')
+                lines.append(f'{series} {count}')
+            total = values.get(('sum', ''), 0)
+            lines.append(f'{_series(name, "sum", label_string)} {total}')
+            lines.append(f'{_series(name, "count", label_string)} {count}')
+    return '\n'.join(lines) + '\n'
+
+
+def metrics_view(request):
+    """Метрики для Prometheus; доступ по заголовку Authorization: Bearer."""
+    token = settings.METRICS_TOKEN
+    auth = request.headers.get('Authorization', '')
+    if not token or not hmac.compare_digest(auth, f'Bearer {token}'):
+        return HttpResponseForbidden()
+    return HttpResponse(
+        render(collect()), content_type='text/plain; version=0.0.4')
+
+
+class QueryCounter:
+    """execute_wrapper: считает SQL-запросы и их суммарное время."""
+
+    def __init__(self):
+        self.count = 0
+        self.duration = 0.0
+
+    def __call__(self, execute, sql, params, many, context):
+        start = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.count += 1
+            self.duration += time.perf_counter() - start
+
+
+class MetricsMiddleware:
+    def __init__(self, get_response):
+        if not settings.METRICS_ENABLED:
+            raise MiddlewareNotUsed
+        self.get_response = get_response
+
+    def __call__(self, request):
+        queries = QueryCounter()
+        start = time.perf_counter()
+        # Чтение может уйти на реплику (foodgram.db_router), поэтому
+        # запросы считаются на всех соединениях.
+        with ExitStack() as stack:
+            for alias in connections:
+                stack.enter_context(
+                    connections[alias].execute_wrapper(queries))
+            response = self.get_response(request)
+        duration = time.perf_counter() - start
+        view = view_name(request)
+        inc('http_requests_total', view=view, method=request.method,
+            status=response.status_code)
+        observe('http_request_duration_seconds', duration, view=view)
+        observe('db_queries_per_request', queries.count, view=view)
+        observe('db_query_duration_seconds', queries.duration, view=view)
+        if not response.streaming:
+            observe('http_response_size_bytes', len(response.content),
+                    view=view)
+        return response
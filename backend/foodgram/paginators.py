@@ -0,0 +1,35 @@
+import json
+
+from django.conf import settings
+from django.core.paginator import Paginator
+from django.db import connections
+from django.utils.functional import cached_property
+
+
+def planner_estimate(queryset):
+    """Оценка числа строк запроса по статистике планировщика PostgreSQL."""
+    connection = connections[queryset.db]
+    sql, params = queryset.query.sql_with_params()
+    with connection.cursor() as cursor:
+        cursor.execute(f'EXPLAIN (FORMAT JSON) {sql}', params)
+        plan = cursor.fetchone()[0]
+    if isinstance(plan, str):
+        plan = json.loads(plan)
+    return int(plan[0]['Plan']['Plan Rows'])
+
+
+class EstimatedCountPaginator(Paginator):
+    """
+    Пагинатор админки для больших таблиц: если планировщик оценивает
+    выборку больше чем в ADMIN_EXACT_COUNT_LIMIT строк, вместо точного
+    COUNT(*) используется оценка.
+    """
+
+    @cached_property
+    def count(self):
+        queryset = self.object_list
+        if connections[queryset.db].vendor == 'postgresql':
+            estimate = planner_estimate(queryset)
+            if estimate > settings.ADMIN_EXACT_COUNT_LIMIT:
+                return estimate
+        return super().count
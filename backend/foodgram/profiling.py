@@ -0,0 +1,124 @@
+"""
+Профилирование отдельных запросов к API.
+
+ProfilingMiddleware профилирует случайную долю запросов
+(PROFILING_SAMPLE_RATE) и запросы с заголовком X-Profile, равным
+PROFILING_TOKEN. Результат сохраняется в PROFILING_DIR/<представление>/:
+*.prof (pstats, режим cprofile) или *.folded (свёрнутые стеки для
+flamegraph.pl и speedscope, режим sampler). Сводку строит команда
+profile_report. При PROFILING_ENABLED = False middleware отключается при
+старте и не добавляет накладных расходов.
+"""
+import cProfile
+import hmac
+import os
+import random
+import sys
+import threading
+import time
+from collections import Counter
+
+from django.conf import settings
+from django.core.exceptions import MiddlewareNotUsed
+
+
+def view_name(request):
+    """Имя представления вида RecipeViewSet.list или модуль.функция."""
+    match = getattr(request, 'resolver_match', None)
+    if match is None:
+        return 'unresolved'
+    func = match.func
+    cls = getattr(func, 'cls', None)
+    if cls is not None:
+        actions = getattr(func, 'actions', None) or {}
+        action = actions.get(request.method.lower(), request.method.lower())
+        return f'{cls.__name__}.{action}'
+    return f'{func.__module__}.{func.__name__}'
+
+
+def _frame_name(code):
+    filename = os.path.basename(code.co_filename)
+    return f'{code.co_name} ({filename}:{code.co_firstlineno})'
+
+
+class StackSampler:
+    """
+    Фоновый поток раз в interval секунд снимает стек профилируемого
+    потока и считает одинаковые стеки.
+    """
+
+    def __init__(self, interval):
+        self.interval = interval
+        self.stacks = Counter()
+        self._stop = threading.Event()
+
+    def _run(self, thread_id):
+        while not self._stop.wait(self.interval):
+            frame = sys._current_frames().get(thread_id)
+            stack = []
+            while frame is not None:
+                stack.append(_frame_name(frame.f_code))
+                frame = frame.f_back
+            # Стек, снятый во время stop(), показывает только ожидание.
+            if stack and not self._stop.is_set():
+                self.stacks[';'.join(reversed(stack))] += 1
+
+    def start(self):
+        self._thread = threading.Thread(
+            target=self._run, args=(threading.get_ident(),), daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        self._thread.join()
+
+    def dump(self, path):
+        with open(path + '.folded', 'w', encoding='utf-8') as stream:
+            for stack, count in self.stacks.items():
+                stream.write(f'{stack} {count}\n')
+
+
+class CProfiler:
+    def __init__(self):
+        self.profile = cProfile.Profile()
+
+    def start(self):
+        self.profile.enable()
+
+    def stop(self):
+        self.profile.disable()
+
+    def dump(self, path):
+        self.profile.dump_stats(path + '.prof')
+
+
+class ProfilingMiddleware:
+    def __init__(self, get_response):
+        if not settings.PROFILING_ENABLED:
+            raise MiddlewareNotUsed
+        self.get_response = get_response
+
+    def should_profile(self, request):
+        token = settings.PROFILING_TOKEN
+        header = request.headers.get('X-Profile')
+        if token and header and hmac.compare_digest(header, token):
+            return True
+        return random.random() < settings.PROFILING_SAMPLE_RATE
+
+    def __call__(self, request):
+        if not self.should_profile(request):
+            return self.get_response(request)
+        if settings.PROFILING_MODE == 'cprofile':
+            profiler = CProfiler()
+        else:
+            profiler = StackSampler(settings.PROFILING_INTERVAL)
+        profiler.start()
+        try:
+            response = self.get_response(request)
+        finally:
+            profiler.stop()
+        directory = os.path.join(settings.PROFILING_DIR, view_name(request))
+        os.makedirs(directory, exist_ok=True)
+        profiler.dump(os.path.join(
+            directory, f'{time.time_ns()}-{os.getpid()}'))
+        return response
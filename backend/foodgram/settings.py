@@ -22,6 +22,7 @@ INSTALLED_APPS = [
     'django.contrib.sessions',
     'django.contrib.messages',
     'django.contrib.staticfiles',
+    'django.contrib.postgres',
     'rest_framework.authtoken',
     'rest_framework',
     'django_filters',
@@ -32,6 +33,10 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    'foodgram.capture.CaptureMiddleware',
+    'foodgram.metrics.MetricsMiddleware',
+    'foodgram.admission.AdmissionMiddleware',
+    'foodgram.db_router.ReplicaRouterMiddleware',
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
@@ -39,6 +44,7 @@ MIDDLEWARE = [
     'django.contrib.auth.middleware.AuthenticationMiddleware',
     'django.contrib.messages.middleware.MessageMiddleware',
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
+    'foodgram.profiling.ProfilingMiddleware',
 ]
 
 ROOT_URLCONF = 'foodgram.urls'
@@ -68,10 +74,94 @@ DATABASES = {
         'USER': os.getenv('POSTGRES_USER', 'foodgram'),
         'PASSWORD': os.getenv('POSTGRES_PASSWORD', ''),
         'HOST': os.getenv('DB_HOST', ''),
-        'PORT': os.getenv('DB_PORT', 5432)
+        'PORT': os.getenv('DB_PORT', 5432),
+        # Постоянные соединения с проверкой перед повторным использованием.
+        'CONN_MAX_AGE': int(os.getenv('DB_CONN_MAX_AGE', 60)),
+        'CONN_HEALTH_CHECKS': True,
     }
 }
 
+# Реплики для чтения: DB_REPLICAS=host1:5432,host2:5432. Безопасные
+# запросы к API читают с реплик (foodgram.db_router), после изменяющего
+# запроса клиент REPLICA_PIN_SECONDS читает с основной базы. Реплики с
+# отставанием больше REPLICA_MAX_LAG секунд исключаются из ротации.
+DATABASE_REPLICAS = []
+for number, address in enumerate(
+        filter(None, os.getenv('DB_REPLICAS', '').split(',')), start=1):
+    host, _, port = address.partition(':')
+    alias = f'replica{number}'
+    DATABASES[alias] = {
+        **DATABASES['default'],
+        'HOST': host,
+        'PORT': port or DATABASES['default']['PORT'],
+        'TEST': {'MIRROR': 'default'},
+    }
+    DATABASE_REPLICAS.append(alias)
+
+DATABASE_ROUTERS = ['foodgram.db_router.ReplicaRouter']
+REPLICA_PIN_SECONDS = 10
+REPLICA_MAX_LAG = 5
+REPLICA_LAG_CHECK_INTERVAL = 2
+REPLICA_PIN_STORE = {
+    'path': os.getenv('REPLICA_PIN_STORE_PATH', '/tmp/foodgram-replica-pins'),
+    'slots': 65536,
+}
+
+# Кеш по умолчанию — память воркера. Чтобы воркеры делили кеш и
+# блокировки построения ответов, укажите общий бэкенд, например
+# django.core.cache.backends.memcached.PyMemcacheCache.
+CACHES = {
+    'default': {
+        'BACKEND': os.getenv(
+            'CACHE_BACKEND',
+            'django.core.cache.backends.locmem.LocMemCache'),
+        'LOCATION': os.getenv('CACHE_LOCATION', ''),
+    }
+}
+
+# Кеш ответов чтения рецептов (api.response_cache): время жизни записи,
+# сколько секунд после изменения можно отдавать устаревший ответ, пока
+# строится новый, и сколько ждать построения ответа другим запросом.
+RESPONSE_CACHE_ENABLED = (
+    os.getenv('RESPONSE_CACHE', 'True').lower() == 'true')
+RESPONSE_CACHE_TIMEOUT = 300
+RESPONSE_CACHE_STALE_SECONDS = 30
+RESPONSE_CACHE_LOCK_TIMEOUT = 10
+RESPONSE_CACHE_POLL_INTERVAL = 0.05
+
+# Допуск запросов при перегрузке (foodgram.admission): потоков на воркер,
+# сколько из них оставлять дешёвым запросам и сколько тяжёлых выполнять
+# одновременно, пока время ответа выше цели, с какого limit список
+# считается тяжёлым, целевое время ответа по классам и окно его учёта,
+# допустимое ожидание в очереди nginx и Retry-After в секундах.
+ADMISSION_ENABLED = os.getenv('ADMISSION', 'True').lower() == 'true'
+ADMISSION_CONCURRENCY = int(os.getenv(
+    'ADMISSION_CONCURRENCY', os.getenv('GUNICORN_THREADS', 4)))
+ADMISSION_RESERVED = 1
+ADMISSION_HEAVY_LIMIT = 1
+ADMISSION_LARGE_LIMIT = 50
+ADMISSION_LATENCY_TARGETS = {
+    'critical': 0.5,
+    'cheap': 0.25,
+    'normal': 1.0,
+    'heavy': 5.0,
+}
+ADMISSION_LATENCY_WINDOW = 10
+ADMISSION_QUEUE_BUDGETS = {'normal': 5.0, 'heavy': 1.0}
+ADMISSION_RETRY_AFTER = 5
+
+# Статические копии публичных ответов API (api.prerender), которые nginx
+# отдаёт анонимам: сколько страниц списка и какого размера собирать и с
+# каким хостом строить адреса картинок.
+PRERENDER_ENABLED = os.getenv('PRERENDER', 'False').lower() == 'true'
+PRERENDER_ROOT = os.getenv('PRERENDER_ROOT', '/prerender')
+PRERENDER_LIST_PAGES = 5
+PRERENDER_LIST_LIMIT = 6
+PRERENDER_HOST = os.getenv('PRERENDER_HOST') or next(
+    (host for host in ALLOWED_HOSTS
+     if host and host != '*' and not host.startswith('.')),
+    'localhost')
+
 AUTH_PASSWORD_VALIDATORS = [
     {
         'NAME': 'django.contrib.auth.password_validation.UserAttributeSimilarityValidator',
@@ -98,6 +188,21 @@ STATIC_ROOT = BASE_DIR / 'collected_static'
 MEDIA_URL = '/media/'
 MEDIA_ROOT = '/media'
 
+# Картинки именуются по хешу содержимого: одинаковые файлы хранятся один
+# раз, а URL неизменяемы и кешируются nginx на год.
+STORAGES = {
+    'default': {
+        'BACKEND': 'recipes.storage.ContentAddressedStorage',
+    },
+    'staticfiles': {
+        'BACKEND': 'django.contrib.staticfiles.storage.StaticFilesStorage',
+    },
+}
+
+# Команда gc_media не трогает файлы моложе этого возраста (в секундах):
+# ссылка на только что загруженный файл может быть ещё не закоммичена.
+MEDIA_GC_GRACE_PERIOD = 3600
+
 REST_FRAMEWORK = {
     'DEFAULT_PERMISSION_CLASSES': [
         'rest_framework.permissions.IsAuthenticatedOrReadOnly',
@@ -108,8 +213,37 @@ REST_FRAMEWORK = {
     ],
     'DEFAULT_PAGINATION_CLASS': 'api.paginations.ApiPagination',
     'PAGE_SIZE': 6,
+    'DEFAULT_THROTTLE_CLASSES': [
+        'api.throttling.UserRateThrottle',
+        'api.throttling.WriteRateThrottle',
+        'api.throttling.ActionRateThrottle',
+    ],
+    'DEFAULT_THROTTLE_RATES': {
+        'anon': '600/min',
+        'user': '1200/min',
+        'write': '60/min',
+        'upload': '10/min',
+        'export': '10/min',
+        'search': '300/min',
+    },
+    # nginx передаёт адрес клиента в X-Forwarded-For.
+    'NUM_PROXIES': 1,
 }
 
+# Хранилище корзин ограничения частоты запросов: общий для воркеров файл
+# или Redis, если задан THROTTLE_REDIS_URL.
+if os.getenv('THROTTLE_REDIS_URL'):
+    THROTTLE_STORE = {
+        'BACKEND': 'api.throttling.RedisBucketStore',
+        'url': os.getenv('THROTTLE_REDIS_URL'),
+    }
+else:
+    THROTTLE_STORE = {
+        'BACKEND': 'api.throttling.MmapBucketStore',
+        'path': os.getenv('THROTTLE_STORE_PATH', '/tmp/foodgram-throttle'),
+        'slots': 65536,
+    }
+
 DJOSER = {
     'LOGIN_FIELD': 'email',
     'HIDE_USERS': False,
@@ -126,4 +260,102 @@ DJOSER = {
 
 AUTH_USER_MODEL = 'users.User'
 
+# Асинхронные GET-эндпоинты рецептов, тегов, ингредиентов и подписок.
+# Имеет смысл только при запуске через ASGI (foodgram.asgi).
+ASYNC_READ_API = os.getenv('ASYNC_READ_API', 'False').lower() == 'true'
+
+# Списки рецептов, подписок, тегов и ингредиентов собираются из .values()
+# в обход сериализаторов DRF (api/fast_serializers.py). Ответ тот же.
+FAST_SERIALIZERS = os.getenv('FAST_SERIALIZERS', 'True').lower() == 'true'
+
 DEFAULT_AUTO_FIELD = 'django.db.models.BigAutoField'
+
+# Производные данные (ленты, похожие рецепты) пересчитываются после коммита
+# в фоновом потоке. False — пересчитывать сразу в том же потоке.
+BACKGROUND_TASKS_ASYNC = True
+
+# Лента подписок: авторы с большим числом подписчиков читаются при запросе
+# ленты, остальные раскладываются по лентам при публикации рецепта.
+FEED_FANOUT_MAX_FOLLOWERS = 10000
+FEED_BACKFILL_SIZE = 100
+FEED_BATCH_SIZE = 1000
+
+# Журнал изменений: обработчики consume_outbox (имя -> путь к функции,
+# принимающей список OutboxEvent), размер пачки, пауза между опросами
+# пустого журнала в секундах, сколько секунд хранить обработанные события
+# и как часто в секундах их удалять.
+OUTBOX_HANDLERS = {
+    'favorites_count': 'recipes.counters.handle_outbox',
+}
+OUTBOX_BATCH_SIZE = 500
+OUTBOX_POLL_INTERVAL = 1.0
+OUTBOX_RETENTION = 24 * 3600
+OUTBOX_PRUNE_INTERVAL = 300
+
+# Максимальное число id в запросе /api/recipes/?ids=.
+RECIPES_MULTI_GET_MAX_IDS = 100
+
+# Похожие рецепты: сколько соседей хранить и вес совпадения тегов.
+SIMILAR_RECIPES_TOP_K = 12
+SIMILAR_RECIPES_TAG_WEIGHT = 0.2
+
+# Рекомендации авторов: сколько хранить на пользователя, сколько
+# пользователей с похожим вкусом учитывать и с каким весом, из скольких
+# кандидатов выбирать их при пересчёте для одного пользователя.
+SUGGESTIONS_TOP_K = 20
+SUGGESTIONS_TASTE_NEIGHBOURS = 50
+SUGGESTIONS_TASTE_WEIGHT = 0.5
+SUGGESTIONS_TASTE_CANDIDATES = 1000
+
+# Популярные рецепты: вес добавления в избранное и в список покупок,
+# период полураспада рейтинга как доля длины окна (24ч, 7д, 30д).
+TRENDING_FAVORITE_WEIGHT = 1.0
+TRENDING_CART_WEIGHT = 1.5
+TRENDING_HALF_LIFE = 0.25
+
+# Профилирование запросов (foodgram.profiling): доля случайных запросов,
+# токен для заголовка X-Profile, режим cprofile или sampler (стек
+# снимается раз в PROFILING_INTERVAL секунд), каталог для результатов.
+PROFILING_ENABLED = os.getenv('PROFILING', 'False').lower() == 'true'
+PROFILING_SAMPLE_RATE = float(os.getenv('PROFILING_SAMPLE_RATE', 0))
+PROFILING_TOKEN = os.getenv('PROFILING_TOKEN', '')
+PROFILING_MODE = os.getenv('PROFILING_MODE', 'sampler')
+PROFILING_INTERVAL = 0.005
+PROFILING_DIR = os.getenv('PROFILING_DIR', '/tmp/foodgram-profiles')
+
+# Запись запросов для replay_traffic (foodgram.capture): доля
+# записываемых запросов к API и каталог файлов воркеров.
+CAPTURE_ENABLED = os.getenv('CAPTURE', 'False').lower() == 'true'
+CAPTURE_SAMPLE_RATE = float(os.getenv('CAPTURE_SAMPLE_RATE', 1))
+CAPTURE_DIR = os.getenv('CAPTURE_DIR', '/tmp/foodgram-capture')
+
+# Метрики (foodgram.metrics): каталог файлов воркеров и токен для /metrics.
+# Каталог очищается при старте сервера (gunicorn.conf.py).
+METRICS_ENABLED = os.getenv('METRICS', 'True').lower() == 'true'
+METRICS_DIR = os.getenv('METRICS_DIR', '/tmp/foodgram-metrics')
+METRICS_TOKEN = os.getenv('METRICS_TOKEN', '')
+
+# Запросы, которыми gunicorn прогревает воркер перед приёмом трафика.
+WARMUP_PATHS = (
+    '/api/recipes/?limit=6',
+    '/api/tags/',
+    '/api/ingredients/?name=а',
+    '/api/users/?limit=6',
+)
+
+# Удаление пользователей и рецептов: сколько строк удалять за один запрос.
+DELETION_BATCH_SIZE = 1000
+
+# Статистика для администраторов: сколько строк источника учитывать за одну
+# транзакцию, период по умолчанию и наибольший период запроса в днях,
+# длина топов. Строки с id не больше наибольшего закоммиченного учитываются
+# через STATS_SAFETY_WINDOW секунд: за это время завершаются транзакции,
+# получившие меньшие id.
+STATS_BATCH_SIZE = 5000
+STATS_SAFETY_WINDOW = 300
+STATS_DEFAULT_DAYS = 30
+STATS_MAX_DAYS = 366
+STATS_TOP = 10
+
+# Админка: выше этого числа строк вместо COUNT(*) берётся оценка планировщика.
+ADMIN_EXACT_COUNT_LIMIT = 100000
@@ -3,9 +3,12 @@ from django.conf.urls.static import static
 from django.contrib import admin
 from django.urls import include, path
 
+from foodgram.metrics import metrics_view
+
 urlpatterns = [
     path('admin/', admin.site.urls),
     path('api/', include('api.urls', namespace='api')),
+    path('metrics', metrics_view, name='metrics'),
 ]
 
 if settings.DEBUG:
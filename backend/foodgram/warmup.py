@@ -0,0 +1,52 @@
+"""
+Прогрев воркера до того, как он начнёт принимать запросы.
+
+Первый запрос к свежему воркеру компилирует URL-резолверы, собирает поля
+сериализаторов, импортирует djoser и открывает соединения с БД. warm_up
+делает это заранее: открывает соединения со всеми базами и выполняет
+запросы WARMUP_PATHS напрямую через представления, минуя middleware,
+чтобы прогрев не попадал в метрики и лимиты запросов.
+"""
+import asyncio
+import logging
+
+from asgiref.sync import async_to_sync
+from django.conf import settings
+from django.contrib.auth.models import AnonymousUser
+from django.db import connections
+from django.test import RequestFactory
+from django.urls import resolve
+
+logger = logging.getLogger(__name__)
+
+
+def connect():
+    """Открывает соединения текущего потока со всеми базами."""
+    for alias in connections:
+        connections[alias].ensure_connection()
+
+
+def _host():
+    hosts = [
+        host for host in settings.ALLOWED_HOSTS
+        if host and host != '*' and not host.startswith('.')
+    ]
+    return hosts[0] if hosts else 'localhost'
+
+
+def warm_up():
+    connect()
+    factory = RequestFactory(HTTP_HOST=_host())
+    for path in settings.WARMUP_PATHS:
+        request = factory.get(path)
+        request.user = AnonymousUser()
+        try:
+            match = resolve(request.path_info)
+            view = match.func
+            if asyncio.iscoroutinefunction(view):
+                view = async_to_sync(view)
+            response = view(request, *match.args, **match.kwargs)
+            if hasattr(response, 'render'):
+                response.render()
+        except Exception:
+            logger.exception('Прогрев %s не удался', path)
@@ -0,0 +1,87 @@
+"""
+Настройки gunicorn для продакшена: gunicorn -c gunicorn.conf.py.
+
+Число воркеров и потоков считается по числу CPU и переопределяется
+переменными окружения. Приложение загружается в мастере до fork
+(preload_app), каждый воркер прогревается (foodgram.warmup) до того,
+как начнёт принимать запросы, и перезапускается после max_requests
+запросов или при превышении GUNICORN_MAX_WORKER_MEMORY_MB.
+
+Для ASGI: GUNICORN_WORKER_CLASS=uvicorn.workers.UvicornWorker и
+DB_CONN_MAX_AGE=0 — постоянные соединения в асинхронном коде не
+переиспользуются.
+"""
+import multiprocessing
+import os
+import shutil
+import threading
+
+cpu_count = multiprocessing.cpu_count()
+
+bind = os.getenv('GUNICORN_BIND', '0.0.0.0:8000')
+worker_class = os.getenv('GUNICORN_WORKER_CLASS', 'gthread')
+workers = int(os.getenv('GUNICORN_WORKERS', cpu_count * 2 + 1))
+threads = int(os.getenv('GUNICORN_THREADS', 4))
+if worker_class.startswith('uvicorn'):
+    wsgi_app = 'foodgram.asgi:application'
+else:
+    wsgi_app = 'foodgram.wsgi:application'
+
+preload_app = True
+max_requests = int(os.getenv('GUNICORN_MAX_REQUESTS', 2000))
+max_requests_jitter = max_requests // 10
+max_worker_memory = int(os.getenv('GUNICORN_MAX_WORKER_MEMORY_MB', 512))
+timeout = int(os.getenv('GUNICORN_TIMEOUT', 30))
+graceful_timeout = 30
+keepalive = 5
+accesslog = '-'
+
+
+def on_starting(server):
+    """Файлы метрик прошлого запуска больше не нужны."""
+    os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'foodgram.settings')
+    from django.conf import settings
+
+    shutil.rmtree(settings.METRICS_DIR, ignore_errors=True)
+
+
+def post_worker_init(worker):
+    """Прогрев воркера до начала приёма запросов."""
+    from foodgram.warmup import connect, warm_up
+
+    warm_up()
+    pool = getattr(worker, 'tpool', None)
+    if pool is not None:
+        # У gthread соединения с БД свои в каждом потоке пула: барьер
+        # гарантирует, что каждая задача займёт отдельный поток.
+        barrier = threading.Barrier(worker.cfg.threads)
+
+        def prime():
+            barrier.wait(timeout=30)
+            connect()
+
+        for future in [
+                pool.submit(prime) for _ in range(worker.cfg.threads)]:
+            future.result()
+
+
+def child_exit(server, worker):
+    """Значения метрик завершившегося воркера переносятся в общий файл."""
+    from foodgram import metrics
+
+    metrics.merge_worker(worker.pid)
+
+
+def _rss_mb():
+    with open('/proc/self/statm') as statm:
+        pages = int(statm.read().split()[1])
+    return pages * os.sysconf('SC_PAGE_SIZE') / 2 ** 20
+
+
+def post_request(worker, req, environ, resp):
+    """Мягкий перезапуск воркера, который занял слишком много памяти."""
+    if max_worker_memory and _rss_mb() > max_worker_memory:
+        worker.log.info(
+            'Воркер %s занял больше %s МБ, перезапуск',
+            worker.pid, max_worker_memory)
+        worker.alive = False
@@ -1,4 +1,8 @@
 from django.contrib import admin
+from django.db import transaction
+
+from foodgram.paginators import EstimatedCountPaginator
+from recipes import deletion, outbox
 
 from .models import (
     Favorited,
@@ -10,10 +14,73 @@ from .models import (
 )
 
 
-class IngredientAdmin(admin.ModelAdmin):
+class LargeTableAdmin(admin.ModelAdmin):
+    """Общие настройки для таблиц с миллионами строк."""
+
+    paginator = EstimatedCountPaginator
+    show_full_result_count = False
+
+
+class DeferredDeleteMixin:
+    """
+    Удаление через deletion: объект сразу скрывается, связанные записи
+    удаляются в фоне. Страница подтверждения не собирает все зависимые
+    объекты — для крупных авторов это тысячи строк.
+    """
+
+    delete_object = None
+
+    def get_deleted_objects(self, objs, request):
+        return [str(obj) for obj in objs], {}, set(), []
+
+    def delete_model(self, request, obj):
+        self.delete_object(obj)
+
+    def delete_queryset(self, request, queryset):
+        for obj in queryset:
+            self.delete_object(obj)
+
+
+class OutboxLinkMixin:
+    """
+    Записывает в журнал изменений связи «пользователь — объект»,
+    добавленные, изменённые и удалённые через админку.
+    """
+
+    outbox_topic = None
+    outbox_owner = None
+    outbox_target = None
+
+    def record_link(self, obj, action):
+        outbox.record(
+            self.outbox_topic, action,
+            getattr(obj, f'{self.outbox_target}_id'),
+            user=getattr(obj, f'{self.outbox_owner}_id'))
+
+    def save_model(self, request, obj, form, change):
+        if change:
+            self.record_link(
+                self.model.objects.get(pk=obj.pk), outbox.REMOVED)
+        super().save_model(request, obj, form, change)
+        self.record_link(obj, outbox.ADDED)
+
+    def delete_model(self, request, obj):
+        self.record_link(obj, outbox.REMOVED)
+        super().delete_model(request, obj)
+
+    def delete_queryset(self, request, queryset):
+        # Действие удаления выбранных объектов не оборачивается в
+        # транзакцию админкой.
+        with transaction.atomic():
+            for obj in queryset:
+                self.record_link(obj, outbox.REMOVED)
+            super().delete_queryset(request, queryset)
+
+
+class IngredientAdmin(LargeTableAdmin):
     list_display = ('name', 'measurement_unit')
-    search_fields = ('name',)
-    list_filter = ('name',)
+    search_fields = ('^name',)
+    list_filter = ('measurement_unit',)
 
 
 class TagAdmin(admin.ModelAdmin):
@@ -22,36 +89,62 @@ class TagAdmin(admin.ModelAdmin):
     list_filter = ('name',)
 
 
-class RecipeAdmin(admin.ModelAdmin):
+class RecipeAdmin(DeferredDeleteMixin, LargeTableAdmin):
     list_display = ('pk', 'author', 'name', 'in_favorite')
+    list_select_related = ('author',)
     readonly_fields = ('in_favorite',)
-    search_fields = ('name',)
-    list_filter = ('author', 'name', 'tags')
+    search_fields = ('^name', '=author__username')
+    list_filter = ('tags',)
+    autocomplete_fields = ('author', 'tags')
     empty_value_display = '-пусто-'
+    delete_object = staticmethod(deletion.delete_recipe)
+
+    def save_related(self, request, form, formsets, change):
+        super().save_related(request, form, formsets, change)
+        recipe = form.instance
+        outbox.record(
+            outbox.RECIPE, outbox.UPDATED if change else outbox.CREATED,
+            recipe.pk, author=recipe.author_id)
 
     def in_favorite(self, obj):
-        return obj.favorites.count()
+        return obj.favorites_count
 
     in_favorite.short_description = 'Добавленные рецепты в избранное'
+    in_favorite.admin_order_field = 'favorites_count'
 
 
-class IngredientInRecipeAdmin(admin.ModelAdmin):
+class IngredientInRecipeAdmin(LargeTableAdmin):
     list_display = ('pk', 'recipe', 'ingredient', 'amount')
-    search_fields = ('recipe',)
-    list_filter = ('recipe', 'ingredient')
+    search_fields = ('^recipe__name', '^ingredient__name')
+    autocomplete_fields = ('recipe', 'ingredient')
     empty_value_display = '-пусто-'
 
+    def get_queryset(self, request):
+        # __str__ читает названия рецепта и ингредиента: без соединения
+        # страницы изменения и удаления, действия и журнал делали бы по
+        # два запроса на строку.
+        return super().get_queryset(request).select_related(
+            'recipe', 'ingredient')
+
 
-class FavoritedAdmin(admin.ModelAdmin):
+class FavoritedAdmin(OutboxLinkMixin, LargeTableAdmin):
     list_display = ('author', 'recipe')
-    search_fields = ('author',)
-    list_filter = ('author',)
+    list_select_related = ('author', 'recipe')
+    search_fields = ('=author__username', '^recipe__name')
+    autocomplete_fields = ('author', 'recipe')
+    outbox_topic = outbox.FAVORITE
+    outbox_owner = 'author'
+    outbox_target = 'recipe'
 
 
-class ShoppingCartAdmin(admin.ModelAdmin):
+class ShoppingCartAdmin(OutboxLinkMixin, LargeTableAdmin):
     list_display = ('author', 'recipe')
-    search_fields = ('author',)
-    list_filter = ('author',)
+    list_select_related = ('author', 'recipe')
+    search_fields = ('=author__username', '^recipe__name')
+    autocomplete_fields = ('author', 'recipe')
+    outbox_topic = outbox.CART
+    outbox_owner = 'author'
+    outbox_target = 'recipe'
 
 
 admin.site.register(Ingredient, IngredientAdmin)
@@ -0,0 +1,28 @@
+"""Фоновое выполнение производных вычислений после коммита транзакции."""
+from concurrent.futures import ThreadPoolExecutor
+
+from django.conf import settings
+from django.db import close_old_connections, transaction
+
+_executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix='background')
+
+
+def _run(func, *args):
+    try:
+        func(*args)
+    finally:
+        close_old_connections()
+
+
+def run_after_commit(func, *args):
+    """
+    Выполняет func(*args) после коммита текущей транзакции — в фоновом
+    потоке или сразу, если BACKGROUND_TASKS_ASYNC выключен.
+    """
+    def submit():
+        if settings.BACKGROUND_TASKS_ASYNC:
+            _executor.submit(_run, func, *args)
+        else:
+            func(*args)
+
+    transaction.on_commit(submit)
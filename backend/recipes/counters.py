@@ -0,0 +1,52 @@
+"""
+Счётчик добавлений рецепта в избранное (Recipe.favorites_count).
+
+Счётчик меняется вместе с добавлением и удалением из избранного, поэтому
+сортировка по популярности идёт по индексу, без подсчёта Favorited.
+Строки, удалённые в обход API (удаление пользователя), учитываются
+пересчётом recount_favorites. Обработчик журнала изменений handle_outbox
+пересчитывает рецепты из событий избранного, в том числе изменённого
+через админку.
+"""
+from django.conf import settings
+from django.db.models import Count, F, OuterRef, Subquery, Value
+from django.db.models.functions import Coalesce, Greatest
+
+from recipes import outbox
+from recipes.models import Favorited, Recipe
+
+
+def change_favorites(recipe_id, delta):
+    Recipe.all_objects.filter(pk=recipe_id).update(
+        favorites_count=Greatest(F('favorites_count') + delta, Value(0)))
+
+
+def recount_favorites(recipe_ids=None, batch_size=None):
+    """
+    Пересчитывает счётчик по Favorited для recipe_ids или всех рецептов
+    пачками по batch_size. Возвращает число обновлённых рецептов.
+    """
+    batch_size = batch_size or settings.DELETION_BATCH_SIZE
+    count = Favorited.objects.filter(recipe=OuterRef('pk')).order_by().values(
+        'recipe').annotate(total=Count('pk')).values('total')
+    recipes = Recipe.all_objects.order_by('pk')
+    if recipe_ids is not None:
+        recipes = recipes.filter(pk__in=list(recipe_ids))
+    updated, last = 0, 0
+    while True:
+        batch = list(recipes.filter(pk__gt=last).values_list(
+            'pk', flat=True)[:batch_size])
+        if not batch:
+            return updated
+        updated += Recipe.all_objects.filter(pk__in=batch).update(
+            favorites_count=Coalesce(Subquery(count), 0))
+        last = batch[-1]
+
+
+def handle_outbox(events):
+    """Обработчик consume_outbox: пересчёт по событиям избранного."""
+    recipe_ids = {
+        event.object_id for event in events if event.topic == outbox.FAVORITE
+    }
+    if recipe_ids:
+        recount_favorites(recipe_ids)
@@ -0,0 +1,125 @@
+"""
+Удаление пользователей и рецептов с большим числом связанных записей.
+
+Стандартный Collector загружает в память все зависимые объекты и удаляет
+их одной долгой транзакцией. Здесь объект сразу помечается удалённым
+(менеджеры по умолчанию его скрывают), а зависимые записи удаляются в
+фоне пачками по DELETION_BATCH_SIZE: в памяти одновременно находится не
+больше пачки первичных ключей на каждый уровень вложенности, каждая пачка
+удаляется отдельной короткой транзакцией. Файлы удаляются после того, как
+удалены строки, которые на них ссылались, и только если на них больше
+никто не ссылается.
+"""
+from django.conf import settings
+from django.db import models, router, transaction
+from django.db.models.deletion import get_candidate_relations_to_delete
+
+from recipes import outbox
+from recipes.background import run_after_commit
+from recipes.counters import recount_favorites
+from recipes.models import Favorited, Recipe
+from recipes.signals import recipes_changed
+from recipes.storage import release
+from users.models import User
+
+
+def _files(model, pks):
+    """Файловые поля model и имена файлов в строках с ключами pks."""
+    fields = [
+        field for field in model._meta.concrete_fields
+        if isinstance(field, models.FileField)
+    ]
+    if not fields:
+        return []
+    rows = list(model._base_manager.filter(pk__in=pks).values_list(
+        *(field.attname for field in fields)))
+    return [
+        (field, [row[index] for row in rows])
+        for index, field in enumerate(fields)
+    ]
+
+
+def _purge(model, pks, batch_size):
+    """
+    Удаляет строки model с первичными ключами pks и всё, что на них
+    ссылается с on_delete=CASCADE; для SET_NULL обнуляет ссылки.
+    """
+    # Те же обратные связи, что обходит Collector, включая скрытые
+    # (related_name='+') и промежуточные таблицы многие-ко-многим.
+    for relation in get_candidate_relations_to_delete(model._meta):
+        if relation.on_delete is models.DO_NOTHING:
+            continue
+        field = relation.field
+        manager = relation.related_model._base_manager
+        related = manager.filter(**{f'{field.name}__in': pks})
+        while True:
+            related_pks = list(
+                related.values_list('pk', flat=True)[:batch_size])
+            if not related_pks:
+                break
+            if relation.on_delete is models.SET_NULL:
+                manager.filter(pk__in=related_pks).update(
+                    **{field.name: None})
+            else:
+                _purge(relation.related_model, related_pks, batch_size)
+
+    files = _files(model, pks)
+    queryset = model._base_manager.filter(pk__in=pks)
+    queryset._raw_delete(router.db_for_write(model))
+    for field, names in files:
+        release(model, field.name, names, field.storage)
+
+
+def purge(model, pk, batch_size=None):
+    """Окончательно удаляет объект и все зависимые записи пачками."""
+    _purge(model, [pk], batch_size or settings.DELETION_BATCH_SIZE)
+
+
+def purge_recipe(recipe_id, batch_size=None):
+    purge(Recipe, recipe_id, batch_size)
+
+
+def purge_user(user_id, batch_size=None):
+    batch_size = batch_size or settings.DELETION_BATCH_SIZE
+    # Избранное удаляется напрямую, минуя счётчики рецептов, поэтому
+    # перед удалением пользователя оно удаляется отдельно, а счётчики
+    # пересчитываются по рецептам каждой пачки.
+    favorites = Favorited.objects.filter(author_id=user_id).order_by('pk')
+    while True:
+        batch = list(favorites.values_list('pk', 'recipe_id')[:batch_size])
+        if not batch:
+            break
+        _purge(Favorited, [pk for pk, _ in batch], batch_size)
+        recount_favorites(
+            [recipe_id for _, recipe_id in batch], batch_size)
+    _purge(User, [user_id], batch_size)
+
+
+def delete_recipe(recipe):
+    """Скрывает рецепт и удаляет его вместе со связями после коммита."""
+    with transaction.atomic():
+        Recipe.all_objects.filter(pk=recipe.pk).update(is_deleted=True)
+        outbox.record(
+            outbox.RECIPE, outbox.DELETED, recipe.pk, author=recipe.author_id)
+    recipes_changed.send(sender=Recipe, recipes=[recipe.pk])
+    run_after_commit(purge_recipe, recipe.pk)
+
+
+def delete_user(user):
+    """
+    Скрывает пользователя вместе с его рецептами и удаляет его со всеми
+    связями после коммита.
+    """
+    with transaction.atomic():
+        User.all_objects.filter(pk=user.pk).update(
+            is_deleted=True, is_active=False)
+        outbox.record(outbox.USER, outbox.DELETED, user.pk)
+        outbox.record_many(
+            outbox.RECIPE, outbox.DELETED,
+            Recipe.all_objects.filter(author=user).values_list(
+                'pk', flat=True),
+            author=user.pk)
+    recipes_changed.send(
+        sender=Recipe,
+        recipes=Recipe.all_objects.filter(author=user).values('pk'))
+    run_after_commit(purge_user, user.pk)
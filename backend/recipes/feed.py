@@ -0,0 +1,139 @@
+"""
+Лента «рецепты авторов, на которых я подписан».
+
+Новые рецепты раскладываются по лентам подписчиков (fan-out-on-write)
+в фоновом потоке после коммита транзакции. Рецепты авторов с очень
+большим числом подписчиков не раскладываются, а подмешиваются при чтении
+ленты (fan-out-on-read).
+
+Страница читается по ключу (pub_date, id рецепта): записи ленты
+пользователя — по индексу (user, -pub_date, -recipe), рецепты каждого
+популярного автора — по индексу (author, -pub_date, -id), не больше
+страницы из каждого источника. Результаты сливаются в памяти.
+"""
+from itertools import islice
+
+from django.conf import settings
+from django.db.models import Q
+
+from recipes.background import run_after_commit
+from recipes.models import CelebrityAuthor, FeedEntry, Recipe
+from users.models import Follow
+
+
+def _entries(user_ids, author_id, recipes):
+    """Записи ленты: рецепты [(id, pub_date)] для каждого из user_ids."""
+    for user_id in user_ids:
+        for recipe_id, pub_date in recipes:
+            yield FeedEntry(
+                user_id=user_id,
+                recipe_id=recipe_id,
+                author_id=author_id,
+                pub_date=pub_date,
+            )
+
+
+def _save(entries):
+    """Сохраняет записи пачками по FEED_BATCH_SIZE."""
+    entries = iter(entries)
+    while True:
+        batch = list(islice(entries, settings.FEED_BATCH_SIZE))
+        if not batch:
+            return
+        FeedEntry.objects.bulk_create(batch, ignore_conflicts=True)
+
+
+def _recent(author_id):
+    """Последние FEED_BACKFILL_SIZE рецептов автора: [(id, pub_date)]."""
+    return list(Recipe.objects.filter(author_id=author_id).order_by(
+        '-pub_date', '-pk').values_list(
+        'pk', 'pub_date')[:settings.FEED_BACKFILL_SIZE])
+
+
+def fan_out(recipe_id):
+    """Добавляет рецепт в ленты всех подписчиков автора."""
+    recipe = Recipe.objects.filter(pk=recipe_id).only(
+        'author_id', 'pub_date').first()
+    if recipe is None:
+        return
+    author_id = recipe.author_id
+    followers = Follow.objects.filter(following_id=author_id)
+    if followers.count() > settings.FEED_FANOUT_MAX_FOLLOWERS:
+        CelebrityAuthor.objects.get_or_create(author_id=author_id)
+        return
+    follower_ids = followers.values_list('user_id', flat=True).iterator(
+        chunk_size=settings.FEED_BATCH_SIZE)
+    if CelebrityAuthor.objects.filter(author_id=author_id).exists():
+        # Автор перестал быть популярным: его прошлые рецепты
+        # подмешивались при чтении и в ленты не попадали. Отметка
+        # снимается после заполнения лент, чтобы рецепты не пропали из
+        # них в промежутке; повторы при слиянии отбрасываются.
+        _save(_entries(follower_ids, author_id, _recent(author_id)))
+        CelebrityAuthor.objects.filter(author_id=author_id).delete()
+        return
+    _save(_entries(
+        follower_ids, author_id, [(recipe_id, recipe.pub_date)]))
+
+
+def schedule_fan_out(recipe):
+    """Запускает раскладку рецепта по лентам после коммита."""
+    run_after_commit(fan_out, recipe.pk)
+
+
+def backfill(user_id, author_id):
+    """Заполняет ленту последними рецептами автора после подписки."""
+    if CelebrityAuthor.objects.filter(author_id=author_id).exists():
+        return
+    _save(_entries([user_id], author_id, _recent(author_id)))
+
+
+def trim(user_id, author_id):
+    """Убирает рецепты автора из ленты после отписки."""
+    FeedEntry.objects.filter(user_id=user_id, author_id=author_id).delete()
+
+
+def _beyond(position, reverse, recipe_field):
+    """
+    Условие «после position = (pub_date, id)» в порядке чтения. Условие
+    на pub_date вынесено отдельно, чтобы войти в границу поиска по
+    индексу, а не в фильтр.
+    """
+    if position is None:
+        return Q()
+    pub_date, recipe_id = position
+    op = 'gt' if reverse else 'lt'
+    return Q(**{f'pub_date__{op}e': pub_date}) & (
+        Q(**{f'pub_date__{op}': pub_date})
+        | Q(**{f'{recipe_field}__{op}': recipe_id}))
+
+
+def page(user, count, position=None, reverse=False):
+    """
+    Не больше count рецептов ленты после position: [(pub_date, id)] от
+    новых к старым, а при reverse (страница назад) — от старых к новым.
+    """
+    order = ('pub_date', 'recipe_id') if reverse else (
+        '-pub_date', '-recipe_id')
+    rows = set(FeedEntry.objects.filter(
+        _beyond(position, reverse, 'recipe_id'),
+        user=user,
+        recipe__is_deleted=False,
+        author__is_deleted=False,
+    ).order_by(*order).values_list('pub_date', 'recipe_id')[:count])
+    celebrities = list(Follow.objects.filter(
+        user=user,
+        following__in=CelebrityAuthor.objects.values('author'),
+    ).values_list('following_id', flat=True))
+    if celebrities:
+        order = ('pub_date', 'pk') if reverse else ('-pub_date', '-pk')
+        recipes = [
+            Recipe.objects.filter(
+                _beyond(position, reverse, 'pk'), author_id=author_id,
+            ).order_by(*order).values_list('pub_date', 'pk')[:count]
+            for author_id in celebrities
+        ]
+        if len(recipes) > 1:
+            # Один запрос вместо запроса на автора.
+            recipes = [recipes[0].union(*recipes[1:], all=True)]
+        rows.update(recipes[0])
+    return sorted(rows, reverse=not reverse)[:count]
@@ -0,0 +1,85 @@
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.http.request import validate_host
+from django.test import Client
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+
+from users.models import User
+
+# Страницы админки и допустимое число SQL-запросов на них.
+CHANGELISTS = {
+    'admin:recipes_recipe_changelist': 8,
+    'admin:recipes_ingredient_changelist': 8,
+    'admin:recipes_ingredientinrecipe_changelist': 8,
+    'admin:recipes_favorited_changelist': 8,
+    'admin:recipes_shoppingcart_changelist': 8,
+    'admin:users_user_changelist': 8,
+    'admin:users_follow_changelist': 8,
+}
+
+
+def allowed_host():
+    """Хост, который пропускает ALLOWED_HOSTS (как HttpRequest.get_host)."""
+    allowed = [host for host in settings.ALLOWED_HOSTS if host]
+    if settings.DEBUG and not allowed:
+        allowed = ['.localhost', '127.0.0.1', '[::1]']
+    for host in [host.lstrip('.') for host in allowed] + ['localhost']:
+        if host != '*' and validate_host(host, allowed):
+            return host
+    raise CommandError('В ALLOWED_HOSTS нет подходящего хоста.')
+
+
+class Command(BaseCommand):
+    help = (
+        'Проверяет число SQL-запросов и время ответа списков админки. '
+        'Запускать на базе, заполненной командой seed_data.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--max-ms', type=float, default=500,
+            help='Допустимое время ответа одной страницы, мс.')
+        parser.add_argument('--repeat', type=int, default=3)
+
+    def handle(self, *args, **options):
+        admin = User.objects.filter(is_superuser=True).first()
+        if admin is None:
+            raise CommandError('Нужен хотя бы один суперпользователь.')
+        # Тестовый клиент по умолчанию шлёт Host: testserver, который
+        # отклоняется настоящим ALLOWED_HOSTS с ответом 400.
+        client = Client(HTTP_HOST=allowed_host())
+        client.force_login(admin)
+        failures = []
+        for name, max_queries in CHANGELISTS.items():
+            url = reverse(name)
+            for query in ('', '?q=a'):
+                timings = []
+                for _ in range(options['repeat']):
+                    with CaptureQueriesContext(connection) as queries:
+                        started = time.perf_counter()
+                        response = client.get(url + query)
+                        elapsed = (time.perf_counter() - started) * 1000
+                    if response.status_code != 200:
+                        break
+                    timings.append(elapsed)
+                if response.status_code != 200:
+                    self.stdout.write(f'{url}{query}: {response.status_code}')
+                    failures.append(f'{url}{query}: {response.status_code}')
+                    continue
+                best = min(timings)
+                self.stdout.write(
+                    f'{url}{query}: {response.status_code}, '
+                    f'{len(queries)} запросов, {best:.0f} мс')
+                if len(queries) > max_queries:
+                    failures.append(
+                        f'{url}{query}: {len(queries)} запросов '
+                        f'(допустимо {max_queries})')
+                if best > options['max_ms']:
+                    failures.append(f'{url}{query}: {best:.0f} мс')
+        if failures:
+            raise CommandError('\n'.join(failures))
+        self.stdout.write(self.style.SUCCESS('Все списки админки в норме'))
@@ -0,0 +1,50 @@
+import os
+import time
+from multiprocessing import get_context
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.db import connections
+
+from recipes import similarity
+from recipes.models import SimilarRecipe
+
+
+class Command(BaseCommand):
+    help = 'Полный пересчёт похожих рецептов на всех ядрах.'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--workers', type=int, default=os.cpu_count(),
+            help='Число процессов (по умолчанию — число ядер).')
+        parser.add_argument(
+            '--chunk-size', type=int, default=512,
+            help='Сколько рецептов обрабатывает процесс за раз.')
+        parser.add_argument(
+            '--top-k', type=int, default=settings.SIMILAR_RECIPES_TOP_K)
+
+    def handle(self, *args, **options):
+        started = time.perf_counter()
+        recipes, ingredient_matrix, tag_matrix = similarity.build_matrices()
+        similarity._matrices.update(
+            recipes=recipes,
+            ingredients=ingredient_matrix,
+            tags=tag_matrix,
+            top_k=options['top_k'],
+        )
+        chunk_size = options['chunk_size']
+        chunks = [
+            (start, min(start + chunk_size, len(recipes)))
+            for start in range(0, len(recipes), chunk_size)
+        ]
+        # Процессы получают матрицы через fork и не работают с БД.
+        connections.close_all()
+        with get_context('fork').Pool(options['workers']) as pool:
+            for neighbours in pool.imap_unordered(
+                    similarity.compute_chunk, chunks):
+                similarity.save_neighbours(neighbours)
+        SimilarRecipe.objects.filter(
+            recipe__ingredients_amounts__isnull=True).delete()
+        self.stdout.write(self.style.SUCCESS(
+            f'Похожие рецепты пересчитаны для {len(recipes)} рецептов '
+            f'за {time.perf_counter() - started:.1f} с'))
@@ -0,0 +1,85 @@
+import logging
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.db import close_old_connections
+
+from recipes import outbox
+
+logger = logging.getLogger(__name__)
+
+
+class Command(BaseCommand):
+    help = (
+        'Передаёт события журнала изменений обработчикам OUTBOX_HANDLERS '
+        'по порядку, пачками, с отметкой обработанного для каждого '
+        'обработчика, и удаляет события, обработанные всеми. Без --once '
+        'работает постоянно.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--handler', action='append', dest='handlers',
+            help='Имя обработчика из OUTBOX_HANDLERS, можно указать '
+                 'несколько раз; по умолчанию — все.')
+        parser.add_argument('--batch-size', type=int, default=None)
+        parser.add_argument(
+            '--once', action='store_true',
+            help='Обработать накопившиеся события и завершиться.')
+
+    def handle(self, *args, **options):
+        handlers = outbox.handlers()
+        if options['handlers']:
+            unknown = set(options['handlers']) - set(handlers)
+            if unknown:
+                raise CommandError(
+                    'Неизвестные обработчики: ' + ', '.join(sorted(unknown)))
+            handlers = {
+                name: handlers[name] for name in options['handlers']}
+        next_prune = 0
+        while True:
+            processed, failed = self.drain(handlers, options)
+            pruned = 0
+            if options['once'] or time.monotonic() >= next_prune:
+                # Удалять можно только то, что обработали все обработчики.
+                pruned = outbox.prune(
+                    list(settings.OUTBOX_HANDLERS), options['batch_size'])
+                next_prune = time.monotonic() + settings.OUTBOX_PRUNE_INTERVAL
+            if options['once']:
+                self.stdout.write(
+                    'Обработано событий: ' + ', '.join(
+                        f'{name} {count}'
+                        for name, count in processed.items())
+                    + f'; удалено из журнала: {pruned}')
+                if failed:
+                    raise CommandError(
+                        'Обработчики завершились с ошибкой: '
+                        + ', '.join(failed))
+                return
+            close_old_connections()
+            if not any(processed.values()):
+                time.sleep(settings.OUTBOX_POLL_INTERVAL)
+
+    def drain(self, handlers, options):
+        """
+        Передаёт каждому обработчику все доступные события. Упавший
+        обработчик пропускается до следующего прохода, его пачка будет
+        передана снова.
+        """
+        processed = dict.fromkeys(handlers, 0)
+        failed = []
+        for name, handler in handlers.items():
+            while True:
+                try:
+                    count = outbox.consume(
+                        name, handler, options['batch_size'])
+                except Exception:
+                    logger.exception(
+                        'Обработчик %s завершился с ошибкой', name)
+                    failed.append(name)
+                    break
+                processed[name] += count
+                if not count:
+                    break
+        return processed, failed
@@ -0,0 +1,55 @@
+from django.core.files.storage import default_storage
+from django.core.management.base import BaseCommand
+
+from recipes.models import Recipe
+from recipes.storage import content_name, is_content_name, release
+
+
+class Command(BaseCommand):
+    help = (
+        'Переводит картинки рецептов на имена по хешу содержимого: '
+        'одинаковые файлы сливаются в один, старые файлы удаляются.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--batch-size', type=int, default=500,
+            help='Сколько рецептов обновлять за один запрос.')
+        parser.add_argument(
+            '--dry-run', action='store_true',
+            help='Только посчитать, сколько файлов будет переименовано.')
+
+    def handle(self, *args, **options):
+        storage = default_storage
+        recipes = Recipe.all_objects.exclude(image='').only('pk', 'image')
+        batch, renamed, missing, old_names = [], 0, 0, set()
+        for recipe in recipes.order_by('pk').iterator(
+                chunk_size=options['batch_size']):
+            name = recipe.image.name
+            if is_content_name(name):
+                continue
+            if not storage.exists(name):
+                missing += 1
+                continue
+            with storage.open(name) as content:
+                new_name = content_name(name, content)
+                if not options['dry_run'] and not storage.exists(new_name):
+                    storage.save(name, content)
+            renamed += 1
+            if options['dry_run']:
+                continue
+            old_names.add(name)
+            recipe.image.name = new_name
+            batch.append(recipe)
+            if len(batch) >= options['batch_size']:
+                self.flush(batch, old_names)
+        self.flush(batch, old_names)
+        self.stdout.write(self.style.SUCCESS(
+            f'Переименовано файлов: {renamed}, не найдено: {missing}'))
+
+    def flush(self, batch, old_names):
+        if batch:
+            Recipe.all_objects.bulk_update(batch, ['image'])
+            release(Recipe, 'image', old_names)
+        batch.clear()
+        old_names.clear()
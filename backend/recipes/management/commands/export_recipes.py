@@ -0,0 +1,54 @@
+import tarfile
+import time
+from pathlib import Path
+
+from django.core.files.storage import default_storage
+from django.core.management.base import BaseCommand
+
+from recipes import transfer
+from recipes.models import Recipe
+
+
+class Command(BaseCommand):
+    help = (
+        'Потоковая выгрузка пользователей, тегов, ингредиентов, рецептов, '
+        'подписок, избранного и списков покупок в NDJSON-файлы.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('directory', help='Каталог для выгрузки.')
+        parser.add_argument('--chunk-size', type=int, default=2000)
+        parser.add_argument(
+            '--media', action='store_true',
+            help='Упаковать картинки рецептов в media.tar.')
+
+    def handle(self, *args, **options):
+        directory = Path(options['directory'])
+        directory.mkdir(parents=True, exist_ok=True)
+        for table in transfer.TABLES:
+            started = time.perf_counter()
+            path = directory / f'{table.name}.ndjson'
+            with open(path, 'w', encoding='utf-8') as stream:
+                count = transfer.export_table(
+                    table, stream, options['chunk_size'])
+            self.report(table.name, count, time.perf_counter() - started)
+        if options['media']:
+            started = time.perf_counter()
+            count = self.export_media(directory / 'media.tar')
+            self.report('media', count, time.perf_counter() - started)
+
+    def export_media(self, path):
+        count = 0
+        images = Recipe.objects.order_by('pk').values_list(
+            'image', flat=True).distinct()
+        with tarfile.open(path, 'w') as archive:
+            for name in images.iterator(chunk_size=2000):
+                if name and default_storage.exists(name):
+                    archive.add(default_storage.path(name), arcname=name)
+                    count += 1
+        return count
+
+    def report(self, name, count, elapsed):
+        self.stdout.write(
+            f'{name}: {count} строк за {elapsed:.2f} с '
+            f'({count / max(elapsed, 1e-9):.0f} строк/с)')
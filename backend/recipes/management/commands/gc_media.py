@@ -0,0 +1,58 @@
+import os
+import time
+
+from django.conf import settings
+from django.core.files.storage import default_storage
+from django.core.management.base import BaseCommand
+
+from recipes.models import Recipe
+
+
+class Command(BaseCommand):
+    help = (
+        'Удаляет картинки рецептов, на которые не ссылается ни один '
+        'рецепт, и недописанные временные файлы.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--batch-size', type=int, default=1000,
+            help='Сколько имён проверять за один запрос.')
+        parser.add_argument(
+            '--grace', type=int, default=settings.MEDIA_GC_GRACE_PERIOD,
+            help='Не трогать файлы моложе стольких секунд.')
+        parser.add_argument(
+            '--dry-run', action='store_true',
+            help='Только посчитать лишние файлы.')
+
+    def handle(self, *args, **options):
+        self.options = options
+        self.removed = 0
+        upload_to = Recipe._meta.get_field('image').upload_to.rstrip('/')
+        root = default_storage.path(upload_to)
+        deadline = time.time() - options['grace']
+        batch = []
+        for directory, _, filenames in os.walk(root):
+            for filename in filenames:
+                path = os.path.join(directory, filename)
+                if os.stat(path).st_mtime > deadline:
+                    continue
+                name = os.path.relpath(path, default_storage.location)
+                batch.append(name.replace(os.sep, '/'))
+                if len(batch) >= options['batch_size']:
+                    self.sweep(batch)
+        self.sweep(batch)
+        self.stdout.write(self.style.SUCCESS(
+            f'Удалено файлов без ссылок: {self.removed}'))
+
+    def sweep(self, batch):
+        referenced = set(
+            Recipe.all_objects.filter(image__in=batch)
+            .values_list('image', flat=True)
+        )
+        for name in batch:
+            if name not in referenced:
+                self.removed += 1
+                if not self.options['dry_run']:
+                    default_storage.delete(name)
+        batch.clear()
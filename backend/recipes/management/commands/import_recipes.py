@@ -0,0 +1,78 @@
+import tarfile
+import time
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.db import close_old_connections
+
+from recipes import transfer
+from recipes.models import ImportIdMap, ImportProgress
+
+
+class Command(BaseCommand):
+    help = (
+        'Загрузка NDJSON-выгрузки команды export_recipes. Таблицы одного '
+        'уровня зависимостей загружаются параллельно, прерванный импорт '
+        'продолжается с места остановки при повторном запуске.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('directory', help='Каталог с выгрузкой.')
+        parser.add_argument(
+            '--source',
+            help='Имя импорта для продолжения (по умолчанию — имя каталога).')
+        parser.add_argument('--batch-size', type=int, default=1000)
+        parser.add_argument('--workers', type=int, default=4)
+        parser.add_argument(
+            '--media', action='store_true',
+            help='Распаковать media.tar в MEDIA_ROOT.')
+        parser.add_argument(
+            '--forget', action='store_true',
+            help='После импорта удалить соответствия id и прогресс.')
+
+    def handle(self, *args, **options):
+        directory = Path(options['directory'])
+        if not directory.is_dir():
+            raise CommandError(f'Каталог {directory} не найден')
+        source = options['source'] or directory.resolve().name
+
+        def load(name):
+            started = time.perf_counter()
+            try:
+                created, skipped = transfer.import_table(
+                    source, transfer.TABLES_BY_NAME[name],
+                    directory / f'{name}.ndjson', options['batch_size'])
+            finally:
+                close_old_connections()
+            return name, created, skipped, time.perf_counter() - started
+
+        with ThreadPoolExecutor(options['workers']) as executor:
+            for level in transfer.LEVELS:
+                names = [
+                    name for name in level
+                    if (directory / f'{name}.ndjson').exists()
+                ]
+                for name, created, skipped, elapsed in executor.map(
+                        load, names):
+                    self.stdout.write(
+                        f'{name}: создано {created}, пропущено {skipped} '
+                        f'за {elapsed:.2f} с '
+                        f'({created / max(elapsed, 1e-9):.0f} строк/с)')
+
+        if options['media'] and (directory / 'media.tar').exists():
+            self.import_media(directory / 'media.tar')
+        if options['forget']:
+            ImportIdMap.objects.filter(source=source).delete()
+            ImportProgress.objects.filter(source=source).delete()
+        self.stdout.write(self.style.SUCCESS(f'Импорт {source} завершён'))
+
+    def import_media(self, path):
+        media_root = Path(settings.MEDIA_ROOT).resolve()
+        with tarfile.open(path) as archive:
+            for member in archive:
+                target = (media_root / member.name).resolve()
+                if not member.isfile() or media_root not in target.parents:
+                    continue
+                archive.extract(member, media_root)
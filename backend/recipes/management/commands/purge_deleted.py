@@ -0,0 +1,32 @@
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from recipes import deletion
+from recipes.models import Recipe
+from users.models import User
+
+
+class Command(BaseCommand):
+    help = (
+        'Окончательно удаляет пользователей и рецепты, помеченные '
+        'удалёнными, вместе со связанными записями. Подбирает то, что '
+        'не успела удалить фоновая задача (например, после перезапуска).'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--batch-size', type=int, default=settings.DELETION_BATCH_SIZE,
+            help='Сколько строк удалять за один запрос.')
+
+    def handle(self, *args, **options):
+        batch_size = options['batch_size']
+        for model, purge in (
+            (User, deletion.purge_user),
+            (Recipe, deletion.purge_recipe),
+        ):
+            pks = list(model.all_objects.filter(
+                is_deleted=True).values_list('pk', flat=True))
+            for pk in pks:
+                purge(pk, batch_size)
+            self.stdout.write(self.style.SUCCESS(
+                f'{model._meta.verbose_name_plural}: удалено {len(pks)}'))
@@ -0,0 +1,22 @@
+from django.core.management.base import BaseCommand
+
+from recipes import stats
+
+
+class Command(BaseCommand):
+    help = (
+        'Переносит новые рецепты, избранное, списки покупок и подписки в '
+        'дневную статистику. Запускается периодически, например раз в 10 '
+        'минут.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--batch-size', type=int, default=None,
+            help='Сколько строк источника учитывать за одну транзакцию.')
+
+    def handle(self, *args, **options):
+        processed = stats.rollup(options['batch_size'])
+        self.stdout.write(self.style.SUCCESS(
+            'Учтено строк: ' + ', '.join(
+                f'{source} {count}' for source, count in processed.items())))
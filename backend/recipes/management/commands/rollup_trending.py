@@ -0,0 +1,15 @@
+from django.core.management.base import BaseCommand
+
+from recipes import trending
+
+
+class Command(BaseCommand):
+    help = (
+        'Пересчитывает рейтинги популярных рецептов по почасовым '
+        'счётчикам. Запускается периодически, например раз в 10 минут.'
+    )
+
+    def handle(self, *args, **options):
+        count = trending.rollup()
+        self.stdout.write(self.style.SUCCESS(
+            f'Рейтинги популярности обновлены для {count} рецептов'))
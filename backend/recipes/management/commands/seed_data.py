@@ -0,0 +1,132 @@
+import random
+import time
+
+from django.contrib.auth.hashers import make_password
+from django.core.management.base import BaseCommand
+
+from recipes.counters import recount_favorites
+from recipes.models import (
+    Favorited,
+    Ingredient,
+    IngredientInRecipe,
+    Recipe,
+    ShoppingCart,
+    Tag,
+)
+from users.models import Follow, User
+
+WORDS = (
+    'суп', 'салат', 'пирог', 'каша', 'рагу', 'омлет', 'паста', 'плов',
+    'борщ', 'торт', 'запеканка', 'котлеты', 'блины', 'сырники', 'шашлык',
+)
+
+
+class Command(BaseCommand):
+    help = (
+        'Заполняет базу синтетическими данными для нагрузочных тестов '
+        'и бенчмарков: пользователи, рецепты, подписки, избранное, корзины.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--users', type=int, default=1000)
+        parser.add_argument('--recipes', type=int, default=10000)
+        parser.add_argument('--ingredients', type=int, default=2000)
+        parser.add_argument('--follows-per-user', type=int, default=20)
+        parser.add_argument('--favorites-per-user', type=int, default=30)
+        parser.add_argument('--cart-per-user', type=int, default=5)
+        parser.add_argument('--batch-size', type=int, default=5000)
+        parser.add_argument('--seed', type=int, default=0)
+
+    def handle(self, *args, **options):
+        random.seed(options['seed'])
+        self.batch_size = options['batch_size']
+        started = time.perf_counter()
+        prefix = f'seed{int(time.time())}'
+
+        password = make_password('seed-password')
+        users = self.create(User, (
+            User(
+                username=f'{prefix}_{number}',
+                email=f'{prefix}_{number}@example.com',
+                first_name='Имя',
+                last_name='Фамилия',
+                password=password,
+            )
+            for number in range(options['users'])
+        ))
+        tags = list(Tag.objects.all()) or self.create(Tag, (
+            Tag(name=name, color=color, slug=slug)
+            for name, color, slug in (
+                ('Завтрак', '#E26C2D', 'breakfast'),
+                ('Обед', '#49B64E', 'lunch'),
+                ('Ужин', '#8775D2', 'dinner'),
+            )
+        ))
+        ingredients = list(Ingredient.objects.values_list('pk', flat=True))
+        if not ingredients:
+            ingredients = [ingredient.pk for ingredient in self.create(
+                Ingredient, (
+                    Ingredient(name=f'ингредиент {number}',
+                               measurement_unit='г')
+                    for number in range(options['ingredients'])
+                ))]
+
+        recipes = self.create(Recipe, (
+            Recipe(
+                author=random.choice(users),
+                name=f'{random.choice(WORDS)} {number}',
+                image='recipes/seed.png',
+                text='Описание рецепта.',
+                cooking_time=random.randint(1, 180),
+            )
+            for number in range(options['recipes'])
+        ))
+        self.create(IngredientInRecipe, (
+            IngredientInRecipe(recipe=recipe, ingredient_id=ingredient,
+                               amount=random.randint(1, 500))
+            for recipe in recipes
+            for ingredient in random.sample(
+                ingredients, min(len(ingredients), random.randint(3, 10)))
+        ))
+        self.create(Recipe.tags.through, (
+            Recipe.tags.through(recipe=recipe, tag=tag)
+            for recipe in recipes
+            for tag in random.sample(tags, random.randint(1, len(tags)))
+        ))
+        self.create(Follow, (
+            Follow(user=user, following=author)
+            for user in users
+            for author in self.sample(users, options['follows_per_user'])
+            if author != user
+        ))
+        self.create(Favorited, (
+            Favorited(author=user, recipe=recipe)
+            for user in users
+            for recipe in self.sample(recipes, options['favorites_per_user'])
+        ))
+        # bulk_create не меняет денормализованный Recipe.favorites_count.
+        recount_favorites(
+            [recipe.pk for recipe in recipes], self.batch_size)
+        self.create(ShoppingCart, (
+            ShoppingCart(author=user, recipe=recipe)
+            for user in users
+            for recipe in self.sample(recipes, options['cart_per_user'])
+        ))
+        self.stdout.write(self.style.SUCCESS(
+            f'Данные созданы за {time.perf_counter() - started:.1f} с'))
+
+    @staticmethod
+    def sample(population, count):
+        return random.sample(population, min(len(population), count))
+
+    def create(self, model, objects):
+        created = []
+        batch = []
+        for obj in objects:
+            batch.append(obj)
+            if len(batch) >= self.batch_size:
+                created.extend(model.objects.bulk_create(batch))
+                batch = []
+        created.extend(model.objects.bulk_create(batch))
+        self.stdout.write(f'{model._meta.verbose_name_plural}: {len(created)}')
+        return created
@@ -0,0 +1,46 @@
+# Generated by Django 4.2.4 on 2026-10-19 08:22
+
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+        ('users', '0003_alter_follow_options_alter_user_options'),
+        ('recipes', '0006_alter_tag_name'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='CelebrityAuthor',
+            fields=[
+                ('author', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='+', serialize=False, to=settings.AUTH_USER_MODEL, verbose_name='Автор')),
+            ],
+            options={
+                'verbose_name': 'Популярный автор',
+                'verbose_name_plural': 'Популярные авторы',
+            },
+        ),
+        migrations.CreateModel(
+            name='FeedEntry',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('pub_date', models.DateTimeField(verbose_name='Дата создания рецепта')),
+                ('author', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='+', to=settings.AUTH_USER_MODEL, verbose_name='Автор рецепта')),
+                ('recipe', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='feed_entries', to='recipes.recipe', verbose_name='Рецепт')),
+                ('user', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='feed_entries', to=settings.AUTH_USER_MODEL, verbose_name='Подписчик')),
+            ],
+            options={
+                'verbose_name': 'Запись ленты',
+                'verbose_name_plural': 'Записи ленты',
+                'indexes': [models.Index(fields=['user', '-pub_date'], name='feed_user_pub_date_idx'), models.Index(fields=['user', 'author'], name='feed_user_author_idx')],
+            },
+        ),
+        migrations.AddConstraint(
+            model_name='feedentry',
+            constraint=models.UniqueConstraint(fields=('user', 'recipe'), name='unique_feed_entry'),
+        ),
+    ]
@@ -0,0 +1,32 @@
+# Generated by Django 4.2.4 on 2026-10-19 08:24
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('recipes', '0007_feedentry_celebrityauthor'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='SimilarRecipe',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('score', models.FloatField(verbose_name='Степень сходства')),
+                ('recipe', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='similar_recipes', to='recipes.recipe', verbose_name='Рецепт')),
+                ('similar', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='+', to='recipes.recipe', verbose_name='Похожий рецепт')),
+            ],
+            options={
+                'verbose_name': 'Похожий рецепт',
+                'verbose_name_plural': 'Похожие рецепты',
+                'indexes': [models.Index(fields=['recipe', '-score'], name='similar_recipe_score_idx')],
+            },
+        ),
+        migrations.AddConstraint(
+            model_name='similarrecipe',
+            constraint=models.UniqueConstraint(fields=('recipe', 'similar'), name='unique_similar_recipe'),
+        ),
+    ]
@@ -0,0 +1,46 @@
+# Generated by Django 4.2.4 on 2026-10-19 08:25
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('recipes', '0008_similarrecipe'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='RecipeTrending',
+            fields=[
+                ('recipe', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='trending', serialize=False, to='recipes.recipe', verbose_name='Рецепт')),
+                ('score_24h', models.FloatField(default=0, verbose_name='Рейтинг за сутки')),
+                ('score_7d', models.FloatField(default=0, verbose_name='Рейтинг за неделю')),
+                ('score_30d', models.FloatField(default=0, verbose_name='Рейтинг за месяц')),
+            ],
+            options={
+                'verbose_name': 'Популярность рецепта',
+                'verbose_name_plural': 'Популярность рецептов',
+                'indexes': [models.Index(fields=['-score_24h', '-recipe'], name='trending_24h_idx'), models.Index(fields=['-score_7d', '-recipe'], name='trending_7d_idx'), models.Index(fields=['-score_30d', '-recipe'], name='trending_30d_idx')],
+            },
+        ),
+        migrations.CreateModel(
+            name='RecipeActivity',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('bucket', models.DateTimeField(db_index=True, verbose_name='Начало часа')),
+                ('favorites', models.PositiveIntegerField(default=0, verbose_name='Добавлений в избранное')),
+                ('carts', models.PositiveIntegerField(default=0, verbose_name='Добавлений в список покупок')),
+                ('recipe', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='activity', to='recipes.recipe', verbose_name='Рецепт')),
+            ],
+            options={
+                'verbose_name': 'Активность по рецепту',
+                'verbose_name_plural': 'Активность по рецептам',
+            },
+        ),
+        migrations.AddConstraint(
+            model_name='recipeactivity',
+            constraint=models.UniqueConstraint(fields=('recipe', 'bucket'), name='unique_recipe_activity_bucket'),
+        ),
+    ]
@@ -0,0 +1,48 @@
+# Generated by Django 4.2.4 on 2026-10-19 08:26
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('recipes', '0009_recipeactivity_recipetrending'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ImportIdMap',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('source', models.CharField(max_length=200, verbose_name='Источник импорта')),
+                ('table', models.CharField(max_length=50, verbose_name='Таблица')),
+                ('old_id', models.BigIntegerField(verbose_name='Id в источнике')),
+                ('new_id', models.BigIntegerField(verbose_name='Id в базе')),
+            ],
+            options={
+                'verbose_name': 'Соответствие id при импорте',
+                'verbose_name_plural': 'Соответствия id при импорте',
+            },
+        ),
+        migrations.CreateModel(
+            name='ImportProgress',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('source', models.CharField(max_length=200, verbose_name='Источник импорта')),
+                ('table', models.CharField(max_length=50, verbose_name='Таблица')),
+                ('line', models.PositiveBigIntegerField(default=0, verbose_name='Загружено строк')),
+            ],
+            options={
+                'verbose_name': 'Прогресс импорта',
+                'verbose_name_plural': 'Прогресс импорта',
+            },
+        ),
+        migrations.AddConstraint(
+            model_name='importprogress',
+            constraint=models.UniqueConstraint(fields=('source', 'table'), name='unique_import_progress'),
+        ),
+        migrations.AddConstraint(
+            model_name='importidmap',
+            constraint=models.UniqueConstraint(fields=('source', 'table', 'old_id'), name='unique_import_id_map'),
+        ),
+    ]
@@ -0,0 +1,24 @@
+# Generated by Django 4.2.4 on 2026-10-19 08:29
+
+import django.contrib.postgres.indexes
+from django.db import migrations, models
+import django.db.models.functions.comparison
+import django.db.models.functions.text
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('recipes', '0010_importidmap_importprogress'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='ingredient',
+            index=models.Index(django.contrib.postgres.indexes.OpClass(django.db.models.functions.text.Upper(django.db.models.functions.comparison.Cast('name', models.TextField())), name='text_pattern_ops'), name='ingredient_name_upper_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='recipe',
+            index=models.Index(django.contrib.postgres.indexes.OpClass(django.db.models.functions.text.Upper(django.db.models.functions.comparison.Cast('name', models.TextField())), name='text_pattern_ops'), name='recipe_name_upper_idx'),
+        ),
+    ]
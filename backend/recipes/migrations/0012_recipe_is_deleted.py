@@ -0,0 +1,18 @@
+# Generated by Django 4.2.4 on 2026-10-19 08:33
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('recipes', '0011_ingredient_ingredient_name_upper_idx_and_more'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='recipe',
+            name='is_deleted',
+            field=models.BooleanField(default=False, verbose_name='Удалён'),
+        ),
+    ]
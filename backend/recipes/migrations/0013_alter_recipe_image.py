@@ -0,0 +1,18 @@
+# Generated by Django 4.2.4 on 2026-10-19 08:35
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('recipes', '0012_recipe_is_deleted'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='recipe',
+            name='image',
+            field=models.ImageField(db_index=True, upload_to='recipes/', verbose_name='Картинка рецепта'),
+        ),
+    ]
@@ -0,0 +1,116 @@
+# Generated by Django 4.2.4 on 2026-10-19 08:50
+
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+        ('recipes', '0014_recipe_updated_at'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='DailyStats',
+            fields=[
+                ('day', models.DateField(primary_key=True, serialize=False, verbose_name='День')),
+                ('recipes', models.PositiveIntegerField(default=0, verbose_name='Новых рецептов')),
+                ('ingredients', models.PositiveIntegerField(default=0, verbose_name='Ингредиентов в новых рецептах')),
+                ('favorites', models.PositiveIntegerField(default=0, verbose_name='Добавлений в избранное')),
+                ('carts', models.PositiveIntegerField(default=0, verbose_name='Добавлений в список покупок')),
+                ('follows', models.PositiveIntegerField(default=0, verbose_name='Новых подписок')),
+            ],
+            options={
+                'verbose_name': 'Статистика за день',
+                'verbose_name_plural': 'Статистика по дням',
+                'ordering': ('day',),
+            },
+        ),
+        migrations.CreateModel(
+            name='StatsWatermark',
+            fields=[
+                ('source', models.CharField(max_length=50, primary_key=True, serialize=False, verbose_name='Таблица')),
+                ('last_id', models.BigIntegerField(default=0, verbose_name='Последний учтённый id')),
+            ],
+            options={
+                'verbose_name': 'Отметка статистики',
+                'verbose_name_plural': 'Отметки статистики',
+            },
+        ),
+        migrations.CreateModel(
+            name='DailyUserActivity',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('day', models.DateField(verbose_name='День')),
+                ('recipes', models.PositiveIntegerField(default=0, verbose_name='Новых рецептов')),
+                ('favorites', models.PositiveIntegerField(default=0, verbose_name='Добавлений в избранное')),
+                ('carts', models.PositiveIntegerField(default=0, verbose_name='Добавлений в список покупок')),
+                ('follows', models.PositiveIntegerField(default=0, verbose_name='Новых подписок')),
+                ('user', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='+', to=settings.AUTH_USER_MODEL, verbose_name='Пользователь')),
+            ],
+            options={
+                'verbose_name': 'Активность пользователя за день',
+                'verbose_name_plural': 'Активность пользователей по дням',
+            },
+        ),
+        migrations.CreateModel(
+            name='DailyRecipeStats',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('day', models.DateField(verbose_name='День')),
+                ('favorites', models.PositiveIntegerField(default=0, verbose_name='Добавлений в избранное')),
+                ('carts', models.PositiveIntegerField(default=0, verbose_name='Добавлений в список покупок')),
+                ('recipe', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='+', to='recipes.recipe', verbose_name='Рецепт')),
+            ],
+            options={
+                'verbose_name': 'Статистика рецепта за день',
+                'verbose_name_plural': 'Статистика рецептов по дням',
+            },
+        ),
+        migrations.CreateModel(
+            name='DailyIngredientStats',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('day', models.DateField(verbose_name='День')),
+                ('recipes', models.PositiveIntegerField(default=0, verbose_name='Рецептов')),
+                ('ingredient', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='+', to='recipes.ingredient', verbose_name='Ингредиент')),
+            ],
+            options={
+                'verbose_name': 'Статистика ингредиента за день',
+                'verbose_name_plural': 'Статистика ингредиентов по дням',
+            },
+        ),
+        migrations.CreateModel(
+            name='DailyAuthorStats',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('day', models.DateField(verbose_name='День')),
+                ('recipes', models.PositiveIntegerField(default=0, verbose_name='Новых рецептов')),
+                ('favorites', models.PositiveIntegerField(default=0, verbose_name='Добавлений в избранное')),
+                ('author', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='+', to=settings.AUTH_USER_MODEL, verbose_name='Автор')),
+            ],
+            options={
+                'verbose_name': 'Статистика автора за день',
+                'verbose_name_plural': 'Статистика авторов по дням',
+            },
+        ),
+        migrations.AddConstraint(
+            model_name='dailyuseractivity',
+            constraint=models.UniqueConstraint(fields=('day', 'user'), name='unique_daily_user_activity'),
+        ),
+        migrations.AddConstraint(
+            model_name='dailyrecipestats',
+            constraint=models.UniqueConstraint(fields=('day', 'recipe'), name='unique_daily_recipe_stats'),
+        ),
+        migrations.AddConstraint(
+            model_name='dailyingredientstats',
+            constraint=models.UniqueConstraint(fields=('day', 'ingredient'), name='unique_daily_ingredient_stats'),
+        ),
+        migrations.AddConstraint(
+            model_name='dailyauthorstats',
+            constraint=models.UniqueConstraint(fields=('day', 'author'), name='unique_daily_author_stats'),
+        ),
+    ]
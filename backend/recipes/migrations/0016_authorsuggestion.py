@@ -0,0 +1,34 @@
+# Generated by Django 4.2.4 on 2026-10-19 08:52
+
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+        ('recipes', '0015_daily_stats'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='AuthorSuggestion',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('score', models.FloatField(verbose_name='Оценка')),
+                ('author', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='+', to=settings.AUTH_USER_MODEL, verbose_name='Рекомендуемый автор')),
+                ('user', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='author_suggestions', to=settings.AUTH_USER_MODEL, verbose_name='Пользователь')),
+            ],
+            options={
+                'verbose_name': 'Рекомендация автора',
+                'verbose_name_plural': 'Рекомендации авторов',
+                'indexes': [models.Index(fields=['user', '-score'], name='author_suggestion_score_idx')],
+            },
+        ),
+        migrations.AddConstraint(
+            model_name='authorsuggestion',
+            constraint=models.UniqueConstraint(fields=('user', 'author'), name='unique_author_suggestion'),
+        ),
+    ]
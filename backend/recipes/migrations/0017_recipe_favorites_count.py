@@ -0,0 +1,38 @@
+# Generated by Django 4.2.4 on 2026-10-19 08:53
+
+from django.db import migrations, models
+from django.db.models import Count, OuterRef, Subquery
+from django.db.models.functions import Coalesce
+
+
+def fill_favorites_count(apps, schema_editor):
+    Recipe = apps.get_model('recipes', 'Recipe')
+    Favorited = apps.get_model('recipes', 'Favorited')
+    count = Favorited.objects.filter(recipe=OuterRef('pk')).order_by().values(
+        'recipe').annotate(total=Count('pk')).values('total')
+    Recipe.objects.update(favorites_count=Coalesce(Subquery(count), 0))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('recipes', '0016_authorsuggestion'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='recipe',
+            name='favorites_count',
+            field=models.PositiveIntegerField(default=0, verbose_name='В избранном'),
+        ),
+        migrations.RunPython(
+            fill_favorites_count, migrations.RunPython.noop),
+        migrations.AddIndex(
+            model_name='recipe',
+            index=models.Index(condition=models.Q(('is_deleted', False)), fields=['cooking_time', '-pub_date'], name='recipe_cooking_time_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='recipe',
+            index=models.Index(condition=models.Q(('is_deleted', False)), fields=['-favorites_count', '-pub_date'], name='recipe_popular_idx'),
+        ),
+    ]
@@ -0,0 +1,43 @@
+# Generated by Django 4.2.4 on 2026-10-19 09:01
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('recipes', '0017_recipe_favorites_count'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='OutboxCheckpoint',
+            fields=[
+                ('consumer', models.CharField(max_length=50, primary_key=True, serialize=False, verbose_name='Обработчик')),
+                ('transaction_id', models.BigIntegerField(default=0, verbose_name='Номер транзакции')),
+                ('last_id', models.BigIntegerField(default=0, verbose_name='Последний обработанный id')),
+                ('updated_at', models.DateTimeField(auto_now=True, verbose_name='Обновлено')),
+            ],
+            options={
+                'verbose_name': 'Отметка обработчика событий',
+                'verbose_name_plural': 'Отметки обработчиков событий',
+            },
+        ),
+        migrations.CreateModel(
+            name='OutboxEvent',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('topic', models.CharField(max_length=20, verbose_name='Что изменилось')),
+                ('action', models.CharField(max_length=20, verbose_name='Действие')),
+                ('object_id', models.BigIntegerField(verbose_name='id объекта')),
+                ('data', models.JSONField(default=dict, verbose_name='Подробности')),
+                ('transaction_id', models.BigIntegerField(default=0, verbose_name='Номер транзакции')),
+                ('created_at', models.DateTimeField(auto_now_add=True, verbose_name='Создано')),
+            ],
+            options={
+                'verbose_name': 'Событие изменения',
+                'verbose_name_plural': 'События изменений',
+                'indexes': [models.Index(fields=['transaction_id', 'id'], name='outbox_event_order_idx')],
+            },
+        ),
+    ]
@@ -0,0 +1,25 @@
+# Generated by Django 4.2.4 on 2026-10-19 09:24
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('recipes', '0018_outbox'),
+    ]
+
+    operations = [
+        migrations.RemoveIndex(
+            model_name='feedentry',
+            name='feed_user_pub_date_idx',
+        ),
+        migrations.AddIndex(
+            model_name='feedentry',
+            index=models.Index(fields=['user', '-pub_date', '-recipe'], name='feed_user_pub_date_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='recipe',
+            index=models.Index(condition=models.Q(('is_deleted', False)), fields=['author', '-pub_date', '-id'], name='recipe_author_pub_date_idx'),
+        ),
+    ]
@@ -0,0 +1,23 @@
+# Generated by Django 4.2.4 on 2026-10-19 09:29
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('recipes', '0019_feed_keyset_indexes'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='statswatermark',
+            name='pending_at',
+            field=models.DateTimeField(blank=True, null=True, verbose_name='Когда запомнен pending_id'),
+        ),
+        migrations.AddField(
+            model_name='statswatermark',
+            name='pending_id',
+            field=models.BigIntegerField(blank=True, null=True, verbose_name='Наибольший id на момент pending_at'),
+        ),
+    ]
@@ -0,0 +1,17 @@
+# Generated by Django 4.2.4 on 2026-10-19 09:30
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('recipes', '0020_stats_watermark_pending'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='outboxevent',
+            index=models.Index(fields=['created_at'], name='outbox_event_created_at_idx'),
+        ),
+    ]
@@ -1,6 +1,9 @@
+from django.contrib.postgres.indexes import OpClass
 from django.core import validators
 from django.core.validators import MinValueValidator
 from django.db import models
+from django.db.models import Exists, OuterRef, Value
+from django.db.models.functions import Cast, Upper
 
 from users.models import User
 
@@ -21,6 +24,14 @@ class Ingredient(models.Model):
         verbose_name = 'Ингредиент'
         verbose_name_plural = 'Ингредиенты'
         ordering = ('name',)
+        indexes = [
+            # Поиск по началу названия без учёта регистра (istartswith).
+            models.Index(
+                OpClass(
+                    Upper(Cast('name', models.TextField())),
+                    name='text_pattern_ops'),
+                name='ingredient_name_upper_idx'),
+        ]
 
     def __str__(self):
         return self.name
@@ -62,6 +73,40 @@ class Tag(models.Model):
         return self.name
 
 
+class RecipeQuerySet(models.QuerySet):
+    def with_user_flags(self, user):
+        """
+        Аннотирует рецепты флагами is_favorited и is_in_shopping_cart
+        для пользователя, чтобы не делать запрос на каждый рецепт.
+        """
+        if not user.is_authenticated:
+            return self.annotate(
+                is_favorited=Value(False),
+                is_in_shopping_cart=Value(False))
+        return self.annotate(
+            is_favorited=Exists(Favorited.objects.filter(
+                recipe=OuterRef('pk'), author=user)),
+            is_in_shopping_cart=Exists(ShoppingCart.objects.filter(
+                recipe=OuterRef('pk'), author=user)))
+
+    def for_read(self, user):
+        """Рецепты со всеми связями, нужными для RecipeReadSerializer."""
+        return self.select_related('author').prefetch_related(
+            'tags', 'ingredients_amounts__ingredient',
+        ).with_user_flags(user)
+
+
+class RecipeManager(models.Manager.from_queryset(RecipeQuerySet)):
+    """
+    Менеджер по умолчанию: скрывает рецепты, ожидающие удаления,
+    и рецепты удалённых пользователей.
+    """
+
+    def get_queryset(self):
+        return super().get_queryset().filter(
+            is_deleted=False, author__is_deleted=False)
+
+
 class Recipe(models.Model):
     author = models.ForeignKey(
         User,
@@ -73,6 +118,7 @@ class Recipe(models.Model):
         verbose_name='Название рецепта')
     image = models.ImageField(
         upload_to='recipes/',
+        db_index=True,
         verbose_name='Картинка рецепта')
     text = models.TextField(
         verbose_name='Описание блюда')
@@ -93,11 +139,48 @@ class Recipe(models.Model):
         auto_now_add=True,
         db_index=True,
         verbose_name='Дата создания')
+    # Обновляется при изменении рецепта, его ингредиентов и тегов
+    # (recipes.signals); по нему строятся ETag и Last-Modified.
+    updated_at = models.DateTimeField(
+        auto_now=True,
+        db_index=True,
+        verbose_name='Дата изменения')
+    # Рецепт удалён, связанные данные удаляются в фоне.
+    is_deleted = models.BooleanField(
+        default=False, verbose_name='Удалён')
+    # Поддерживается recipes.counters, нужен для сортировки по популярности.
+    favorites_count = models.PositiveIntegerField(
+        default=0, verbose_name='В избранном')
+
+    objects = RecipeManager()
+    all_objects = RecipeQuerySet.as_manager()
 
     class Meta:
         verbose_name = 'Рецепт'
         verbose_name_plural = 'Рецепты'
         ordering = ('-pub_date',)
+        indexes = [
+            models.Index(
+                OpClass(
+                    Upper(Cast('name', models.TextField())),
+                    name='text_pattern_ops'),
+                name='recipe_name_upper_idx'),
+            # Сортировки списка (api.filters.ORDERINGS): индекс на каждую,
+            # чтобы первая страница читалась по индексу с LIMIT.
+            models.Index(
+                fields=['cooking_time', '-pub_date'],
+                condition=models.Q(is_deleted=False),
+                name='recipe_cooking_time_idx'),
+            models.Index(
+                fields=['-favorites_count', '-pub_date'],
+                condition=models.Q(is_deleted=False),
+                name='recipe_popular_idx'),
+            # Рецепты популярного автора в ленте (recipes.feed).
+            models.Index(
+                fields=['author', '-pub_date', '-id'],
+                condition=models.Q(is_deleted=False),
+                name='recipe_author_pub_date_idx'),
+        ]
 
     def __str__(self):
         return self.name
@@ -179,3 +262,477 @@ class ShoppingCart(models.Model):
 
     def __str__(self):
         return f'У {self.author} {self.recipe} в списке покупок'
+
+
+class FeedEntry(models.Model):
+    """Строка ленты: рецепт автора, на которого подписан пользователь."""
+
+    user = models.ForeignKey(
+        User,
+        on_delete=models.CASCADE,
+        related_name='feed_entries',
+        verbose_name='Подписчик')
+    recipe = models.ForeignKey(
+        Recipe,
+        on_delete=models.CASCADE,
+        related_name='feed_entries',
+        verbose_name='Рецепт')
+    author = models.ForeignKey(
+        User,
+        on_delete=models.CASCADE,
+        related_name='+',
+        verbose_name='Автор рецепта')
+    pub_date = models.DateTimeField(
+        verbose_name='Дата создания рецепта')
+
+    class Meta:
+        verbose_name = 'Запись ленты'
+        verbose_name_plural = 'Записи ленты'
+        constraints = [models.UniqueConstraint(
+            fields=['user', 'recipe'],
+            name='unique_feed_entry')]
+        indexes = [
+            models.Index(
+                fields=['user', '-pub_date', '-recipe'],
+                name='feed_user_pub_date_idx'),
+            models.Index(
+                fields=['user', 'author'], name='feed_user_author_idx'),
+        ]
+
+    def __str__(self):
+        return f'{self.recipe} в ленте {self.user}'
+
+
+class CelebrityAuthor(models.Model):
+    """
+    Автор с большим числом подписчиков. Его рецепты не раскладываются
+    по лентам при публикации, а подмешиваются в ленту при чтении.
+    """
+
+    author = models.OneToOneField(
+        User,
+        on_delete=models.CASCADE,
+        primary_key=True,
+        related_name='+',
+        verbose_name='Автор')
+
+    class Meta:
+        verbose_name = 'Популярный автор'
+        verbose_name_plural = 'Популярные авторы'
+
+    def __str__(self):
+        return str(self.author)
+
+
+class SimilarRecipe(models.Model):
+    """Предрассчитанный сосед рецепта по составу ингредиентов и тегам."""
+
+    recipe = models.ForeignKey(
+        Recipe,
+        on_delete=models.CASCADE,
+        related_name='similar_recipes',
+        verbose_name='Рецепт')
+    similar = models.ForeignKey(
+        Recipe,
+        on_delete=models.CASCADE,
+        related_name='+',
+        verbose_name='Похожий рецепт')
+    score = models.FloatField(
+        verbose_name='Степень сходства')
+
+    class Meta:
+        verbose_name = 'Похожий рецепт'
+        verbose_name_plural = 'Похожие рецепты'
+        constraints = [models.UniqueConstraint(
+            fields=['recipe', 'similar'],
+            name='unique_similar_recipe')]
+        indexes = [
+            models.Index(
+                fields=['recipe', '-score'], name='similar_recipe_score_idx'),
+        ]
+
+    def __str__(self):
+        return f'{self.recipe} ~ {self.similar}'
+
+
+class AuthorSuggestion(models.Model):
+    """Предрассчитанная рекомендация автора пользователю."""
+
+    user = models.ForeignKey(
+        User,
+        on_delete=models.CASCADE,
+        related_name='author_suggestions',
+        verbose_name='Пользователь')
+    author = models.ForeignKey(
+        User,
+        on_delete=models.CASCADE,
+        related_name='+',
+        verbose_name='Рекомендуемый автор')
+    score = models.FloatField(
+        verbose_name='Оценка')
+
+    class Meta:
+        verbose_name = 'Рекомендация автора'
+        verbose_name_plural = 'Рекомендации авторов'
+        constraints = [models.UniqueConstraint(
+            fields=['user', 'author'],
+            name='unique_author_suggestion')]
+        indexes = [
+            models.Index(
+                fields=['user', '-score'], name='author_suggestion_score_idx'),
+        ]
+
+    def __str__(self):
+        return f'{self.author} для {self.user}'
+
+
+class RecipeActivity(models.Model):
+    """Почасовой счётчик добавлений рецепта в избранное и список покупок."""
+
+    recipe = models.ForeignKey(
+        Recipe,
+        on_delete=models.CASCADE,
+        related_name='activity',
+        verbose_name='Рецепт')
+    bucket = models.DateTimeField(
+        db_index=True,
+        verbose_name='Начало часа')
+    favorites = models.PositiveIntegerField(
+        default=0,
+        verbose_name='Добавлений в избранное')
+    carts = models.PositiveIntegerField(
+        default=0,
+        verbose_name='Добавлений в список покупок')
+
+    class Meta:
+        verbose_name = 'Активность по рецепту'
+        verbose_name_plural = 'Активность по рецептам'
+        constraints = [models.UniqueConstraint(
+            fields=['recipe', 'bucket'],
+            name='unique_recipe_activity_bucket')]
+
+    def __str__(self):
+        return f'{self.recipe} {self.bucket:%Y-%m-%d %H:00}'
+
+
+class RecipeTrending(models.Model):
+    """Рейтинг популярности рецепта с затуханием по трём окнам."""
+
+    recipe = models.OneToOneField(
+        Recipe,
+        on_delete=models.CASCADE,
+        primary_key=True,
+        related_name='trending',
+        verbose_name='Рецепт')
+    score_24h = models.FloatField(
+        default=0,
+        verbose_name='Рейтинг за сутки')
+    score_7d = models.FloatField(
+        default=0,
+        verbose_name='Рейтинг за неделю')
+    score_30d = models.FloatField(
+        default=0,
+        verbose_name='Рейтинг за месяц')
+
+    class Meta:
+        verbose_name = 'Популярность рецепта'
+        verbose_name_plural = 'Популярность рецептов'
+        indexes = [
+            models.Index(
+                fields=['-score_24h', '-recipe'], name='trending_24h_idx'),
+            models.Index(
+                fields=['-score_7d', '-recipe'], name='trending_7d_idx'),
+            models.Index(
+                fields=['-score_30d', '-recipe'], name='trending_30d_idx'),
+        ]
+
+    def __str__(self):
+        return str(self.recipe)
+
+
+class ImportIdMap(models.Model):
+    """Соответствие id записи в источнике импорта и в этой базе."""
+
+    source = models.CharField(
+        max_length=200,
+        verbose_name='Источник импорта')
+    table = models.CharField(
+        max_length=50,
+        verbose_name='Таблица')
+    old_id = models.BigIntegerField(
+        verbose_name='Id в источнике')
+    new_id = models.BigIntegerField(
+        verbose_name='Id в базе')
+
+    class Meta:
+        verbose_name = 'Соответствие id при импорте'
+        verbose_name_plural = 'Соответствия id при импорте'
+        constraints = [models.UniqueConstraint(
+            fields=['source', 'table', 'old_id'],
+            name='unique_import_id_map')]
+
+    def __str__(self):
+        return f'{self.source}/{self.table}: {self.old_id} -> {self.new_id}'
+
+
+class ImportProgress(models.Model):
+    """Сколько строк файла таблицы уже загружено при импорте."""
+
+    source = models.CharField(
+        max_length=200,
+        verbose_name='Источник импорта')
+    table = models.CharField(
+        max_length=50,
+        verbose_name='Таблица')
+    line = models.PositiveBigIntegerField(
+        default=0,
+        verbose_name='Загружено строк')
+
+    class Meta:
+        verbose_name = 'Прогресс импорта'
+        verbose_name_plural = 'Прогресс импорта'
+        constraints = [models.UniqueConstraint(
+            fields=['source', 'table'],
+            name='unique_import_progress')]
+
+    def __str__(self):
+        return f'{self.source}/{self.table}: {self.line}'
+
+
+class StatsWatermark(models.Model):
+    """Последний id таблицы-источника, учтённый в дневной статистике."""
+
+    source = models.CharField(
+        max_length=50,
+        primary_key=True,
+        verbose_name='Таблица')
+    last_id = models.BigIntegerField(
+        default=0,
+        verbose_name='Последний учтённый id')
+    pending_id = models.BigIntegerField(
+        null=True,
+        blank=True,
+        verbose_name='Наибольший id на момент pending_at')
+    pending_at = models.DateTimeField(
+        null=True,
+        blank=True,
+        verbose_name='Когда запомнен pending_id')
+
+    class Meta:
+        verbose_name = 'Отметка статистики'
+        verbose_name_plural = 'Отметки статистики'
+
+    def __str__(self):
+        return f'{self.source}: {self.last_id}'
+
+
+class DailyStats(models.Model):
+    """Итоги дня по всему сайту."""
+
+    day = models.DateField(
+        primary_key=True,
+        verbose_name='День')
+    recipes = models.PositiveIntegerField(
+        default=0,
+        verbose_name='Новых рецептов')
+    ingredients = models.PositiveIntegerField(
+        default=0,
+        verbose_name='Ингредиентов в новых рецептах')
+    favorites = models.PositiveIntegerField(
+        default=0,
+        verbose_name='Добавлений в избранное')
+    carts = models.PositiveIntegerField(
+        default=0,
+        verbose_name='Добавлений в список покупок')
+    follows = models.PositiveIntegerField(
+        default=0,
+        verbose_name='Новых подписок')
+
+    class Meta:
+        verbose_name = 'Статистика за день'
+        verbose_name_plural = 'Статистика по дням'
+        ordering = ('day',)
+
+    def __str__(self):
+        return f'{self.day}'
+
+
+class DailyRecipeStats(models.Model):
+    """Добавления рецепта в избранное и список покупок за день."""
+
+    day = models.DateField(
+        verbose_name='День')
+    recipe = models.ForeignKey(
+        Recipe,
+        on_delete=models.CASCADE,
+        related_name='+',
+        verbose_name='Рецепт')
+    favorites = models.PositiveIntegerField(
+        default=0,
+        verbose_name='Добавлений в избранное')
+    carts = models.PositiveIntegerField(
+        default=0,
+        verbose_name='Добавлений в список покупок')
+
+    class Meta:
+        verbose_name = 'Статистика рецепта за день'
+        verbose_name_plural = 'Статистика рецептов по дням'
+        constraints = [models.UniqueConstraint(
+            fields=['day', 'recipe'],
+            name='unique_daily_recipe_stats')]
+
+    def __str__(self):
+        return f'{self.recipe} {self.day}'
+
+
+class DailyAuthorStats(models.Model):
+    """Новые рецепты автора и добавления его рецептов в избранное."""
+
+    day = models.DateField(
+        verbose_name='День')
+    author = models.ForeignKey(
+        User,
+        on_delete=models.CASCADE,
+        related_name='+',
+        verbose_name='Автор')
+    recipes = models.PositiveIntegerField(
+        default=0,
+        verbose_name='Новых рецептов')
+    favorites = models.PositiveIntegerField(
+        default=0,
+        verbose_name='Добавлений в избранное')
+
+    class Meta:
+        verbose_name = 'Статистика автора за день'
+        verbose_name_plural = 'Статистика авторов по дням'
+        constraints = [models.UniqueConstraint(
+            fields=['day', 'author'],
+            name='unique_daily_author_stats')]
+
+    def __str__(self):
+        return f'{self.author} {self.day}'
+
+
+class DailyIngredientStats(models.Model):
+    """Сколько новых рецептов дня используют ингредиент."""
+
+    day = models.DateField(
+        verbose_name='День')
+    ingredient = models.ForeignKey(
+        Ingredient,
+        on_delete=models.CASCADE,
+        related_name='+',
+        verbose_name='Ингредиент')
+    recipes = models.PositiveIntegerField(
+        default=0,
+        verbose_name='Рецептов')
+
+    class Meta:
+        verbose_name = 'Статистика ингредиента за день'
+        verbose_name_plural = 'Статистика ингредиентов по дням'
+        constraints = [models.UniqueConstraint(
+            fields=['day', 'ingredient'],
+            name='unique_daily_ingredient_stats')]
+
+    def __str__(self):
+        return f'{self.ingredient} {self.day}'
+
+
+class DailyUserActivity(models.Model):
+    """Действия пользователя за день; строка есть только у активных."""
+
+    day = models.DateField(
+        verbose_name='День')
+    user = models.ForeignKey(
+        User,
+        on_delete=models.CASCADE,
+        related_name='+',
+        verbose_name='Пользователь')
+    recipes = models.PositiveIntegerField(
+        default=0,
+        verbose_name='Новых рецептов')
+    favorites = models.PositiveIntegerField(
+        default=0,
+        verbose_name='Добавлений в избранное')
+    carts = models.PositiveIntegerField(
+        default=0,
+        verbose_name='Добавлений в список покупок')
+    follows = models.PositiveIntegerField(
+        default=0,
+        verbose_name='Новых подписок')
+
+    class Meta:
+        verbose_name = 'Активность пользователя за день'
+        verbose_name_plural = 'Активность пользователей по дням'
+        constraints = [models.UniqueConstraint(
+            fields=['day', 'user'],
+            name='unique_daily_user_activity')]
+
+    def __str__(self):
+        return f'{self.user} {self.day}'
+
+
+class OutboxEvent(models.Model):
+    """
+    Изменение рецептов и связей пользователей, записанное в той же
+    транзакции, что и само изменение. Читается командой consume_outbox.
+    """
+
+    topic = models.CharField(
+        max_length=20,
+        verbose_name='Что изменилось')
+    action = models.CharField(
+        max_length=20,
+        verbose_name='Действие')
+    object_id = models.BigIntegerField(
+        verbose_name='id объекта')
+    data = models.JSONField(
+        default=dict,
+        verbose_name='Подробности')
+    transaction_id = models.BigIntegerField(
+        default=0,
+        verbose_name='Номер транзакции')
+    created_at = models.DateTimeField(
+        auto_now_add=True,
+        verbose_name='Создано')
+
+    class Meta:
+        verbose_name = 'Событие изменения'
+        verbose_name_plural = 'События изменений'
+        indexes = [
+            models.Index(
+                fields=['transaction_id', 'id'],
+                name='outbox_event_order_idx'),
+            # Поиск событий старше OUTBOX_RETENTION при очистке журнала.
+            models.Index(
+                fields=['created_at'],
+                name='outbox_event_created_at_idx'),
+        ]
+
+    def __str__(self):
+        return f'{self.topic} {self.action} {self.object_id}'
+
+
+class OutboxCheckpoint(models.Model):
+    """Последнее событие, обработанное обработчиком consume_outbox."""
+
+    consumer = models.CharField(
+        max_length=50,
+        primary_key=True,
+        verbose_name='Обработчик')
+    transaction_id = models.BigIntegerField(
+        default=0,
+        verbose_name='Номер транзакции')
+    last_id = models.BigIntegerField(
+        default=0,
+        verbose_name='Последний обработанный id')
+    updated_at = models.DateTimeField(
+        auto_now=True,
+        verbose_name='Обновлено')
+
+    class Meta:
+        verbose_name = 'Отметка обработчика событий'
+        verbose_name_plural = 'Отметки обработчиков событий'
+
+    def __str__(self):
+        return f'{self.consumer}: {self.transaction_id}/{self.last_id}'
@@ -0,0 +1,145 @@
+"""
+Журнал изменений (transactional outbox).
+
+Изменения рецептов, подписок, избранного и списков покупок записываются
+в OutboxEvent в той же транзакции, что и сами изменения: событие
+появляется тогда и только тогда, когда изменение зафиксировано, в том
+числе для bulk_create и удалений через QuerySet, которые не вызывают
+сигналов. Команда consume_outbox читает журнал по порядку пачками и
+передаёт события обработчикам из OUTBOX_HANDLERS; у каждого обработчика
+своя отметка OutboxCheckpoint, которая сдвигается в одной транзакции с
+обработкой пачки. Если обработчик упал, пачка будет передана ему снова,
+поэтому обработчики должны быть идемпотентными.
+
+id событий выдаются при вставке, а фиксируются транзакции в другом
+порядке, поэтому в PostgreSQL вместе с событием хранится номер
+транзакции, а читаются только события транзакций старше самой старой
+незавершённой (txid_snapshot_xmin): этот набор уже не пополнится.
+Порядок чтения — по номеру транзакции, внутри неё — по id.
+"""
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import connection, models, transaction
+from django.db.models import Func, Q
+from django.utils import timezone
+from django.utils.module_loading import import_string
+
+from recipes.models import OutboxCheckpoint, OutboxEvent
+
+RECIPE = 'recipe'
+FOLLOW = 'follow'
+FAVORITE = 'favorite'
+CART = 'cart'
+USER = 'user'
+
+CREATED = 'created'
+UPDATED = 'updated'
+DELETED = 'deleted'
+ADDED = 'added'
+REMOVED = 'removed'
+
+
+class CurrentTransaction(Func):
+    """Номер текущей транзакции PostgreSQL; 0 в других СУБД."""
+
+    template = 'txid_current()'
+    output_field = models.BigIntegerField()
+
+    def as_sql(self, compiler, connection, **extra_context):
+        if connection.vendor != 'postgresql':
+            return '0', []
+        return super().as_sql(compiler, connection, **extra_context)
+
+
+def _event(topic, action, object_id, data):
+    return OutboxEvent(
+        topic=topic, action=action, object_id=object_id, data=data,
+        transaction_id=CurrentTransaction())
+
+
+def record(topic, action, object_id, **data):
+    """Записывает событие; вызывается внутри транзакции изменения."""
+    _event(topic, action, object_id, data).save()
+
+
+def record_many(topic, action, object_ids, **data):
+    """Записывает одинаковые события для нескольких объектов."""
+    OutboxEvent.objects.bulk_create(
+        _event(topic, action, object_id, data) for object_id in object_ids)
+
+
+def horizon():
+    """
+    Номер самой старой незавершённой транзакции: события с меньшими
+    номерами уже не появятся. None — ограничения нет (не PostgreSQL,
+    запись в журнал последовательна).
+    """
+    if connection.vendor != 'postgresql':
+        return None
+    with connection.cursor() as cursor:
+        cursor.execute('SELECT txid_snapshot_xmin(txid_current_snapshot())')
+        return cursor.fetchone()[0]
+
+
+def _after(transaction_id, last_id):
+    return Q(transaction_id__gt=transaction_id) | Q(
+        transaction_id=transaction_id, pk__gt=last_id)
+
+
+def handlers():
+    """Обработчики из OUTBOX_HANDLERS: {имя: функция(events)}."""
+    return {
+        name: import_string(path)
+        for name, path in settings.OUTBOX_HANDLERS.items()
+    }
+
+
+def consume(name, handler, batch_size=None):
+    """
+    Передаёт обработчику следующую пачку событий и сдвигает его отметку.
+    Возвращает число обработанных событий.
+    """
+    batch_size = batch_size or settings.OUTBOX_BATCH_SIZE
+    limit = horizon()
+    with transaction.atomic():
+        # Блокировка отметки не даёт двум процессам обрабатывать события
+        # одного обработчика одновременно.
+        checkpoint, _ = OutboxCheckpoint.objects.select_for_update(
+        ).get_or_create(consumer=name)
+        events = OutboxEvent.objects.filter(
+            _after(checkpoint.transaction_id, checkpoint.last_id))
+        if limit is not None:
+            events = events.filter(transaction_id__lt=limit)
+        events = list(events.order_by('transaction_id', 'pk')[:batch_size])
+        if not events:
+            return 0
+        handler(events)
+        checkpoint.transaction_id = events[-1].transaction_id
+        checkpoint.last_id = events[-1].pk
+        checkpoint.save()
+    return len(events)
+
+
+def prune(names, batch_size=None):
+    """
+    Удаляет события старше OUTBOX_RETENTION, которые уже обработаны
+    всеми обработчиками names. Возвращает число удалённых событий.
+    """
+    batch_size = batch_size or settings.OUTBOX_BATCH_SIZE
+    checkpoints = list(OutboxCheckpoint.objects.filter(consumer__in=names))
+    if not names or len(checkpoints) < len(names):
+        return 0
+    oldest = min(
+        checkpoints,
+        key=lambda checkpoint: (checkpoint.transaction_id, checkpoint.last_id))
+    events = OutboxEvent.objects.filter(
+        created_at__lt=timezone.now() - timedelta(
+            seconds=settings.OUTBOX_RETENTION),
+    ).exclude(_after(oldest.transaction_id, oldest.last_id))
+    deleted = 0
+    while True:
+        batch = list(events.values_list('pk', flat=True)[:batch_size])
+        if not batch:
+            return deleted
+        deleted += OutboxEvent.objects.filter(pk__in=batch).delete()[0]
@@ -0,0 +1,65 @@
+from django.db.models.signals import m2m_changed, post_delete, post_save
+from django.dispatch import Signal, receiver
+from django.utils import timezone
+
+from recipes import feed
+from recipes.models import Ingredient, IngredientInRecipe, Recipe, Tag
+from users.models import User
+
+# Изменились данные рецептов, видимые в API; recipes — id или запрос,
+# возвращающий id.
+recipes_changed = Signal()
+
+
+def touch(recipes):
+    """Обновляет updated_at рецептов, чтобы сбросить их ETag."""
+    Recipe.all_objects.filter(pk__in=recipes).update(
+        updated_at=timezone.now())
+    recipes_changed.send(sender=Recipe, recipes=recipes)
+
+
+@receiver(post_save, sender=Recipe)
+def fan_out_new_recipe(sender, instance, created, **kwargs):
+    if created:
+        feed.schedule_fan_out(instance)
+    recipes_changed.send(sender=Recipe, recipes=[instance.pk])
+
+
+@receiver(post_save, sender=IngredientInRecipe)
+@receiver(post_delete, sender=IngredientInRecipe)
+def touch_recipe_ingredients(sender, instance, **kwargs):
+    touch([instance.recipe_id])
+
+
+@receiver(m2m_changed, sender=Recipe.tags.through)
+@receiver(m2m_changed, sender=Recipe.ingredients.through)
+def touch_recipe_relations(sender, instance, action, reverse, pk_set,
+                           **kwargs):
+    if not action.startswith('post_'):
+        return
+    if not reverse:
+        touch([instance.pk])
+    elif pk_set:
+        touch(pk_set)
+
+
+@receiver(post_save, sender=Tag)
+def touch_tag_recipes(sender, instance, created, **kwargs):
+    if not created:
+        touch(Recipe.all_objects.filter(tags=instance).values('pk'))
+
+
+@receiver(post_save, sender=Ingredient)
+def touch_ingredient_recipes(sender, instance, created, **kwargs):
+    if not created:
+        touch(Recipe.all_objects.filter(
+            ingredients=instance).values('pk'))
+
+
+@receiver(post_save, sender=User)
+def touch_author_recipes(sender, instance, created, update_fields,
+                         **kwargs):
+    # Вход пользователя меняет только last_login — рецепты не затронуты.
+    if created or update_fields == frozenset({'last_login'}):
+        return
+    touch(Recipe.all_objects.filter(author=instance).values('pk'))
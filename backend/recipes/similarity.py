@@ -0,0 +1,215 @@
+"""
+Похожие рецепты по составу ингредиентов.
+
+Рецепт представляется разреженным вектором ингредиентов с весами IDF
+(редкие ингредиенты важнее соли и воды), сходство — косинус между такими
+векторами плюс бонус за общие теги. Полный пересчёт выполняет команда
+compute_similar_recipes, после редактирования рецепта соседи
+пересчитываются только для него и рецептов с общими ингредиентами.
+"""
+import numpy as np
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Count, Min
+from scipy import sparse
+
+from recipes.background import run_after_commit
+from recipes.models import IngredientInRecipe, Recipe, SimilarRecipe
+
+# Матрицы, общие для процессов пула (передаются через fork).
+_matrices = {}
+
+
+def _index(values):
+    """Уникальные идентификаторы и позиции значений в них."""
+    return np.unique(values, return_inverse=True)
+
+
+def _normalize(matrix):
+    """Нормирует строки матрицы по L2, чтобы произведение давало косинус."""
+    norms = np.sqrt(np.asarray(matrix.multiply(matrix).sum(axis=1))).ravel()
+    norms[norms == 0] = 1
+    return sparse.diags(1 / norms) @ matrix
+
+
+def _pairs(queryset, fields):
+    rows = list(queryset.values_list(*fields).iterator(chunk_size=10000))
+    if not rows:
+        return np.empty((0, 2), dtype=np.int64)
+    return np.array(rows, dtype=np.int64)
+
+
+def build_matrices(recipe_ids=None):
+    """
+    Строит нормированные матрицы рецепт×ингредиент (с весами IDF) и
+    рецепт×тег. Если recipe_ids задан, в матрицы попадают только эти
+    рецепты, но IDF считается по всей базе.
+    """
+    links = IngredientInRecipe.objects.all()
+    tag_links = Recipe.tags.through.objects.all()
+    if recipe_ids is not None:
+        links = links.filter(recipe_id__in=recipe_ids)
+        tag_links = tag_links.filter(recipe_id__in=recipe_ids)
+    pairs = _pairs(links, ('recipe_id', 'ingredient_id'))
+    recipes, rows = _index(pairs[:, 0])
+    ingredients, cols = _index(pairs[:, 1])
+
+    total = Recipe.objects.count()
+    frequency = dict(
+        IngredientInRecipe.objects.filter(
+            ingredient_id__in=ingredients.tolist())
+        .values_list('ingredient_id')
+        .annotate(Count('id'))
+    )
+    document_frequency = np.array(
+        [frequency.get(ingredient, 0) for ingredient in ingredients],
+        dtype=np.float64,
+    )
+    idf = np.log((1 + total) / (1 + document_frequency)) + 1
+    ingredient_matrix = sparse.csr_matrix(
+        (idf[cols], (rows, cols)),
+        shape=(len(recipes), len(ingredients)),
+    )
+
+    tag_pairs = _pairs(tag_links, ('recipe_id', 'tag_id'))
+    tag_pairs = tag_pairs[np.isin(tag_pairs[:, 0], recipes)]
+    tags, tag_cols = _index(tag_pairs[:, 1])
+    tag_matrix = sparse.csr_matrix(
+        (
+            np.ones(len(tag_pairs)),
+            (np.searchsorted(recipes, tag_pairs[:, 0]), tag_cols),
+        ),
+        shape=(len(recipes), len(tags)),
+    )
+    return (
+        recipes,
+        _normalize(ingredient_matrix).tocsr(),
+        _normalize(tag_matrix).tocsr(),
+    )
+
+
+def _scores(rows, row_tags, targets, target_tags):
+    """
+    Сходство рецептов rows со всеми рецептами targets: косинус по
+    ингредиентам плюс бонус за теги для пар, у которых есть общие
+    ингредиенты.
+    """
+    scores = (rows @ targets.T).tocsr()
+    scores.sort_indices()
+    tag_weight = settings.SIMILAR_RECIPES_TAG_WEIGHT
+    if tag_weight and scores.nnz:
+        row_index = np.repeat(
+            np.arange(scores.shape[0]), np.diff(scores.indptr))
+        tag_scores = np.asarray(
+            row_tags[row_index].multiply(target_tags[scores.indices])
+            .sum(axis=1)
+        ).ravel()
+        scores.data += tag_weight * tag_scores
+    return scores
+
+
+def _top_k(scores, offset, recipes, top_k):
+    """Отбирает top_k соседей для каждой строки матрицы сходства."""
+    result = []
+    for row in range(scores.shape[0]):
+        start, end = scores.indptr[row], scores.indptr[row + 1]
+        columns = scores.indices[start:end]
+        values = scores.data[start:end]
+        own = columns != offset + row
+        columns, values = columns[own], values[own]
+        if len(values) > top_k:
+            best = np.argpartition(-values, top_k)[:top_k]
+            columns, values = columns[best], values[best]
+        result.append((
+            int(recipes[offset + row]),
+            [
+                (int(recipes[column]), float(value))
+                for column, value in zip(columns, values)
+            ],
+        ))
+    return result
+
+
+def compute_chunk(bounds):
+    """Соседи для строк [start, end) общих матриц — работа процесса пула."""
+    start, end = bounds
+    recipes = _matrices['recipes']
+    ingredient_matrix = _matrices['ingredients']
+    tag_matrix = _matrices['tags']
+    scores = _scores(
+        ingredient_matrix[start:end], tag_matrix[start:end],
+        ingredient_matrix, tag_matrix,
+    )
+    return _top_k(scores, start, recipes, _matrices['top_k'])
+
+
+def save_neighbours(neighbours):
+    """Заменяет сохранённых соседей для переданных рецептов."""
+    with transaction.atomic():
+        SimilarRecipe.objects.filter(
+            recipe_id__in=[recipe_id for recipe_id, _ in neighbours]
+        ).delete()
+        SimilarRecipe.objects.bulk_create(
+            SimilarRecipe(recipe_id=recipe_id, similar_id=similar_id,
+                          score=score)
+            for recipe_id, similar in neighbours
+            for similar_id, score in similar
+        )
+
+
+def update_recipe(recipe_id):
+    """
+    Пересчитывает соседей одного рецепта и добавляет его в списки
+    рецептов с общими ингредиентами, если он попадает в их top-K.
+    """
+    top_k = settings.SIMILAR_RECIPES_TOP_K
+    candidates = set(
+        IngredientInRecipe.objects.filter(
+            ingredient__in=IngredientInRecipe.objects.filter(
+                recipe_id=recipe_id).values('ingredient')
+        ).values_list('recipe_id', flat=True)
+    )
+    candidates.add(recipe_id)
+    SimilarRecipe.objects.filter(similar_id=recipe_id).delete()
+    recipes, ingredient_matrix, tag_matrix = build_matrices(candidates)
+    position = np.searchsorted(recipes, recipe_id)
+    if position == len(recipes) or recipes[position] != recipe_id:
+        SimilarRecipe.objects.filter(recipe_id=recipe_id).delete()
+        return
+    scores = _scores(
+        ingredient_matrix[position:position + 1],
+        tag_matrix[position:position + 1],
+        ingredient_matrix, tag_matrix,
+    )
+    save_neighbours(_top_k(scores, position, recipes, top_k))
+
+    # Обратные связи: рецепт попадает в список соседа, если там меньше
+    # top-K записей или он лучше худшей из них. Лишние записи убирает
+    # полный пересчёт командой compute_similar_recipes.
+    others = {
+        int(recipes[column]): float(value)
+        for column, value in zip(scores.indices, scores.data)
+        if column != position
+    }
+    stats = {
+        row['recipe_id']: row
+        for row in SimilarRecipe.objects.filter(recipe_id__in=others)
+        .values('recipe_id')
+        .annotate(count=Count('id'), worst=Min('score'))
+    }
+    SimilarRecipe.objects.bulk_create(
+        (
+            SimilarRecipe(recipe_id=other_id, similar_id=recipe_id,
+                          score=score)
+            for other_id, score in others.items()
+            if other_id not in stats
+            or stats[other_id]['count'] < top_k
+            or score > stats[other_id]['worst']
+        ),
+        ignore_conflicts=True,
+    )
+
+
+def schedule_update(recipe):
+    """Пересчитывает соседей рецепта после коммита."""
+    run_after_commit(update_recipe, recipe.pk)
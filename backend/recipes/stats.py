@@ -0,0 +1,289 @@
+"""
+Дневная статистика для администраторов.
+
+Команда rollup_stats периодически переносит в дневные таблицы (DailyStats,
+DailyRecipeStats, DailyAuthorStats, DailyIngredientStats,
+DailyUserActivity) только строки источников с id больше отметки
+StatsWatermark, пачками по STATS_BATCH_SIZE: каждая пачка и сдвиг отметки
+сохраняются одной транзакцией. Эндпоинт статистики читает только дневные
+таблицы.
+
+id выдаются до коммита, поэтому строка долгой транзакции может появиться
+ниже уже учтённых и за отметкой потерялась бы. Команда запоминает
+наибольший закоммиченный id источника и учитывает строки до него только
+через STATS_SAFETY_WINDOW секунд, когда транзакции, получившие id раньше,
+уже завершились.
+
+Рецепты относятся к дню публикации, ингредиенты считаются по составу
+рецепта на момент учёта. У избранного, списка покупок и подписок нет
+даты создания, поэтому они относятся к дню запуска команды, а удаления
+не учитываются — статистика считает добавления.
+"""
+from collections import defaultdict
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Avg, Count, F, Max, Sum
+from django.utils import timezone
+
+from recipes.models import (
+    DailyAuthorStats,
+    DailyIngredientStats,
+    DailyRecipeStats,
+    DailyStats,
+    DailyUserActivity,
+    Favorited,
+    Ingredient,
+    IngredientInRecipe,
+    Recipe,
+    ShoppingCart,
+    StatsWatermark,
+)
+from users.models import Follow, User
+
+
+class Deltas:
+    """Приращения счётчиков дневных таблиц, накопленные по пачке."""
+
+    def __init__(self):
+        self.rows = defaultdict(lambda: defaultdict(int))
+
+    def add(self, model, key, **counters):
+        row = self.rows[model, key]
+        for field, value in counters.items():
+            row[field] += value
+
+    def save(self):
+        by_model = defaultdict(dict)
+        for (model, key), counters in self.rows.items():
+            by_model[model][key] = counters
+        for model, rows in by_model.items():
+            _apply(model, rows)
+
+
+def _key_fields(model):
+    if model is DailyStats:
+        return ('day',)
+    return tuple(model._meta.constraints[0].fields)
+
+
+def _apply(model, rows):
+    """Прибавляет счётчики к существующим строкам и создаёт недостающие."""
+    attnames = [
+        model._meta.get_field(field).attname for field in _key_fields(model)]
+    candidates = model.objects.filter(**{
+        f'{attname}__in': {key[index] for key in rows}
+        for index, attname in enumerate(attnames)
+    })
+    changed, counters_changed = [], set()
+    for obj in candidates:
+        key = tuple(getattr(obj, attname) for attname in attnames)
+        counters = rows.pop(key, None)
+        if counters is None:
+            continue
+        for field, value in counters.items():
+            setattr(obj, field, F(field) + value)
+        counters_changed.update(counters)
+        changed.append(obj)
+    if changed:
+        model.objects.bulk_update(changed, sorted(counters_changed))
+    model.objects.bulk_create([
+        model(**dict(zip(attnames, key)), **counters)
+        for key, counters in rows.items()
+    ])
+
+
+def _rollup_recipes(rows, deltas, today):
+    ids = [row['pk'] for row in rows]
+    ingredients = defaultdict(list)
+    for recipe_id, ingredient_id in IngredientInRecipe.objects.filter(
+            recipe_id__in=ids).values_list('recipe_id', 'ingredient_id'):
+        ingredients[recipe_id].append(ingredient_id)
+    for row in rows:
+        day = timezone.localdate(row['pub_date'])
+        used = set(ingredients[row['pk']])
+        deltas.add(DailyStats, (day,), recipes=1, ingredients=len(used))
+        deltas.add(DailyAuthorStats, (day, row['author_id']), recipes=1)
+        deltas.add(DailyUserActivity, (day, row['author_id']), recipes=1)
+        for ingredient_id in used:
+            deltas.add(DailyIngredientStats, (day, ingredient_id), recipes=1)
+
+
+def _rollup_favorites(rows, deltas, today):
+    for row in rows:
+        deltas.add(DailyStats, (today,), favorites=1)
+        deltas.add(DailyRecipeStats, (today, row['recipe_id']), favorites=1)
+        deltas.add(
+            DailyAuthorStats, (today, row['recipe__author_id']), favorites=1)
+        deltas.add(DailyUserActivity, (today, row['author_id']), favorites=1)
+
+
+def _rollup_carts(rows, deltas, today):
+    for row in rows:
+        deltas.add(DailyStats, (today,), carts=1)
+        deltas.add(DailyRecipeStats, (today, row['recipe_id']), carts=1)
+        deltas.add(DailyUserActivity, (today, row['author_id']), carts=1)
+
+
+def _rollup_follows(rows, deltas, today):
+    for row in rows:
+        deltas.add(DailyStats, (today,), follows=1)
+        deltas.add(DailyUserActivity, (today, row['user_id']), follows=1)
+
+
+# Источник: (запрос строк, поля строки, функция учёта пачки).
+SOURCES = {
+    'recipe': (
+        Recipe.all_objects, ('pk', 'author_id', 'pub_date'),
+        _rollup_recipes),
+    'favorited': (
+        Favorited.objects, ('pk', 'author_id', 'recipe_id',
+                            'recipe__author_id'),
+        _rollup_favorites),
+    'shoppingcart': (
+        ShoppingCart.objects, ('pk', 'author_id', 'recipe_id'),
+        _rollup_carts),
+    'follow': (
+        Follow.objects, ('pk', 'user_id'),
+        _rollup_follows),
+}
+
+
+def _lock(source):
+    """
+    Отметка источника. Блокируются все отметки: параллельные запуски
+    команды не должны одновременно менять одни и те же строки.
+    """
+    return {
+        watermark.source: watermark for watermark in
+        StatsWatermark.objects.select_for_update()
+    }[source]
+
+
+def _limit(source, manager, now):
+    """
+    Наибольший id, до которого строки источника можно учитывать, или None.
+    Наибольший закоммиченный id запоминается и становится границей через
+    STATS_SAFETY_WINDOW секунд; тогда же запоминается следующий.
+    """
+    with transaction.atomic():
+        watermark = _lock(source)
+        if watermark.pending_at is None:
+            watermark.pending_id = manager.aggregate(last=Max('pk'))['last']
+            watermark.pending_at = now
+        window = timedelta(seconds=settings.STATS_SAFETY_WINDOW)
+        if watermark.pending_at > now - window:
+            watermark.save(update_fields=['pending_id', 'pending_at'])
+            return None
+        limit = watermark.pending_id
+        watermark.pending_id = manager.aggregate(last=Max('pk'))['last']
+        watermark.pending_at = now
+        watermark.save(update_fields=['pending_id', 'pending_at'])
+    return limit
+
+
+def rollup(batch_size=None):
+    """
+    Учитывает новые строки всех источников. Возвращает словарь
+    источник -> число учтённых строк.
+    """
+    batch_size = batch_size or settings.STATS_BATCH_SIZE
+    now = timezone.now()
+    today = timezone.localdate(now)
+    for source in SOURCES:
+        StatsWatermark.objects.get_or_create(source=source)
+    processed = {}
+    for source, (manager, fields, handler) in SOURCES.items():
+        processed[source] = 0
+        limit = _limit(source, manager, now)
+        while limit is not None:
+            with transaction.atomic():
+                watermark = _lock(source)
+                rows = list(
+                    manager.filter(pk__gt=watermark.last_id, pk__lte=limit)
+                    .order_by('pk').values(*fields)[:batch_size])
+                if not rows:
+                    break
+                deltas = Deltas()
+                handler(rows, deltas, today)
+                deltas.save()
+                watermark.last_id = rows[-1]['pk']
+                watermark.save(update_fields=['last_id'])
+            processed[source] += len(rows)
+    return processed
+
+
+def _top(queryset, group, field, limit):
+    return list(
+        queryset.values(group).annotate(total=Sum(field))
+        .filter(total__gt=0).order_by('-total', group)[:limit])
+
+
+def report(date_from, date_to, limit=10):
+    """Статистика за дни с date_from по date_to по дневным таблицам."""
+    days = {'day__range': (date_from, date_to)}
+    daily = list(DailyStats.objects.filter(**days).values())
+    totals = {
+        field: sum(row[field] for row in daily)
+        for field in ('recipes', 'ingredients', 'favorites', 'carts')
+    }
+    activity = DailyUserActivity.objects.filter(**days)
+    active_by_day = dict(
+        activity.values_list('day').annotate(users=Count('pk')))
+    carts = activity.filter(carts__gt=0).aggregate(
+        users=Count('user', distinct=True), average=Avg('carts'),
+        largest=Max('carts'))
+
+    recipes = _top(
+        DailyRecipeStats.objects.filter(**days), 'recipe', 'favorites',
+        limit)
+    names = dict(Recipe.all_objects.filter(
+        pk__in=[row['recipe'] for row in recipes]).values_list('pk', 'name'))
+    authors = _top(
+        DailyAuthorStats.objects.filter(**days), 'author', 'favorites',
+        limit)
+    usernames = dict(User.all_objects.filter(
+        pk__in=[row['author'] for row in authors]).values_list(
+            'pk', 'username'))
+    ingredients = _top(
+        DailyIngredientStats.objects.filter(**days), 'ingredient', 'recipes',
+        limit)
+    ingredient_names = {
+        pk: (name, unit) for pk, name, unit in Ingredient.objects.filter(
+            pk__in=[row['ingredient'] for row in ingredients]).values_list(
+                'pk', 'name', 'measurement_unit')
+    }
+    return {
+        'date_from': date_from,
+        'date_to': date_to,
+        'recipes_per_day': [
+            {'day': row['day'], 'recipes': row['recipes']} for row in daily],
+        'average_ingredients_per_recipe': (
+            round(totals['ingredients'] / totals['recipes'], 2)
+            if totals['recipes'] else None),
+        'favorites': totals['favorites'],
+        'active_users_per_day': [
+            {'day': day, 'users': users}
+            for day, users in sorted(active_by_day.items())],
+        'active_users': activity.values('user').distinct().count(),
+        'carts': {
+            'added': totals['carts'],
+            'users': carts['users'],
+            'average_per_user_day': (
+                round(carts['average'], 2) if carts['average'] else None),
+            'largest_per_user_day': carts['largest'],
+        },
+        'top_recipes': [
+            {'id': row['recipe'], 'name': names.get(row['recipe']),
+             'favorites': row['total']} for row in recipes],
+        'top_authors': [
+            {'id': row['author'], 'username': usernames.get(row['author']),
+             'favorites': row['total']} for row in authors],
+        'top_ingredients': [
+            {'id': row['ingredient'],
+             'name': ingredient_names.get(row['ingredient'], (None,))[0],
+             'measurement_unit': ingredient_names.get(
+                 row['ingredient'], (None, None))[1],
+             'recipes': row['total']} for row in ingredients],
+    }
@@ -0,0 +1,102 @@
+"""
+Хранилище картинок с адресацией по содержимому.
+
+Файл сохраняется под именем <каталог>/<2 символа хеша>/<sha256>.<расширение>:
+одинаковые картинки хранятся один раз, повторная загрузка той же картинки
+не пишет на диск, а содержимое по URL никогда не меняется, поэтому nginx
+отдаёт /media/ с Cache-Control: immutable. Файл может использоваться
+несколькими рецептами — удаляется он только когда на него не ссылается
+ни одна строка (release и команда gc_media). Ссылка на только что
+загруженный или повторно использованный файл видна другим процессам
+лишь после коммита, поэтому при каждом сохранении у файла обновляется
+время изменения, а файлы моложе MEDIA_GC_GRACE_PERIOD не удаляются.
+"""
+import hashlib
+import os
+import posixpath
+import uuid
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.files.storage import FileSystemStorage, default_storage
+from django.utils import timezone
+
+from foodgram import metrics
+
+HASH_LENGTH = 64
+
+
+def content_name(name, content):
+    """Имя файла по SHA-256 содержимого с сохранением каталога и расширения."""
+    digest = hashlib.sha256()
+    if hasattr(content, 'seek'):
+        content.seek(0)
+    for chunk in content.chunks():
+        digest.update(chunk)
+    if hasattr(content, 'seek'):
+        content.seek(0)
+    directory, filename = posixpath.split(name)
+    ext = posixpath.splitext(filename)[1].lower()
+    hexdigest = digest.hexdigest()
+    return posixpath.join(directory, hexdigest[:2], hexdigest + ext)
+
+
+def is_content_name(name):
+    """Имя уже построено по хешу содержимого."""
+    stem = posixpath.splitext(posixpath.basename(name))[0]
+    parent = posixpath.basename(posixpath.dirname(name))
+    return (
+        len(stem) == HASH_LENGTH
+        and parent == stem[:2]
+        and all(char in '0123456789abcdef' for char in stem)
+    )
+
+
+class ContentAddressedStorage(FileSystemStorage):
+    """FileSystemStorage, который именует файлы по хешу содержимого."""
+
+    def get_available_name(self, name, max_length=None):
+        # Имя определяется содержимым в _save, суффиксы не нужны.
+        return name
+
+    def _save(self, name, content):
+        with metrics.timer('image_processing_seconds', stage='hash'):
+            name = content_name(name, content)
+        try:
+            # Файл, который сейчас переиспользуется, не должен удалиться до
+            # коммита новой ссылки на него.
+            os.utime(self.path(name))
+        except FileNotFoundError:
+            pass
+        else:
+            metrics.inc('cache_requests_total', cache='media', result='hit')
+            return name
+        metrics.inc('cache_requests_total', cache='media', result='miss')
+        # Пишем во временный файл и атомарно переименовываем: параллельная
+        # загрузка той же картинки запишет такой же файл.
+        with metrics.timer('image_processing_seconds', stage='store'):
+            temporary = super()._save(
+                f'{name}.{uuid.uuid4().hex}.tmp', content)
+            os.replace(self.path(temporary), self.path(name))
+        return name
+
+
+def release(model, field_name, names, storage=default_storage):
+    """
+    Удаляет файлы, на которые больше не ссылается ни одна строка model.
+    Вызывается после того, как ссылка на файл удалена или заменена.
+    Файлы моложе MEDIA_GC_GRACE_PERIOD остаются до gc_media: на них может
+    ссылаться ещё не закоммиченная загрузка.
+    """
+    manager = model._base_manager
+    deadline = timezone.now() - timedelta(
+        seconds=settings.MEDIA_GC_GRACE_PERIOD)
+    for name in set(names):
+        if not name or manager.filter(**{field_name: name}).exists():
+            continue
+        try:
+            if storage.get_modified_time(name) > deadline:
+                continue
+        except FileNotFoundError:
+            continue
+        storage.delete(name)
@@ -0,0 +1,186 @@
+"""
+Рекомендации авторов по графу подписок.
+
+Подписки хранятся разреженной матрицей F (пользователь×автор), избранное —
+матрицей пользователь×рецепт T с нормированными строками: T·Tᵀ даёт
+сходство вкусов пользователей по общим избранным рецептам. Оценка автора a
+для пользователя u складывается из путей «подписка подписки» u→f→a, где
+каждый путь весит 1 + сходство вкусов u и f, и подписок
+SUGGESTIONS_TASTE_NEIGHBOURS пользователей с самым похожим вкусом с весом
+SUGGESTIONS_TASTE_WEIGHT. Авторы, на которых u уже подписан, и сам u
+исключаются.
+
+Полный пересчёт выполняет команда compute_author_suggestions, после
+подписки или отписки рекомендации пересчитываются только для этого
+пользователя.
+"""
+import numpy as np
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Count
+from scipy import sparse
+
+from recipes.background import run_after_commit
+from recipes.models import AuthorSuggestion, Favorited
+from recipes.similarity import _normalize, _pairs
+from users.models import Follow
+
+# Матрицы, общие для процессов пула (передаются через fork).
+_matrices = {}
+
+
+def build_matrices(user_ids=None):
+    """
+    Строит матрицу подписок и нормированную матрицу избранного. Если
+    user_ids задан, строки есть только у этих пользователей.
+    """
+    follows = Follow.objects.filter(following__is_deleted=False)
+    favorites = Favorited.objects.all()
+    if user_ids is not None:
+        follows = follows.filter(user_id__in=user_ids)
+        favorites = favorites.filter(author_id__in=user_ids)
+    follow_pairs = _pairs(follows, ('user_id', 'following_id'))
+    favorite_pairs = _pairs(favorites, ('author_id', 'recipe_id'))
+    users = np.unique(np.concatenate(
+        [follow_pairs.ravel(), favorite_pairs[:, 0]]))
+    follow_matrix = sparse.csr_matrix(
+        (
+            np.ones(len(follow_pairs)),
+            (
+                np.searchsorted(users, follow_pairs[:, 0]),
+                np.searchsorted(users, follow_pairs[:, 1]),
+            ),
+        ),
+        shape=(len(users), len(users)),
+    )
+    recipes, columns = np.unique(favorite_pairs[:, 1], return_inverse=True)
+    favorite_matrix = sparse.csr_matrix(
+        (
+            np.ones(len(favorite_pairs)),
+            (np.searchsorted(users, favorite_pairs[:, 0]), columns),
+        ),
+        shape=(len(users), len(recipes)),
+    )
+    return users, follow_matrix, _normalize(favorite_matrix).tocsr()
+
+
+def _taste_neighbours(favorite_matrix, start, end):
+    """
+    Сходство вкусов строк [start, end) со всеми пользователями: только
+    SUGGESTIONS_TASTE_NEIGHBOURS ближайших, без самого пользователя.
+    """
+    taste = (favorite_matrix[start:end] @ favorite_matrix.T).tocsr()
+    limit = settings.SUGGESTIONS_TASTE_NEIGHBOURS
+    rows, columns, values = [], [], []
+    for row in range(taste.shape[0]):
+        begin, finish = taste.indptr[row], taste.indptr[row + 1]
+        row_columns = taste.indices[begin:finish]
+        row_values = taste.data[begin:finish]
+        other = row_columns != start + row
+        row_columns, row_values = row_columns[other], row_values[other]
+        if len(row_values) > limit:
+            best = np.argpartition(-row_values, limit)[:limit]
+            row_columns, row_values = row_columns[best], row_values[best]
+        rows.append(np.full(len(row_columns), row))
+        columns.append(row_columns)
+        values.append(row_values)
+    return sparse.csr_matrix(
+        (
+            np.concatenate(values) if values else [],
+            (
+                np.concatenate(rows) if rows else [],
+                np.concatenate(columns) if columns else [],
+            ),
+        ),
+        shape=taste.shape,
+    )
+
+
+def _scores(follow_matrix, favorite_matrix, start, end):
+    """Оценки всех авторов для пользователей [start, end)."""
+    taste = _taste_neighbours(favorite_matrix, start, end)
+    follows = follow_matrix[start:end]
+    weighted = follows + follows.multiply(taste)
+    return (
+        weighted @ follow_matrix
+        + settings.SUGGESTIONS_TASTE_WEIGHT * (taste @ follow_matrix)
+    ).tocsr()
+
+
+def _top_k(scores, follow_matrix, start, users, top_k):
+    """Лучшие top_k авторов для каждой строки без уже подписанных."""
+    result = []
+    for row in range(scores.shape[0]):
+        begin, finish = scores.indptr[row], scores.indptr[row + 1]
+        columns = scores.indices[begin:finish]
+        values = scores.data[begin:finish]
+        followed = follow_matrix.indices[
+            follow_matrix.indptr[start + row]:
+            follow_matrix.indptr[start + row + 1]]
+        keep = (columns != start + row) & ~np.isin(columns, followed)
+        columns, values = columns[keep], values[keep]
+        if len(values) > top_k:
+            best = np.argpartition(-values, top_k)[:top_k]
+            columns, values = columns[best], values[best]
+        result.append((
+            int(users[start + row]),
+            [
+                (int(users[column]), float(value))
+                for column, value in zip(columns, values)
+            ],
+        ))
+    return result
+
+
+def compute_chunk(bounds):
+    """Рекомендации для строк [start, end) общих матриц."""
+    start, end = bounds
+    follow_matrix = _matrices['follows']
+    scores = _scores(follow_matrix, _matrices['favorites'], start, end)
+    return _top_k(
+        scores, follow_matrix, start, _matrices['users'],
+        _matrices['top_k'])
+
+
+def save_suggestions(suggestions):
+    """Заменяет сохранённые рекомендации переданных пользователей."""
+    with transaction.atomic():
+        AuthorSuggestion.objects.filter(
+            user_id__in=[user_id for user_id, _ in suggestions]
+        ).delete()
+        AuthorSuggestion.objects.bulk_create(
+            AuthorSuggestion(user_id=user_id, author_id=author_id,
+                             score=score)
+            for user_id, authors in suggestions
+            for author_id, score in authors
+        )
+
+
+def update_user(user_id):
+    """
+    Пересчитывает рекомендации одного пользователя по подпискам его
+    авторов и пользователей с наибольшим числом общих избранных рецептов.
+    """
+    followed = Follow.objects.filter(user_id=user_id).values_list(
+        'following_id', flat=True)
+    similar = Favorited.objects.filter(
+        recipe__in=Favorited.objects.filter(
+            author_id=user_id).values('recipe'),
+    ).values('author_id').annotate(common=Count('pk')).order_by(
+        '-common').values_list('author_id', flat=True)[
+            :settings.SUGGESTIONS_TASTE_CANDIDATES]
+    users, follow_matrix, favorite_matrix = build_matrices(
+        {user_id, *followed, *similar})
+    position = np.searchsorted(users, user_id)
+    if position == len(users) or users[position] != user_id:
+        AuthorSuggestion.objects.filter(user_id=user_id).delete()
+        return
+    scores = _scores(follow_matrix, favorite_matrix, position, position + 1)
+    save_suggestions(_top_k(
+        scores, follow_matrix, position, users,
+        settings.SUGGESTIONS_TOP_K))
+
+
+def schedule_update(user_id):
+    """Пересчитывает рекомендации пользователя после коммита."""
+    run_after_commit(update_user, user_id)
@@ -0,0 +1,224 @@
+"""
+Потоковый экспорт и импорт данных в формате NDJSON.
+
+Каждая таблица выгружается в отдельный файл <таблица>.ndjson, по одному
+JSON-объекту на строку. При импорте идентификаторы переназначаются:
+соответствие старых и новых id и номер последней загруженной строки
+сохраняются в той же транзакции, что и сами данные, поэтому прерванный
+импорт можно продолжить с места остановки.
+"""
+import json
+from dataclasses import dataclass, field
+from itertools import islice
+
+from django.db import transaction
+from django.utils.dateparse import parse_datetime
+
+from recipes.counters import recount_favorites
+from recipes.models import (
+    Favorited,
+    ImportIdMap,
+    ImportProgress,
+    Ingredient,
+    IngredientInRecipe,
+    Recipe,
+    ShoppingCart,
+    Tag,
+)
+from users.models import Follow, User
+
+
+@dataclass
+class Table:
+    name: str
+    model: type
+    fields: tuple
+    # Поле внешнего ключа -> имя таблицы, на которую оно ссылается.
+    refs: dict = field(default_factory=dict)
+    # Поля, по которым запись сопоставляется с уже существующей.
+    natural_key: tuple = ()
+    # Нужно ли сохранять соответствие id (на таблицу ссылаются другие).
+    mapped: bool = False
+    datetime_fields: tuple = ()
+
+
+TABLES = (
+    Table(
+        'users', User,
+        ('username', 'email', 'first_name', 'last_name', 'password',
+         'is_staff', 'is_superuser', 'is_active', 'date_joined',
+         'last_login'),
+        natural_key=('username',),
+        mapped=True,
+        datetime_fields=('date_joined', 'last_login'),
+    ),
+    Table(
+        'tags', Tag, ('name', 'color', 'slug'),
+        natural_key=('slug',), mapped=True,
+    ),
+    Table(
+        'ingredients', Ingredient, ('name', 'measurement_unit'),
+        natural_key=('name', 'measurement_unit'), mapped=True,
+    ),
+    Table(
+        'recipes', Recipe,
+        ('author_id', 'name', 'image', 'text', 'cooking_time', 'pub_date'),
+        refs={'author_id': 'users'},
+        mapped=True,
+        datetime_fields=('pub_date',),
+    ),
+    Table(
+        'recipe_tags', Recipe.tags.through, ('recipe_id', 'tag_id'),
+        refs={'recipe_id': 'recipes', 'tag_id': 'tags'},
+    ),
+    Table(
+        'ingredient_amounts', IngredientInRecipe,
+        ('recipe_id', 'ingredient_id', 'amount'),
+        refs={'recipe_id': 'recipes', 'ingredient_id': 'ingredients'},
+    ),
+    Table(
+        'follows', Follow, ('user_id', 'following_id'),
+        refs={'user_id': 'users', 'following_id': 'users'},
+    ),
+    Table(
+        'favorites', Favorited, ('author_id', 'recipe_id'),
+        refs={'author_id': 'users', 'recipe_id': 'recipes'},
+    ),
+    Table(
+        'carts', ShoppingCart, ('author_id', 'recipe_id'),
+        refs={'author_id': 'users', 'recipe_id': 'recipes'},
+    ),
+)
+
+# Уровни зависимостей: таблицы одного уровня импортируются параллельно.
+LEVELS = (
+    ('users', 'tags', 'ingredients'),
+    ('recipes',),
+    ('recipe_tags', 'ingredient_amounts', 'follows', 'favorites', 'carts'),
+)
+
+TABLES_BY_NAME = {table.name: table for table in TABLES}
+
+
+def _encode(value):
+    """Даты выгружаются с микросекундами, в отличие от DjangoJSONEncoder."""
+    return value.isoformat()
+
+
+def export_table(table, stream, chunk_size):
+    """Пишет таблицу в поток построчно. Возвращает число строк."""
+    count = 0
+    rows = table.model.objects.order_by('pk').values('pk', *table.fields)
+    for row in rows.iterator(chunk_size=chunk_size):
+        row['id'] = row.pop('pk')
+        stream.write(json.dumps(row, default=_encode))
+        stream.write('\n')
+        count += 1
+    return count
+
+
+def _id_map(source, table_name, old_ids):
+    return dict(
+        ImportIdMap.objects.filter(
+            source=source, table=table_name, old_id__in=old_ids,
+        ).values_list('old_id', 'new_id')
+    )
+
+
+def _existing(table, rows):
+    """Находит уже существующие записи по естественному ключу."""
+    if not table.natural_key:
+        return {}
+    key_field = table.natural_key[0]
+    candidates = table.model.objects.filter(
+        **{f'{key_field}__in': [row[key_field] for row in rows]}
+    ).values('pk', *table.natural_key)
+    return {
+        tuple(candidate[name] for name in table.natural_key): candidate['pk']
+        for candidate in candidates
+    }
+
+
+def import_batch(source, table, rows):
+    """
+    Загружает пачку строк одной таблицы. Возвращает число созданных
+    и пропущенных строк (ссылки на отсутствующие записи).
+    """
+    maps = {
+        ref_table: _id_map(
+            source, ref_table,
+            [row[ref_field] for row in rows
+             for ref_field, name in table.refs.items()
+             if name == ref_table],
+        )
+        for ref_table in set(table.refs.values())
+    }
+    resolved = []
+    for row in rows:
+        try:
+            for ref_field, ref_table in table.refs.items():
+                row[ref_field] = maps[ref_table][row[ref_field]]
+        except KeyError:
+            continue
+        for name in table.datetime_fields:
+            if row[name]:
+                row[name] = parse_datetime(row[name])
+        resolved.append(row)
+
+    existing = _existing(table, resolved)
+    new_ids = {}
+    objects = []
+    for row in resolved:
+        key = tuple(row[name] for name in table.natural_key)
+        if table.natural_key and key in existing:
+            new_ids[row['id']] = existing[key]
+            continue
+        objects.append((row, table.model(
+            **{name: row[name] for name in table.fields})))
+
+    created = table.model.objects.bulk_create(
+        [obj for _, obj in objects],
+        ignore_conflicts=not table.mapped,
+    )
+    if table.mapped and table.datetime_fields and created:
+        # auto_now_add перезаписывает даты при создании — возвращаем их.
+        for row, obj in objects:
+            for name in table.datetime_fields:
+                setattr(obj, name, row[name])
+        table.model.objects.bulk_update(created, table.datetime_fields)
+    if table.model is Favorited and objects:
+        # bulk_create не меняет денормализованный Recipe.favorites_count.
+        recount_favorites({row['recipe_id'] for row, _ in objects})
+    if table.mapped:
+        new_ids.update((row['id'], obj.pk) for row, obj in objects)
+        ImportIdMap.objects.bulk_create(
+            ImportIdMap(source=source, table=table.name,
+                        old_id=old_id, new_id=new_id)
+            for old_id, new_id in new_ids.items()
+        )
+    return len(objects), len(rows) - len(resolved)
+
+
+def import_table(source, table, path, batch_size):
+    """
+    Загружает файл таблицы пачками, продолжая с последней сохранённой
+    строки. Возвращает число созданных и пропущенных строк.
+    """
+    progress, _ = ImportProgress.objects.get_or_create(
+        source=source, table=table.name)
+    created = skipped = 0
+    with open(path, encoding='utf-8') as stream:
+        lines = islice(stream, progress.line, None)
+        while True:
+            batch = list(islice(lines, batch_size))
+            if not batch:
+                break
+            rows = [json.loads(line) for line in batch]
+            with transaction.atomic():
+                batch_created, batch_skipped = import_batch(
+                    source, table, rows)
+                progress.line += len(batch)
+                progress.save(update_fields=['line'])
+            created += batch_created
+            skipped += batch_skipped
+    return created, skipped
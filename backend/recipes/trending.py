@@ -0,0 +1,83 @@
+"""
+Популярные рецепты.
+
+Каждое добавление в избранное или список покупок увеличивает почасовой
+счётчик рецепта (RecipeActivity). Команда rollup_trending периодически
+сворачивает счётчики за последние 30 дней в рейтинги с экспоненциальным
+затуханием (RecipeTrending), по которым сортируется выдача.
+"""
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import IntegrityError, transaction
+from django.db.models import F
+from django.utils import timezone
+
+from recipes.models import RecipeActivity, RecipeTrending
+
+# Окна рейтинга: поле модели и длительность окна в часах.
+WINDOWS = {
+    'score_24h': 24,
+    'score_7d': 24 * 7,
+    'score_30d': 24 * 30,
+}
+
+
+def current_bucket(now=None):
+    return (now or timezone.now()).replace(minute=0, second=0, microsecond=0)
+
+
+def record_activity(recipe_id, field):
+    """Увеличивает счётчик field ('favorites' или 'carts') текущего часа."""
+    bucket = current_bucket()
+    activity = RecipeActivity.objects.filter(
+        recipe_id=recipe_id, bucket=bucket)
+    if activity.update(**{field: F(field) + 1}):
+        return
+    try:
+        with transaction.atomic():
+            RecipeActivity.objects.create(
+                recipe_id=recipe_id, bucket=bucket, **{field: 1})
+    except IntegrityError:
+        activity.update(**{field: F(field) + 1})
+
+
+def rollup(now=None):
+    """
+    Пересчитывает рейтинги по счётчикам за последние 30 дней и удаляет
+    более старые счётчики. Возвращает число рецептов с рейтингом.
+    """
+    now = now or timezone.now()
+    horizon = now - timedelta(hours=max(WINDOWS.values()))
+    RecipeActivity.objects.filter(bucket__lt=horizon).delete()
+
+    scores = {}
+    activity = RecipeActivity.objects.filter(bucket__gte=horizon).values_list(
+        'recipe_id', 'bucket', 'favorites', 'carts')
+    for recipe_id, bucket, favorites, carts in activity.iterator(
+            chunk_size=10000):
+        age = (now - bucket).total_seconds() / 3600
+        weight = (
+            favorites * settings.TRENDING_FAVORITE_WEIGHT
+            + carts * settings.TRENDING_CART_WEIGHT
+        )
+        recipe_scores = scores.setdefault(
+            recipe_id, dict.fromkeys(WINDOWS, 0))
+        for field, hours in WINDOWS.items():
+            if age <= hours:
+                half_life = hours * settings.TRENDING_HALF_LIFE
+                recipe_scores[field] += weight * 0.5 ** (age / half_life)
+
+    with transaction.atomic():
+        RecipeTrending.objects.filter(recipe__activity__isnull=True).delete()
+        RecipeTrending.objects.bulk_create(
+            (
+                RecipeTrending(recipe_id=recipe_id, **recipe_scores)
+                for recipe_id, recipe_scores in scores.items()
+            ),
+            batch_size=1000,
+            update_conflicts=True,
+            unique_fields=['recipe'],
+            update_fields=list(WINDOWS),
+        )
+    return len(scores)
@@ -0,0 +1,44 @@
+"""Допуск запросов при перегрузке воркера (foodgram.admission)."""
+from django.test import RequestFactory, SimpleTestCase, override_settings
+
+from foodgram.admission import Admission, classify
+
+
+@override_settings(
+    ADMISSION_CONCURRENCY=4, ADMISSION_RESERVED=1, ADMISSION_HEAVY_LIMIT=1,
+    ADMISSION_LATENCY_TARGETS={
+        'critical': 0.5, 'cheap': 0.25, 'normal': 1.0, 'heavy': 5.0},
+    ADMISSION_LATENCY_WINDOW=10)
+class AdmissionTests(SimpleTestCase):
+    def setUp(self):
+        self.admission = Admission()
+
+    def slow(self, times):
+        """Время ответа normal в times раз выше цели."""
+        self.admission.latency['normal'] = (1.0 * times, 0.0)
+
+    def admit(self, klass):
+        return self.admission.admit(klass, 0.0, 0.0)
+
+    def test_ingredient_search_is_cheap(self):
+        request = RequestFactory().get('/api/ingredients/', {'name': 'са'})
+        self.assertEqual(classify(request), 'cheap')
+
+    def test_healthy_worker_admits_everything(self):
+        for klass in ('heavy', 'heavy', 'normal', 'normal'):
+            self.assertIsNone(self.admit(klass))
+
+    def test_pressure_limits_heavy_and_keeps_reserve(self):
+        self.slow(1.5)
+        self.assertIsNone(self.admit('heavy'))
+        self.assertEqual(self.admit('heavy'), 'concurrency')
+        self.assertIsNone(self.admit('normal'))
+        self.assertIsNone(self.admit('normal'))
+        self.assertEqual(self.admit('normal'), 'concurrency')
+        self.assertIsNone(self.admit('cheap'))
+
+    def test_double_target_rejects_normal_and_heavy(self):
+        self.slow(3)
+        self.assertEqual(self.admit('normal'), 'latency')
+        self.assertEqual(self.admit('heavy'), 'latency')
+        self.assertIsNone(self.admit('critical'))
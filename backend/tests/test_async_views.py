@@ -0,0 +1,69 @@
+"""Асинхронные представления чтения рецептов (api.async_views)."""
+import json
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.core.cache import cache
+from django.test import AsyncRequestFactory, TestCase, override_settings
+from rest_framework.test import APIClient
+
+from api import async_views, response_cache
+from recipes.models import Recipe
+from users.models import User
+
+WITHOUT_THROTTLING = {
+    **settings.REST_FRAMEWORK, 'DEFAULT_THROTTLE_CLASSES': []}
+
+
+@override_settings(REST_FRAMEWORK=WITHOUT_THROTTLING)
+class RecipeViewsCacheTests(TestCase):
+    def setUp(self):
+        self.addCleanup(cache.clear)
+        author = User.objects.create_user(
+            email='cook@example.com', username='cook', first_name='cook',
+            last_name='cook', password='password')
+        self.recipe = Recipe.objects.create(
+            author=author, name='Борщ', text='Сварить.', cooking_time=60,
+            image='recipes/recipe.png')
+        self.factory = AsyncRequestFactory()
+
+    async def get(self, view, path, **kwargs):
+        response = await view(self.factory.get(path), **kwargs)
+        return response.status_code, json.loads(response.content)
+
+    async def test_responses_cached_like_sync_views(self):
+        path = '/api/recipes/?limit=6'
+        for fast in (True, False):
+            with self.subTest(fast=fast), self.settings(
+                    FAST_SERIALIZERS=fast):
+                await sync_to_async(cache.clear)()
+                status, data = await self.get(async_views.recipe_list, path)
+                self.assertEqual(status, 200)
+                key = response_cache._cache_key(self.factory.get(path))
+                entry = await sync_to_async(cache.get)(key)
+                self.assertIsNotNone(entry)
+                await sync_to_async(cache.clear)()
+                expected = await sync_to_async(
+                    lambda: APIClient().get(path).data)()
+                self.assertEqual(data, json.loads(json.dumps(expected)))
+
+    async def test_stale_served_while_rebuilt_elsewhere(self):
+        path = f'/api/recipes/{self.recipe.pk}/'
+        _, data = await self.get(
+            async_views.recipe_detail, path, pk=self.recipe.pk)
+        self.assertEqual(data['name'], 'Борщ')
+        self.recipe.name = 'Щи'
+        await sync_to_async(self.recipe.save)()
+        key = response_cache._cache_key(self.factory.get(path))
+        await sync_to_async(cache.add)(f'{key}:lock', 'other')
+        _, data = await self.get(
+            async_views.recipe_detail, path, pk=self.recipe.pk)
+        self.assertEqual(data['name'], 'Борщ')
+
+    async def test_not_found(self):
+        status, _ = await self.get(
+            async_views.recipe_list, '/api/recipes/?page=5')
+        self.assertEqual(status, 404)
+        status, _ = await self.get(
+            async_views.recipe_detail, '/api/recipes/0/', pk=0)
+        self.assertEqual(status, 404)
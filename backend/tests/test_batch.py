@@ -0,0 +1,22 @@
+"""Разбор ?ids= для чтения нескольких рецептов (api.batch)."""
+from django.test import SimpleTestCase
+
+from api.batch import MAX_ID, parse_ids
+
+
+class ParseIdsTests(SimpleTestCase):
+    def test_valid(self):
+        self.assertEqual(parse_ids('3, 1,,2'), ([3, 1, 2], None))
+        self.assertEqual(parse_ids(str(MAX_ID)), ([MAX_ID], None))
+
+    def test_unicode_digits(self):
+        for value in ('1,²', '٣', '１'):
+            ids, error = parse_ids(value)
+            self.assertIsNone(ids)
+            self.assertIsNotNone(error)
+
+    def test_out_of_range(self):
+        for value in (str(MAX_ID + 1), '9' * 5000):
+            ids, error = parse_ids(value)
+            self.assertIsNone(ids)
+            self.assertIsNotNone(error)
@@ -0,0 +1,21 @@
+"""Проверка списков админки (команда bench_admin)."""
+from io import StringIO
+
+from django.core.management import call_command
+from django.test import TestCase, override_settings
+
+from users.models import User
+
+
+class BenchAdminTests(TestCase):
+    def setUp(self):
+        User.objects.create_superuser(
+            email='root@example.com', username='root', first_name='root',
+            last_name='root', password='password')
+
+    @override_settings(ALLOWED_HOSTS=['.example.com'])
+    def test_real_allowed_hosts(self):
+        out = StringIO()
+        call_command('bench_admin', max_ms=60000, repeat=1, stdout=out)
+        self.assertNotIn(': 400', out.getvalue())
+        self.assertIn('/admin/recipes/recipe/: 200', out.getvalue())
@@ -0,0 +1,27 @@
+"""Ключи закрепления клиентов за основной базой (foodgram.db_router)."""
+from django.test import RequestFactory, SimpleTestCase
+
+from foodgram.db_router import client_keys, pin_keys
+
+
+class ClientKeysTests(SimpleTestCase):
+    def request(self, forwarded, **headers):
+        return RequestFactory().post(
+            '/api/recipes/', REMOTE_ADDR='172.18.0.5',
+            HTTP_X_FORWARDED_FOR=forwarded, headers=headers)
+
+    def test_address_from_forwarded_for(self):
+        self.assertEqual(
+            client_keys(self.request('203.0.113.7')), ['ip:203.0.113.7'])
+        self.assertEqual(
+            client_keys(self.request('198.51.100.1, 203.0.113.8')),
+            ['ip:203.0.113.8'])
+
+    def test_authenticated_write_pins_token_only(self):
+        keys = client_keys(
+            self.request('203.0.113.7', Authorization='Token abc'))
+        self.assertEqual(pin_keys(keys), ['auth:Token abc'])
+
+    def test_anonymous_write_pins_address(self):
+        keys = client_keys(self.request('203.0.113.7'))
+        self.assertEqual(pin_keys(keys), ['ip:203.0.113.7'])
@@ -0,0 +1,43 @@
+"""Окончательное удаление пользователей пачками (recipes.deletion)."""
+from django.test import TestCase
+
+from recipes import deletion
+from recipes.counters import change_favorites
+from recipes.models import Favorited, Recipe
+from users.models import User
+
+
+def create_user(username):
+    return User.objects.create_user(
+        email=f'{username}@example.com', username=username,
+        first_name=username, last_name=username, password='password')
+
+
+class PurgeUserTests(TestCase):
+    def test_recounts_favorites_in_batches(self):
+        user = create_user('cook')
+        fan = create_user('fan')
+        author = create_user('author')
+        recipes = [
+            Recipe.objects.create(
+                author=author, name=f'Рецепт {number}', text='Сварить.',
+                cooking_time=10, image=f'recipes/{number}.png')
+            for number in range(5)
+        ]
+        for recipe in recipes:
+            for who in (user, fan):
+                Favorited.objects.create(author=who, recipe=recipe)
+                change_favorites(recipe.pk, 1)
+        own = Recipe.objects.create(
+            author=user, name='Свой', text='Сварить.', cooking_time=10,
+            image='recipes/own.png')
+
+        deletion.purge_user(user.pk, batch_size=2)
+
+        self.assertFalse(User.all_objects.filter(pk=user.pk).exists())
+        self.assertFalse(Recipe.all_objects.filter(pk=own.pk).exists())
+        self.assertFalse(Favorited.objects.filter(author=user).exists())
+        self.assertEqual(
+            set(Recipe.objects.filter(author=author).values_list(
+                'favorites_count', flat=True)),
+            {1})
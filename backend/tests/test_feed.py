@@ -0,0 +1,114 @@
+"""Лента подписок (recipes.feed, /api/users/feed/)."""
+from datetime import timedelta
+
+from django.conf import settings
+from django.test import TestCase, override_settings
+from django.utils import timezone
+from rest_framework.test import APIClient
+
+from recipes import feed
+from recipes.models import CelebrityAuthor, FeedEntry, Recipe
+from users.models import Follow, User
+
+WITHOUT_THROTTLING = {
+    **settings.REST_FRAMEWORK, 'DEFAULT_THROTTLE_CLASSES': []}
+
+
+def create_user(username):
+    return User.objects.create_user(
+        email=f'{username}@example.com', username=username,
+        first_name=username, last_name=username, password='password')
+
+
+@override_settings(REST_FRAMEWORK=WITHOUT_THROTTLING)
+class FeedTests(TestCase):
+    def setUp(self):
+        self.reader = create_user('reader')
+        self.author = create_user('author')
+        self.celebrity = create_user('celebrity')
+        self.star = create_user('star')
+        self.now = timezone.now()
+        # У обычного и популярного автора есть рецепты с одинаковой датой:
+        # порядок между ними задаёт id.
+        self.recipes = [
+            self.create_recipe(author, minutes)
+            for author, minutes in (
+                (self.author, 1), (self.celebrity, 2), (self.author, 3),
+                (self.celebrity, 3), (self.author, 5), (self.celebrity, 8),
+                (self.author, 13), (self.star, 4), (self.star, 21),
+            )
+        ]
+        Follow.objects.create(user=self.reader, following=self.author)
+        Follow.objects.create(user=self.reader, following=self.celebrity)
+        Follow.objects.create(user=self.reader, following=self.star)
+        feed.backfill(self.reader.pk, self.author.pk)
+        CelebrityAuthor.objects.create(author=self.celebrity)
+        CelebrityAuthor.objects.create(author=self.star)
+        self.client = APIClient()
+        self.client.force_authenticate(self.reader)
+
+    def create_recipe(self, author, minutes_ago):
+        recipe = Recipe.objects.create(
+            author=author, name='Рецепт', text='Сварить.', cooking_time=10,
+            image='recipes/recipe.png')
+        Recipe.all_objects.filter(pk=recipe.pk).update(
+            pub_date=self.now - timedelta(minutes=minutes_ago))
+        return Recipe.objects.get(pk=recipe.pk)
+
+    def expected(self):
+        return [
+            recipe.pk for recipe in sorted(
+                Recipe.objects.filter(pk__in=[r.pk for r in self.recipes]),
+                key=lambda recipe: (recipe.pub_date, recipe.pk),
+                reverse=True)
+        ]
+
+    def walk(self, url):
+        """id рецептов по страницам вперёд и назад."""
+        forward, backward = [], []
+        while url:
+            response = self.client.get(url)
+            self.assertEqual(response.status_code, 200)
+            forward.append([item['id'] for item in response.data['results']])
+            url, previous = response.data['next'], response.data['previous']
+        while previous:
+            response = self.client.get(previous)
+            backward.append([item['id'] for item in response.data['results']])
+            previous = response.data['previous']
+        return forward, backward
+
+    def test_pages_merge_timeline_and_celebrities(self):
+        for fast in (True, False):
+            with self.subTest(fast=fast), self.settings(
+                    FAST_SERIALIZERS=fast):
+                forward, backward = self.walk('/api/users/feed/?limit=2')
+                self.assertEqual(sum(forward, []), self.expected())
+                self.assertTrue(all(len(page) == 2 for page in forward[:-1]))
+                self.assertEqual(backward, forward[-2::-1])
+
+    def test_deleted_recipes_skipped(self):
+        deleted = self.recipes[-2:]
+        Recipe.all_objects.filter(
+            pk__in=[recipe.pk for recipe in deleted]).update(is_deleted=True)
+        forward, _ = self.walk('/api/users/feed/?limit=2')
+        self.assertEqual(sum(forward, []), self.expected())
+        self.assertTrue(all(len(page) == 2 for page in forward[:-1]))
+
+    def test_invalid_cursor(self):
+        response = self.client.get('/api/users/feed/?cursor=cD1hYmM=')
+        self.assertEqual(response.status_code, 404)
+
+    def test_demoted_author_history_backfilled(self):
+        new = self.create_recipe(self.celebrity, 0)
+        feed.fan_out(new.pk)
+        self.assertFalse(
+            CelebrityAuthor.objects.filter(author=self.celebrity).exists())
+        self.assertEqual(
+            set(FeedEntry.objects.filter(
+                user=self.reader, author=self.celebrity,
+            ).values_list('recipe_id', flat=True)),
+            set(Recipe.objects.filter(
+                author=self.celebrity).values_list('pk', flat=True)))
+        self.recipes.append(new)
+        forward, _ = self.walk('/api/users/feed/?limit=3')
+        self.assertEqual(sum(forward, []), self.expected())
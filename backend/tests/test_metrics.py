@@ -0,0 +1,51 @@
+"""Файлы метрик воркеров (foodgram.metrics)."""
+import os
+import shutil
+import tempfile
+
+from django.test import SimpleTestCase, override_settings
+
+from foodgram import metrics
+
+KEY = 'http_requests_total\t\tview="recipes"\t'
+
+
+class MergeWorkerTests(SimpleTestCase):
+    def setUp(self):
+        directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, directory)
+        settings = override_settings(METRICS_DIR=directory)
+        settings.enable()
+        self.addCleanup(settings.disable)
+
+    def write(self, name, values):
+        store = metrics.MmapedValues(metrics._path(name))
+        for key, value in values.items():
+            store.add(key, value)
+        store.close()
+
+    def test_dead_workers_merged(self):
+        self.write(101, {KEY: 2})
+        self.write(102, {KEY: 3})
+        self.write(103, {KEY: 5})
+        metrics.merge_worker(101)
+        metrics.merge_worker(102)
+        metrics.merge_worker(102)
+
+        self.assertEqual(
+            sorted(os.listdir(os.path.dirname(metrics._path(0)))),
+            ['metrics-103.db', 'metrics-aggregate.db'])
+        self.assertEqual(metrics.collect(), {KEY: 10})
+
+    def test_worker_not_counted_twice_during_merge(self):
+        # Общий файл уже содержит значения воркера, файл воркера ещё
+        # не удалён.
+        self.write(101, {KEY: 2})
+        self.write(metrics.AGGREGATE, {KEY: 2, f'{metrics.MERGED}101': 0})
+        self.assertEqual(metrics.collect(), {KEY: 2})
+
+    def test_reused_pid_counted(self):
+        self.write(101, {KEY: 2})
+        metrics.merge_worker(101)
+        self.write(101, {KEY: 1})
+        self.assertEqual(metrics.collect(), {KEY: 3})
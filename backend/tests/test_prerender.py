@@ -0,0 +1,89 @@
+"""Статические копии ответов API (api.prerender)."""
+import json
+import os
+import shutil
+import tempfile
+from io import StringIO
+
+from django.conf import settings
+from django.core.cache import cache
+from django.core.management import call_command
+from django.test import RequestFactory, TestCase, override_settings
+from rest_framework.test import APIClient
+
+from api import prerender, response_cache
+from recipes.models import Recipe
+from users.models import User
+
+WITHOUT_THROTTLING = {
+    **settings.REST_FRAMEWORK, 'DEFAULT_THROTTLE_CLASSES': []}
+
+
+@override_settings(REST_FRAMEWORK=WITHOUT_THROTTLING)
+class RenderTests(TestCase):
+    def setUp(self):
+        self.root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.root)
+        self.addCleanup(cache.clear)
+        author = User.objects.create_user(
+            email='cook@example.com', username='cook', first_name='cook',
+            last_name='cook', password='password')
+        self.recipe = Recipe.objects.create(
+            author=author, name='Борщ', text='Сварить.', cooking_time=60,
+            image='recipes/recipe.png')
+
+    def hold_build_lock(self, path):
+        """Ответ для path строит другой воркер: остальным отдаётся stale."""
+        key = response_cache._cache_key(RequestFactory().get(path))
+        cache.add(f'{key}:lock', 'other')
+
+    def test_fresh_body_written_over_cached_entry(self):
+        detail = prerender.detail_path(self.recipe.pk)
+        listing = prerender.list_paths()[0]
+        for path in (detail, listing):
+            self.assertEqual(APIClient().get(path).status_code, 200)
+        self.recipe.name = 'Щи'
+        self.recipe.save()
+        for path in (detail, listing):
+            self.hold_build_lock(path)
+            self.assertTrue(prerender.build(path, self.root))
+
+        with open(prerender.file_path(detail, self.root)) as file:
+            self.assertEqual(json.load(file)['name'], 'Щи')
+        with open(prerender.file_path(listing, self.root)) as file:
+            self.assertEqual(json.load(file)['results'][0]['name'], 'Щи')
+        # Свежий ответ попал и в кеш.
+        self.assertEqual(APIClient().get(detail).data['name'], 'Щи')
+
+
+class CoverageTests(TestCase):
+    LINES = (
+        # Анонимный запрос к пути с копией.
+        '1.2.3.4 - - [19/Oct/2026:10:00:00 +0000] "GET /api/recipes/1/ '
+        'HTTP/1.1" 200 300 "-" "Mozilla" 0.010 -',
+        # Тот же путь авторизованным: копия ему не отдаётся.
+        '1.2.3.5 - - [19/Oct/2026:10:00:01 +0000] "GET /api/recipes/1/ '
+        'HTTP/1.1" 200 300 "-" "Mozilla" 0.020 auth',
+        # Анонимный запрос без копии.
+        '1.2.3.4 - - [19/Oct/2026:10:00:02 +0000] "GET /api/recipes/2/ '
+        'HTTP/1.1" 200 100 "-" "Mozilla" 0.010 -',
+        '1.2.3.4 - - [19/Oct/2026:10:00:03 +0000] "POST /api/recipes/ '
+        'HTTP/1.1" 201 100 "-" "Mozilla" 0.030 auth',
+    )
+
+    def setUp(self):
+        self.root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.root)
+        prerender.write('/api/recipes/1/', b'{}', self.root)
+        self.log = os.path.join(self.root, 'access.log')
+        with open(self.log, 'w') as log:
+            log.write('\n'.join(self.LINES) + '\n')
+
+    def test_authorized_requests_excluded(self):
+        out = StringIO()
+        with self.settings(PRERENDER_ROOT=self.root):
+            call_command('prerender_coverage', self.log, stdout=out)
+        self.assertIn(
+            'Анонимных GET-запросов к API: 2 (авторизованных пропущено: 1), '
+            'покрыто копиями: 1 (50.0%), трафика: 75.0%', out.getvalue())
+        self.assertNotIn('признака авторизации', out.getvalue())
@@ -0,0 +1,43 @@
+"""Кеш ответов чтения рецептов (api.response_cache)."""
+from django.core.cache import cache
+from django.test import SimpleTestCase, override_settings
+
+from api import response_cache
+
+
+@override_settings(
+    CACHES={'default': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache'}},
+    RESPONSE_CACHE_LOCK_TIMEOUT=0.2, RESPONSE_CACHE_POLL_INTERVAL=0.05)
+class BuildLockTests(SimpleTestCase):
+    key = 'response:test'
+    lock = 'response:test:lock'
+
+    def tearDown(self):
+        cache.clear()
+
+    def build(self, compute=lambda: 'data', wait=True):
+        return response_cache._build(self.key, 'etag', None, compute, wait)
+
+    def test_own_lock_released(self):
+        self.assertEqual(self.build(), ('etag', None, 'data'))
+        self.assertIsNone(cache.get(self.lock))
+
+    def test_foreign_lock_kept_without_wait(self):
+        cache.set(self.lock, 'other')
+        self.assertIsNone(self.build(wait=False))
+        self.assertEqual(cache.get(self.lock), 'other')
+
+    def test_foreign_lock_kept_after_wait_timeout(self):
+        cache.set(self.lock, 'other')
+        self.assertEqual(self.build(), ('etag', None, 'data'))
+        self.assertEqual(cache.get(self.lock), 'other')
+
+    def test_lock_taken_over_after_expiry_kept(self):
+        def compute():
+            # Своя блокировка истекла, её взял другой воркер.
+            cache.set(self.lock, 'other')
+            return 'data'
+
+        self.build(compute)
+        self.assertEqual(cache.get(self.lock), 'other')
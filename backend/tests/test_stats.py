@@ -0,0 +1,61 @@
+"""Перенос строк в дневную статистику (recipes.stats)."""
+from datetime import timedelta
+
+from django.test import TestCase, override_settings
+
+from recipes import stats
+from recipes.models import DailyStats, Recipe, StatsWatermark
+from users.models import User
+
+
+@override_settings(STATS_SAFETY_WINDOW=300)
+class RollupTests(TestCase):
+    def setUp(self):
+        self.author = User.objects.create_user(
+            email='cook@example.com', username='cook', first_name='cook',
+            last_name='cook', password='password')
+
+    def create_recipe(self):
+        return Recipe.objects.create(
+            author=self.author, name='Борщ', text='Сварить.',
+            cooking_time=60, image='recipes/recipe.png')
+
+    def age_pending(self, seconds=301):
+        watermark = StatsWatermark.objects.get(source='recipe')
+        watermark.pending_at -= timedelta(seconds=seconds)
+        watermark.save()
+
+    def recipes(self):
+        return sum(DailyStats.objects.values_list('recipes', flat=True))
+
+    def test_rows_counted_after_safety_window(self):
+        first = self.create_recipe()
+        self.assertEqual(stats.rollup()['recipe'], 0)
+        second = self.create_recipe()
+        self.assertEqual(stats.rollup()['recipe'], 0)
+
+        self.age_pending()
+        self.assertEqual(stats.rollup()['recipe'], 1)
+        self.assertEqual(
+            StatsWatermark.objects.get(source='recipe').last_id, first.pk)
+
+        self.age_pending()
+        self.assertEqual(stats.rollup()['recipe'], 1)
+        self.assertEqual(
+            StatsWatermark.objects.get(source='recipe').last_id, second.pk)
+        self.assertEqual(self.recipes(), 2)
+
+    def test_late_commit_below_seen_ids_counted(self):
+        # Строка с меньшим id закоммичена после того, как была запомнена
+        # граница с большим id.
+        early, late = self.create_recipe(), self.create_recipe()
+        Recipe.all_objects.filter(pk=early.pk).delete()
+        stats.rollup()
+        Recipe.all_objects.create(
+            pk=early.pk, author=self.author, name='Щи', text='Сварить.',
+            cooking_time=60, image='recipes/recipe.png')
+        self.age_pending()
+        self.assertEqual(stats.rollup()['recipe'], 2)
+        self.assertEqual(
+            StatsWatermark.objects.get(source='recipe').last_id, late.pk)
+        self.assertEqual(self.recipes(), 2)
@@ -0,0 +1,52 @@
+"""Хранилище картинок по хешу содержимого (recipes.storage)."""
+import os
+import shutil
+import tempfile
+import time
+
+from django.core.files.base import ContentFile
+from django.test import TestCase, override_settings
+
+from recipes.models import Recipe
+from recipes.storage import ContentAddressedStorage, release
+from users.models import User
+
+HOUR = 3600
+
+
+class ContentAddressedStorageTests(TestCase):
+    def setUp(self):
+        self.root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.root)
+        self.storage = ContentAddressedStorage(location=self.root)
+
+    def age(self, name, seconds):
+        stamp = time.time() - seconds
+        os.utime(self.storage.path(name), (stamp, stamp))
+
+    def test_reuse_refreshes_mtime(self):
+        name = self.storage.save('recipes/a.png', ContentFile(b'image'))
+        self.age(name, 2 * HOUR)
+        again = self.storage.save('recipes/b.png', ContentFile(b'image'))
+        self.assertEqual(again, name)
+        self.assertLess(
+            time.time() - os.stat(self.storage.path(name)).st_mtime, 60)
+
+    @override_settings(MEDIA_GC_GRACE_PERIOD=HOUR)
+    def test_release_keeps_young_and_referenced_files(self):
+        young = self.storage.save('recipes/a.png', ContentFile(b'young'))
+        old = self.storage.save('recipes/a.png', ContentFile(b'old'))
+        used = self.storage.save('recipes/a.png', ContentFile(b'used'))
+        self.age(old, 2 * HOUR)
+        self.age(used, 2 * HOUR)
+        Recipe.objects.create(
+            author=User.objects.create_user(
+                email='cook@example.com', username='cook',
+                first_name='cook', last_name='cook', password='password'),
+            name='Борщ', text='Сварить.', cooking_time=60, image=used)
+
+        release(Recipe, 'image', [young, old, used], self.storage)
+
+        self.assertTrue(self.storage.exists(young))
+        self.assertFalse(self.storage.exists(old))
+        self.assertTrue(self.storage.exists(used))
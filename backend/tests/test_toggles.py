@@ -0,0 +1,160 @@
+"""
+Добавление и удаление в избранное, список покупок и подписки
+(api.toggles): одновременные одинаковые запросы и удалённые объекты.
+"""
+import threading
+
+from django.conf import settings
+from django.db import connection
+from django.test import TestCase, TransactionTestCase, override_settings
+from rest_framework.test import APIClient
+
+from recipes import outbox
+from recipes.models import Favorited, OutboxEvent, Recipe, ShoppingCart
+from users.models import Follow, User
+
+THREADS = 8
+
+# Ограничение частоты и допуск при перегрузке отклонили бы часть
+# одновременных запросов раньше, чем они дойдут до БД. Фоновые задачи
+# выполняются сразу, чтобы их соединения закрывались вместе с потоком.
+WITHOUT_THROTTLING = {
+    **settings.REST_FRAMEWORK, 'DEFAULT_THROTTLE_CLASSES': []}
+
+
+def create_user(username):
+    return User.objects.create_user(
+        email=f'{username}@example.com', username=username,
+        first_name=username, last_name=username, password='password')
+
+
+def create_recipe(author):
+    return Recipe.objects.create(
+        author=author, name='Борщ', text='Сварить.', cooking_time=60,
+        image='recipes/borsch.png')
+
+
+@override_settings(
+    ADMISSION_ENABLED=False, BACKGROUND_TASKS_ASYNC=False,
+    REST_FRAMEWORK=WITHOUT_THROTTLING)
+class ConcurrentToggleTests(TransactionTestCase):
+    def setUp(self):
+        self.user = create_user('cook')
+        self.author = create_user('author')
+        self.recipe = create_recipe(self.author)
+
+    def concurrently(self, method, path):
+        """
+        Отправляет THREADS одинаковых запросов одновременно, каждый из
+        своего потока со своим соединением с БД. Возвращает коды ответов.
+        """
+        barrier = threading.Barrier(THREADS)
+        codes, errors = [], []
+
+        def send():
+            client = APIClient()
+            client.force_authenticate(self.user)
+            try:
+                barrier.wait()
+                codes.append(getattr(client, method)(path).status_code)
+            except Exception as error:
+                errors.append(error)
+            finally:
+                connection.close()
+
+        threads = [threading.Thread(target=send) for _ in range(THREADS)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        self.assertEqual(errors, [])
+        return sorted(codes)
+
+    def assertToggles(self, path, links, topic):
+        self.assertEqual(
+            self.concurrently('post', path), [201] + [400] * (THREADS - 1))
+        self.assertEqual(links.count(), 1)
+        self.assertEqual(
+            self.concurrently('delete', path),
+            [204] + [400] * (THREADS - 1))
+        self.assertEqual(links.count(), 0)
+        self.assertEqual(
+            OutboxEvent.objects.filter(topic=topic).count(), 2)
+
+    def test_favorite(self):
+        self.assertToggles(
+            f'/api/recipes/{self.recipe.pk}/favorite/',
+            Favorited.objects.filter(author=self.user), outbox.FAVORITE)
+
+    def test_favorite_keeps_counter(self):
+        path = f'/api/recipes/{self.recipe.pk}/favorite/'
+        self.concurrently('post', path)
+        self.recipe.refresh_from_db()
+        self.assertEqual(self.recipe.favorites_count, 1)
+        self.concurrently('delete', path)
+        self.recipe.refresh_from_db()
+        self.assertEqual(self.recipe.favorites_count, 0)
+
+    def test_shopping_cart(self):
+        self.assertToggles(
+            f'/api/recipes/{self.recipe.pk}/shopping_cart/',
+            ShoppingCart.objects.filter(author=self.user), outbox.CART)
+
+    def test_subscribe(self):
+        self.assertToggles(
+            f'/api/users/{self.author.pk}/subscribe/',
+            Follow.objects.filter(user=self.user), outbox.FOLLOW)
+
+
+@override_settings(REST_FRAMEWORK=WITHOUT_THROTTLING)
+class DeletedTargetTests(TestCase):
+    """Удалённые рецепты и пользователи недоступны, как и в чтении."""
+
+    def setUp(self):
+        self.user = create_user('cook')
+        self.author = create_user('author')
+        self.recipe = create_recipe(self.author)
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def assertNotAdded(self, path, links):
+        self.assertEqual(self.client.post(path).status_code, 404)
+        self.assertFalse(links.exists())
+        self.assertFalse(OutboxEvent.objects.exists())
+
+    def delete_recipe(self):
+        Recipe.all_objects.filter(pk=self.recipe.pk).update(is_deleted=True)
+
+    def delete_author(self):
+        User.all_objects.filter(pk=self.author.pk).update(is_deleted=True)
+
+    def test_favorite_deleted_recipe(self):
+        self.delete_recipe()
+        self.assertNotAdded(
+            f'/api/recipes/{self.recipe.pk}/favorite/',
+            Favorited.objects.all())
+        self.recipe.refresh_from_db()
+        self.assertEqual(self.recipe.favorites_count, 0)
+
+    def test_favorite_recipe_of_deleted_author(self):
+        self.delete_author()
+        self.assertNotAdded(
+            f'/api/recipes/{self.recipe.pk}/favorite/',
+            Favorited.objects.all())
+
+    def test_shopping_cart_deleted_recipe(self):
+        self.delete_recipe()
+        self.assertNotAdded(
+            f'/api/recipes/{self.recipe.pk}/shopping_cart/',
+            ShoppingCart.objects.all())
+
+    def test_shopping_cart_recipe_of_deleted_author(self):
+        self.delete_author()
+        self.assertNotAdded(
+            f'/api/recipes/{self.recipe.pk}/shopping_cart/',
+            ShoppingCart.objects.all())
+
+    def test_subscribe_deleted_user(self):
+        self.delete_author()
+        self.assertNotAdded(
+            f'/api/users/{self.author.pk}/subscribe/', Follow.objects.all())
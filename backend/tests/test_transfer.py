@@ -0,0 +1,58 @@
+"""Импорт выгрузки и тестовые данные: счётчик избранного (recipes.transfer)."""
+import shutil
+import tempfile
+from io import StringIO
+from pathlib import Path
+
+from django.core.management import call_command
+from django.db.models import Count
+from django.test import TestCase
+
+from recipes import counters, transfer
+from recipes.models import Favorited, Recipe
+from users.models import User
+
+
+class FavoritesCountTests(TestCase):
+    def assertCountsMatchFavorited(self):
+        favorites = dict(Favorited.objects.values_list('recipe').annotate(
+            total=Count('pk')))
+        self.assertTrue(favorites)
+        for pk, favorites_count in Recipe.all_objects.values_list(
+                'pk', 'favorites_count'):
+            self.assertEqual(favorites_count, favorites.get(pk, 0))
+
+    def test_import(self):
+        users = [
+            User.objects.create_user(
+                email=f'{name}@example.com', username=name, first_name=name,
+                last_name=name, password='password')
+            for name in ('cook', 'guest')
+        ]
+        for name, favorites in (('Борщ', 2), ('Щи', 1)):
+            recipe = Recipe.objects.create(
+                author=users[0], name=name, text='Сварить.',
+                cooking_time=60, image='recipes/recipe.png')
+            for user in users[:favorites]:
+                Favorited.objects.create(author=user, recipe=recipe)
+        counters.recount_favorites()
+        directory = Path(tempfile.mkdtemp())
+        self.addCleanup(shutil.rmtree, directory)
+        for table in transfer.TABLES:
+            with open(directory / f'{table.name}.ndjson', 'w') as stream:
+                transfer.export_table(table, stream, 100)
+
+        for level in transfer.LEVELS:
+            for name in level:
+                transfer.import_table(
+                    'test', transfer.TABLES_BY_NAME[name],
+                    directory / f'{name}.ndjson', 1)
+
+        self.assertEqual(Recipe.objects.count(), 4)
+        self.assertCountsMatchFavorited()
+
+    def test_seed_data(self):
+        call_command(
+            'seed_data', users=5, recipes=10, ingredients=5,
+            favorites_per_user=4, stdout=StringIO())
+        self.assertCountsMatchFavorited()
@@ -1,20 +1,33 @@
 from django.contrib import admin
 from django.contrib.auth import admin as auth_admin
 
+from foodgram.paginators import EstimatedCountPaginator
+from recipes import deletion, outbox
+from recipes.admin import DeferredDeleteMixin, OutboxLinkMixin
+
 from .models import Follow, User
 
 
-class UserAdmin(auth_admin.UserAdmin):
+class UserAdmin(DeferredDeleteMixin, auth_admin.UserAdmin):
     list_display = (
         'pk', 'email', 'username', 'first_name', 'last_name', 'password')
-    search_fields = ('username',)
-    list_filter = ('email', 'first_name',)
+    search_fields = ('^username', '^email')
+    list_filter = ('is_staff', 'is_active')
+    paginator = EstimatedCountPaginator
+    show_full_result_count = False
+    delete_object = staticmethod(deletion.delete_user)
 
 
-class FollowAdmin(admin.ModelAdmin):
+class FollowAdmin(OutboxLinkMixin, admin.ModelAdmin):
     list_display = ('user', 'following')
-    search_fields = ('user',)
-    list_filter = ('following',)
+    list_select_related = ('user', 'following')
+    search_fields = ('=user__username', '=following__username')
+    autocomplete_fields = ('user', 'following')
+    paginator = EstimatedCountPaginator
+    show_full_result_count = False
+    outbox_topic = outbox.FOLLOW
+    outbox_owner = 'user'
+    outbox_target = 'following'
 
 
 admin.site.register(User, UserAdmin)
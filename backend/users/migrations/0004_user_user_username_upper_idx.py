@@ -0,0 +1,20 @@
+# Generated by Django 4.2.4 on 2026-10-19 08:29
+
+import django.contrib.postgres.indexes
+from django.db import migrations, models
+import django.db.models.functions.comparison
+import django.db.models.functions.text
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('users', '0003_alter_follow_options_alter_user_options'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='user',
+            index=models.Index(django.contrib.postgres.indexes.OpClass(django.db.models.functions.text.Upper(django.db.models.functions.comparison.Cast('username', models.TextField())), name='text_pattern_ops'), name='user_username_upper_idx'),
+        ),
+    ]
@@ -0,0 +1,27 @@
+# Generated by Django 4.2.4 on 2026-10-19 08:33
+
+import django.contrib.auth.models
+from django.db import migrations, models
+import users.models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('users', '0004_user_user_username_upper_idx'),
+    ]
+
+    operations = [
+        migrations.AlterModelManagers(
+            name='user',
+            managers=[
+                ('objects', users.models.VisibleUserManager()),
+                ('all_objects', django.contrib.auth.models.UserManager()),
+            ],
+        ),
+        migrations.AddField(
+            model_name='user',
+            name='is_deleted',
+            field=models.BooleanField(default=False, verbose_name='Удалён'),
+        ),
+    ]
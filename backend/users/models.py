@@ -1,11 +1,20 @@
-from django.contrib.auth.models import AbstractUser
+from django.contrib.auth.models import AbstractUser, UserManager
+from django.contrib.postgres.indexes import OpClass
 from django.core import validators
 from django.db import models
+from django.db.models.functions import Cast, Upper
 
 MAX_EMAIL_LENGTH = 254
 MAX_NAME_LENGTH = 150
 
 
+class VisibleUserManager(UserManager):
+    """Менеджер по умолчанию: пользователи, ожидающие удаления, скрыты."""
+
+    def get_queryset(self):
+        return super().get_queryset().filter(is_deleted=False)
+
+
 class User(AbstractUser):
     email = models.EmailField(
         unique=True,
@@ -26,11 +35,25 @@ class User(AbstractUser):
         max_length=MAX_NAME_LENGTH, verbose_name='Фамилия')
     password = models.CharField(
         max_length=MAX_NAME_LENGTH, verbose_name='Пароль')
+    # Пользователь удалён, связанные данные удаляются в фоне.
+    is_deleted = models.BooleanField(
+        default=False, verbose_name='Удалён')
+
+    objects = VisibleUserManager()
+    all_objects = UserManager()
 
     class Meta:
         verbose_name = 'Пользователь'
         verbose_name_plural = 'Пользователи'
         ordering = ('id',)
+        indexes = [
+            # Поиск в админке по началу имени и точному совпадению.
+            models.Index(
+                OpClass(
+                    Upper(Cast('username', models.TextField())),
+                    name='text_pattern_ops'),
+                name='user_username_upper_idx'),
+        ]
 
     def __str__(self):
         return self.username